@@ -0,0 +1,52 @@
+import argparse
+import os
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from src.data_loader import PartitionedDataset, backfill, load_mt5
+
+# Configuration
+SYMBOL = "EURUSD@"
+DATASET_DIR = r"E:\Quantitative trading model\Data\dataset"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill MT5 history month by month into the dataset")
+    parser.add_argument("--start", required=True, help="e.g. 2020-01-01")
+    parser.add_argument("--end", required=True, help="exclusive, e.g. 2026-01-01")
+    parser.add_argument("--symbol", default=SYMBOL)
+    parser.add_argument("--timeframe", default="M1")
+    parser.add_argument("--dataset", default=DATASET_DIR)
+    parser.add_argument("--workers", type=int, default=4, help="concurrent month requests")
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--backend", default=None, help="mt5 / fake (default: $QTM_MT5_BACKEND or mt5)")
+    args = parser.parse_args()
+
+    mt5 = load_mt5(args.backend)
+    if not mt5.initialize():
+        print(f"❌ MT5 Initialize failed, error code = {mt5.last_error()}")
+        return 1
+
+    print(f"📥 Backfilling {args.symbol} {args.timeframe} {args.start} ~ {args.end} ({args.workers} workers)")
+    try:
+        result = backfill(PartitionedDataset(args.dataset), args.symbol, args.timeframe,
+                          args.start, args.end, mt5=mt5, workers=args.workers, retries=args.retries)
+    finally:
+        mt5.shutdown()
+
+    print(f"✅ {result['done']} months fetched ({result['bars']} bars), {result['skipped']} already done.")
+    if result["partial"]:
+        # Months that have not ended yet are refetched by the next run
+        print(f"ℹ️ Partial months (still open): {', '.join(result['partial'])}.")
+    if result["failed"]:
+        # Failed months stay pending in the manifest; re-running resumes them
+        print(f"⚠️ Failed months: {', '.join(result['failed'])}. Re-run the same command to resume.")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
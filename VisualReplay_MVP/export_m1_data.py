@@ -1,7 +1,17 @@
-import MetaTrader5 as mt5
+import argparse
 import pandas as pd
 from datetime import datetime
 import os
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from src.data_loader import PartitionedDataset, format_epoch, load_mt5, sync_symbol
+
+# MetaTrader5 by default; set QTM_MT5_BACKEND=fake to run against FakeMT5 (no terminal needed)
+mt5 = load_mt5()
 
 # Configuration
 SYMBOL = "EURUSD@"
@@ -9,6 +19,7 @@ TIMEFRAME = mt5.TIMEFRAME_M1
 START_DATE = datetime(2025, 11, 1)
 END_DATE = datetime(2026, 2, 1)
 OUTPUT_FILE = r"E:\Quantitative trading model\Data\EURUSD@_Recent_M1.csv"
+DATASET_DIR = r"E:\Quantitative trading model\Data\dataset"
 
 def export_data():
     # 1. Initialize MT5
@@ -58,6 +69,43 @@ def export_data():
     # 6. Shutdown
     mt5.shutdown()
 
+def sync_data(dataset_dir=DATASET_DIR):
+    """Incremental sync: fetch only bars newer than the last stored one into the dataset"""
+    if not mt5.initialize():
+        print(f"❌ MT5 Initialize failed, error code = {mt5.last_error()}")
+        return
+
+    dataset = PartitionedDataset(dataset_dir)
+    last = dataset.last_time(SYMBOL, "M1")
+    if last is None:
+        print(f"📥 Empty dataset, seeding with the latest bars for {SYMBOL}...")
+    else:
+        print(f"📥 Syncing {SYMBOL} M1 bars after {format_epoch(last)}...")
+
+    try:
+        result = sync_symbol(dataset, SYMBOL, "M1", mt5=mt5)
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        return
+    finally:
+        mt5.shutdown()
+
+    print(f"✅ Received {result['fetched']} bars, {result['new']} new.")
+    if result["gap"]:
+        print("⚠️ Terminal history no longer reaches the last stored bar; the dataset has a gap (run a backfill).")
+    if result["last_time"] is not None:
+        print(f"💾 {dataset_dir} now ends at {format_epoch(result['last_time'])}")
+
+
 if __name__ == "__main__":
-    export_data()
-    input("\nPress Enter to exit...")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Export MT5 M1 bars")
+    parser.add_argument("--sync", action="store_true", help="incremental sync into the partitioned dataset")
+    parser.add_argument("--dataset", default=DATASET_DIR, help="dataset directory for --sync")
+    args = parser.parse_args()
+
+    if args.sync:
+        # Non-interactive so it can run from a scheduled task
+        sync_data(args.dataset)
+    else:
+        export_data()
+        input("\nPress Enter to exit...")
\ No newline at end of file
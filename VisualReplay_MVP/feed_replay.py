@@ -1,25 +1,40 @@
 import time
-import pandas as pd
+import numpy as np
 import win32pipe, win32file, pywintypes
 import os
+import sys
 import threading
 
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from src.data_loader import BarArchive, PartitionedDataset, load_bars, load_window, format_epoch, to_epoch
+from src.strategies import LiveZigZag, PivotCache, timeframe_of
+
 PIPE_NAME = r'\\.\pipe\MT5_Python_Bridge'
 # Default Path (Can be overridden by user)
 CSV_PATH = r'E:\Quantitative trading model\Data\Local_Data\split_by_year\EURUSD_2024.csv'
 # CSV_PATH = r'E:\Quantitative trading model\Data\Online_Data\MT5_Data\EURUSD@_Recent_M1.csv'
 
 class DataFeeder:
-    def __init__(self, csv_path=None):
+    def __init__(self, csv_path=None, start=None, end=None, symbol="EURUSD", timeframe="M1", zigzag_deviation=None):
         self.csv_path = csv_path if csv_path else CSV_PATH
+        self.start = start            # Optional replay window [start, end)
+        self.end = end
+        self.symbol = symbol          # Used when csv_path is a partitioned dataset directory
+        self.timeframe = timeframe
         self.pipe = None
-        self.df = None
+        self.bars = None
         self.is_paused = True # Default to PAUSED
         self.speed = 3.0      # Default speed (seconds per bar)
         self.batch_size = 1   # Default batch size
         self.running = True
         self.start_time = None
         self.sync_event = threading.Event()
+        # Optional online ZigZag maintained at bar rate (None = disabled)
+        self.zigzag = LiveZigZag(zigzag_deviation) if zigzag_deviation else None
+        self.pivots = []              # Confirmed pivots: (time, price, type)
     
     def load_data(self):
         if not os.path.exists(self.csv_path):
@@ -28,33 +43,46 @@ class DataFeeder:
         
         print(f"📂 Loading {self.csv_path}...")
         try:
-            # 1. Peek at first line to detect format
-            with open(self.csv_path, 'r') as f:
-                first_line = f.readline()
-            
-            # Check for header
-            if "time" in first_line.lower() and "open" in first_line.lower():
-                print("ℹ️ Detected format: Online Data (with Header)")
-                self.df = pd.read_csv(self.csv_path)
-                # Standardize time format: YYYY-MM-DD HH:MM:SS -> YYYY.MM.DD HH:MM
-                self.df['time'] = pd.to_datetime(self.df['time']).dt.strftime('%Y.%m.%d %H:%M')
-                
+            if os.path.isdir(self.csv_path):
+                # Partitioned dataset: only the month partitions overlapping [start, end) are opened
+                self.bars = PartitionedDataset(self.csv_path).read(self.symbol, self.timeframe, self.start, self.end)
+            elif self.csv_path.endswith('.bars'):
+                # Archive file: memory-mapped, zero-copy views shared with other processes
+                self.bars = BarArchive(self.csv_path).slice(self.start, self.end)
             else:
-                print("ℹ️ Detected format: Local Data (No Header, Date+Time columns)")
-                # Local Data format: Date,Time,Open,High,Low,Close,Vol,RealVol,Spread
-                self.df = pd.read_csv(self.csv_path, header=None, names=['date', 'time_only', 'open', 'high', 'low', 'close', 'tick_volume', 'real_volume', 'spread'])
-                
-                # Combine Date and Time
-                self.df['time'] = self.df['date'].astype(str) + ' ' + self.df['time_only'].astype(str)
-                # Ensure format (Assuming input is already YYYY.MM.DD and HH:MM)
+                # Local (no header) and Online (header) CSVs are both handled by the bar store.
+                if self.start is not None or self.end is not None:
+                    # Replay window: seek via the sparse row index and parse only the window's bytes
+                    # (or slice the .bars cache if one is already fresh)
+                    self.bars = load_window(self.csv_path, self.start, self.end)
+                else:
+                    # Full file: the first load converts the CSV into a sibling .bars file;
+                    # later loads read binary columns.
+                    self.bars = load_bars(self.csv_path)
+            
+            if len(self.bars['time']) == 0:
+                print("❌ No bars in the requested range.")
+                return False
             
-            print(f"Sample raw time: {self.df['time'].iloc[0]}")
-            print(f"✅ Loaded {len(self.df)} bars.")
+            print(f"Sample raw time: {format_epoch(self.bars['time'][0])}")
+            print(f"✅ Loaded {len(self.bars['time'])} bars.")
             return True
         except Exception as e:
             print(f"❌ Failed to load CSV: {e}")
             return False
 
+    def find_bar(self, time_str):
+        """Return the index of the bar whose time equals time_str ("YYYY.MM.DD HH:MM"), or -1"""
+        try:
+            t = to_epoch(time_str)
+        except ValueError:
+            return -1
+        times = self.bars['time']
+        idx = int(np.searchsorted(times, t))
+        if idx < len(times) and times[idx] == t:
+            return idx
+        return -1
+
     def create_pipe_server(self):
         print(f"🔗 Creating Pipe Server: {PIPE_NAME}")
         try:
@@ -180,6 +208,32 @@ class DataFeeder:
         except Exception as e:
             print(f"❌ Send Error: {e}")
 
+    def update_zigzag(self, idx):
+        """Feed one bar into the live ZigZag; report pivots as they get confirmed"""
+        for ev in self.zigzag.update(self.bars['high'][idx], self.bars['low'][idx], self.bars['time'][idx]):
+            if ev.event == "confirmed":
+                pivot = (format_epoch(ev.time), float(ev.price), ev.kind)
+                self.pivots.append(pivot)
+                label = "HIGH" if ev.kind == 1 else "LOW"
+                print(f"📍 ZigZag {label} confirmed: {pivot[0]} @ {pivot[1]}")
+                self.send_command(f"MSG|ZigZag {label} {pivot[0]} {pivot[1]}")
+
+    def warm_up_zigzag(self, end_idx):
+        """Bring the live ZigZag up to date with bars already on the chart (no messages sent).
+        Pivots come from the shared pivot cache, so resuming a replay does not walk the history bar by bar."""
+        times = self.bars['time'][:end_idx]
+        highs, lows = self.bars['high'][:end_idx], self.bars['low'][:end_idx]
+        pivots = PivotCache().pivots(highs, lows, self.zigzag.deviation, timeframe=timeframe_of(times))
+        live = LiveZigZag.resume(self.zigzag.deviation, pivots, end_idx, times)
+        if live is None:
+            # Initial direction not settled yet: the first few bars must be replayed
+            for i in range(end_idx):
+                self.zigzag.update(highs[i], lows[i], times[i])
+            return
+        self.zigzag = live
+        pos, price, kind = pivots
+        self.pivots = [(format_epoch(times[p]), float(v), int(k)) for p, v, k in zip(pos[:-1], price[:-1], kind[:-1])]
+
     def run(self):
         print("\n=== 🚀 Ready. Waiting for PLAY command... ===")
         print("Press Ctrl+C to stop.")
@@ -227,21 +281,16 @@ class DataFeeder:
             if self.start_time:
                 print(f"📥 MT5 Last Bar: [{self.start_time}]")
                 # Find index where time > start_time
-                # Assuming self.df['time'] is sorted and is string format "YYYY.MM.DD HH:MM"
+                # self.bars['time'] is sorted epoch seconds, so a binary search replaces the string scan
                 
                 # Check if last bar exists in our data
                 # Strip any potential whitespace
                 clean_start_time = self.start_time.strip()
                 
-                # Debug: Show first few times in CSV to verify format matches
-                # print(f"🔍 CSV First Time: [{self.df['time'].iloc[0]}]")
-                
-                mask = self.df['time'] == clean_start_time
-                if mask.any():
-                    # Get the index of the last bar
-                    last_idx = self.df.index[mask].tolist()[0]
+                last_idx = self.find_bar(clean_start_time)
+                if last_idx >= 0:
                     start_index = last_idx + 1
-                    print(f"✅ Found continuation point. Resuming from index {start_index} (Time: {self.df.iloc[start_index]['time'] if start_index < len(self.df) else 'END'})")
+                    print(f"✅ Found continuation point. Resuming from index {start_index} (Time: {format_epoch(self.bars['time'][start_index]) if start_index < len(self.bars['time']) else 'END'})")
                 else:
                     print(f"⚠️ Last bar time [{clean_start_time}] not found in CSV. Starting from beginning.")
                     # Try fuzzy match? (e.g. nearest time) - For now, strict match is safer.
@@ -250,11 +299,18 @@ class DataFeeder:
         else:
              print("❌ Sync completely failed after retries. Starting from beginning.")
         
+        if self.zigzag is not None and start_index > 0:
+            self.warm_up_zigzag(start_index)
+            print(f"📍 ZigZag warmed up on {start_index} bars ({len(self.pivots)} confirmed pivots)")
+
         try:
             # Main Loop with Index Tracking
             # We use a while loop to handle batch increments
             current_idx = start_index
-            total_bars = len(self.df)
+            times = self.bars['time']
+            opens, highs, lows, closes = self.bars['open'], self.bars['high'], self.bars['low'], self.bars['close']
+            volumes = self.bars['volume']
+            total_bars = len(times)
             
             while current_idx < total_bars and self.running:
                 
@@ -278,17 +334,19 @@ class DataFeeder:
                 for _ in range(self.batch_size):
                     if current_idx >= total_bars: break
                     
-                    row = self.df.iloc[current_idx]
+                    bar_time = format_epoch(times[current_idx])
                     
                     # Format: ADD_BAR|Time,Open,High,Low,Close,TickVol
-                    data_str = f"{row['time']},{row['open']},{row['high']},{row['low']},{row['close']},{row['tick_volume']}"
+                    data_str = f"{bar_time},{opens[current_idx]},{highs[current_idx]},{lows[current_idx]},{closes[current_idx]},{int(volumes[current_idx])}"
                     cmd = f"ADD_BAR|{data_str}"
                     
                     # Only print every N bars to reduce spam if batch is high
                     if self.batch_size == 1 or bars_sent == 0:
-                        print(f"[{current_idx+1}/{total_bars}] Sending Bar: {row['time']} (Batch x{self.batch_size}, Speed {self.speed:.2f}s)")
+                        print(f"[{current_idx+1}/{total_bars}] Sending Bar: {bar_time} (Batch x{self.batch_size}, Speed {self.speed:.2f}s)")
                         
                     self.send_command(cmd)
+                    if self.zigzag is not None:
+                        self.update_zigzag(current_idx)
                     current_idx += 1
                     bars_sent += 1
                 
@@ -308,12 +366,18 @@ if __name__ == "__main__":
     import argparse
     
     parser = argparse.ArgumentParser(description="MT5 Data Feeder")
-    parser.add_argument("file", nargs="?", default=CSV_PATH, help="Path to CSV file (Local or Online format)")
+    parser.add_argument("file", nargs="?", default=CSV_PATH, help="Path to CSV file (Local or Online format), .bars archive or partitioned dataset directory")
+    parser.add_argument("--start", default=None, help="Replay window start, e.g. 2024-03-01")
+    parser.add_argument("--end", default=None, help="Replay window end (exclusive)")
+    parser.add_argument("--symbol", default="EURUSD", help="Symbol inside a dataset directory")
+    parser.add_argument("--timeframe", default="M1", help="Timeframe inside a dataset directory")
+    parser.add_argument("--zigzag", type=float, default=None, help="Maintain a live ZigZag with this deviation (e.g. 0.0015)")
     
     args = parser.parse_args()
     
     try:
-        feeder = DataFeeder(csv_path=args.file)
+        feeder = DataFeeder(csv_path=args.file, start=args.start, end=args.end, symbol=args.symbol, timeframe=args.timeframe,
+                            zigzag_deviation=args.zigzag)
         if feeder.load_data():
             if feeder.create_pipe_server():
                 feeder.run()
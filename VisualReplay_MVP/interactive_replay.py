@@ -4,15 +4,25 @@ import win32pipe, win32file, pywintypes
 import os
 import sys
 
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from src.data_loader import BarArchive, load_timeframe
+from src.strategies import PivotCache, timeframe_of
+
 PIPE_NAME = r'\\.\pipe\MT5_Python_Bridge'
 
 class PipeController:
-    def __init__(self):
+    def __init__(self, symbol="EURUSD", timeframe="H1", zigzag_deviation=None):
         self.pipe = None
+        self.symbol = symbol
+        self.timeframe = timeframe
         self.df = None
         self.points_of_interest = []
         self.current_idx = 0
         self.year_filter = 2024
+        self.zigzag_deviation = zigzag_deviation  # Jump between ZigZag pivots instead of big candles
 
     def load_data(self, csv_path):
         if not os.path.exists(csv_path):
@@ -20,20 +30,45 @@ class PipeController:
             return False
             
         print(f"📂 Loading {csv_path}...")
-        self.df = pd.read_csv(csv_path)
-        self.df['time'] = pd.to_datetime(self.df['time'])
-        
-        # Ensure we only work with 2024 data (Double Check)
-        self.df = self.df[self.df['time'].dt.year == self.year_filter].copy()
+        year_start, year_end = f"{self.year_filter}-01-01", f"{self.year_filter + 1}-01-01"
+        bars = None
+        if os.path.isdir(csv_path):
+            # Partitioned dataset: only the month partitions of the replay year are opened;
+            # higher timeframes come from the pyramid stored next to M1
+            bars = load_timeframe(csv_path, self.timeframe, self.symbol, year_start, year_end)
+        elif csv_path.endswith('.bars'):
+            # Memory-mapped archive: binary search the year instead of loading and filtering everything
+            bars = BarArchive(csv_path).slice(year_start, year_end)
+        if bars is not None:
+            self.df = pd.DataFrame({
+                'time': bars['time'].view('datetime64[s]'),
+                'open': bars['open'],
+                'high': bars['high'],
+                'low': bars['low'],
+                'close': bars['close'],
+                'tick_volume': bars['volume'],
+            })
+        else:
+            self.df = pd.read_csv(csv_path)
+            self.df['time'] = pd.to_datetime(self.df['time'])
+            
+            # Ensure we only work with 2024 data (Double Check)
+            self.df = self.df[self.df['time'].dt.year == self.year_filter].reset_index(drop=True)
         
         if self.df.empty:
             print(f"❌ No data found for year {self.year_filter}!")
             return False
 
-        # 简单模拟：假设我们要找所有 "收盘价高于开盘价 0.5%" 的大阳线作为“关键点”
-        # 在真实场景中，这里是 ZigZag 算法或 AI 模型的输出
-        self.df['body_size'] = (self.df['close'] - self.df['open']) / self.df['open']
-        self.points_of_interest = self.df[self.df['body_size'] > 0.002].index.tolist() # 0.2% 涨幅
+        if self.zigzag_deviation:
+            # ZigZag pivots as points of interest (shared pivot cache: recomputed only when the data changes)
+            pos, _, _ = PivotCache().pivots(self.df['high'].values, self.df['low'].values, self.zigzag_deviation,
+                                            timeframe=timeframe_of(self.df['time'].values))
+            self.points_of_interest = pos.tolist()
+        else:
+            # 简单模拟：假设我们要找所有 "收盘价高于开盘价 0.5%" 的大阳线作为“关键点”
+            # 在真实场景中，这里是 ZigZag 算法或 AI 模型的输出
+            self.df['body_size'] = (self.df['close'] - self.df['open']) / self.df['open']
+            self.points_of_interest = self.df[self.df['body_size'] > 0.002].index.tolist() # 0.2% 涨幅
         
         print(f"✅ Found {len(self.points_of_interest)} interesting points in {self.year_filter}.")
         return True
@@ -0,0 +1,320 @@
+# -*- coding: utf-8 -*-
+"""
+能量系统参数网格评估引擎
+
+调参时每组参数都新建一个 EnergySystemDetector，ZigZag、释放验证、积累扫描全部重来。
+实际上这些计算大部分与被调的 6 个参数无关：
+    - 释放候选只由全局转折点决定，min_release_pips / min_release_angle 只是对幅度、角度的阈值
+    - 积累窗口每个长度的触及点数、间距变异系数、回撤比例都是固定值，
+      min_time_ratio / touch_ratio_tolerance / min_touch_points / max_retrace_ratio 只是对它们的阈值
+
+所以按整个参数空间里最宽松的取值，一次列举“释放候选 × 积累长度”的超集表，
+之后每组参数只是在表上做向量化掩码：取每个释放候选第一个满足条件的积累长度，
+再按检测器的遍历顺序去重。几千组参数的开销大约等于一次检测。
+
+结果与逐组新建检测器完全一致（同一遍历顺序、同一浮点运算、同一去重规则）。
+
+用法：
+    engine = EnergyGridEngine(df, zigzag_deviation=0.0015, local_zigzag_deviation=0.0008)
+    results = engine.evaluate({'min_release_pips': [30, 40, 50], 'max_retrace_ratio': [0.4, 0.5, 0.6]})
+    results = engine.evaluate(sample_params(SEARCH_SPACE, 2000, seed=1))   # 随机搜索
+    rows = engine.select(results.iloc[0])                                  # 某组参数选中的机会
+"""
+
+import itertools
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from energy_system_detector import EnergySystemDetector, LiveZigZag, TriangleStats
+from src.strategies import IntervalIndex
+
+# 被调参数及检测器默认值
+TUNED_PARAMS = {
+    'min_release_pips': 50,
+    'min_release_angle': 45,
+    'max_retrace_ratio': 0.5,
+    'min_time_ratio': 2.0,
+    'touch_ratio_tolerance': 0.3,
+    'min_touch_points': 5,
+}
+
+# 随机搜索的默认范围：列表为离散取值，(低, 高) 为均匀分布
+SEARCH_SPACE = {
+    'min_release_pips': (10, 80),
+    'min_release_angle': (1, 60),
+    'max_retrace_ratio': (0.3, 1.5),
+    'min_time_ratio': (1.0, 3.0),
+    'touch_ratio_tolerance': (0.2, 1.0),
+    'min_touch_points': [4, 5, 6, 7],
+}
+
+# 释放候选表
+RELEASE_DTYPE = np.dtype([
+    ('direction', 'i1'),
+    ('start_pos', 'i8'),
+    ('end_pos', 'i8'),
+    ('bars', 'i8'),
+    ('amplitude_pips', 'f8'),
+    ('angle', 'f8'),
+])
+
+# 积累长度表：每行是某个释放候选的一个积累长度，按 (释放候选, 长度) 排序
+WINDOW_DTYPE = np.dtype([
+    ('release', 'i8'),
+    ('acc_len', 'i8'),
+    ('time_ratio', 'f8'),
+    ('touches', 'i8'),
+    ('cv', 'f8'),
+    ('retrace_ratio', 'f8'),
+])
+
+
+def expand_grid(grid):
+    """{参数: 取值列表} -> 全组合的参数字典列表"""
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[n] for n in names))]
+
+
+def sample_params(space, n, seed=None):
+    """
+    随机搜索：从参数空间抽取 n 组参数
+
+    参数:
+        space: {参数: 取值列表 或 (低, 高)}；整数区间按整数抽取
+        n: 组数
+        seed: 随机种子
+    """
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for name, spec in space.items():
+        if isinstance(spec, tuple):
+            lo, hi = spec
+            if isinstance(lo, int) and isinstance(hi, int):
+                columns[name] = rng.integers(lo, hi + 1, n).tolist()
+            else:
+                columns[name] = rng.uniform(lo, hi, n).tolist()
+        else:
+            columns[name] = [spec[k] for k in rng.integers(0, len(spec), n)]
+    return [{name: columns[name][k] for name in space} for k in range(n)]
+
+
+class EnergyGridEngine:
+    """在释放 × 积累候选超集表上批量评估检测参数"""
+
+    def __init__(self, df, zigzag_deviation=0.0015, local_zigzag_deviation=0.0008,
+                 pivot_cache=True, duplicate_mode='signal', **kwargs):
+        """
+        参数:
+            df: 与 EnergySystemDetector 相同的输入
+            zigzag_deviation / local_zigzag_deviation / pivot_cache / duplicate_mode: 固定的检测设置
+            **kwargs: 其它固定的检测器参数
+        """
+        self.detector = EnergySystemDetector(
+            df, zigzag_deviation=zigzag_deviation, local_zigzag_deviation=local_zigzag_deviation,
+            pivot_cache=pivot_cache, duplicate_mode=duplicate_mode, **kwargs)
+        self.releases = np.empty(0, dtype=RELEASE_DTYPE)
+        self.windows = np.empty(0, dtype=WINDOW_DTYPE)
+        self._bounds = None
+
+    # ------------------------------------------------------------------
+    # 候选超集
+    # ------------------------------------------------------------------
+
+    def build(self, min_release_pips, min_release_angle, max_retrace_ratio, min_time_ratio,
+              touch_ratio_tolerance):
+        """
+        按最宽松的阈值列举候选超集（参数越宽松，表越大）
+
+        释放候选按检测器的遍历顺序 (ZigZag 起点, 方向, 释放结束点) 排列；
+        积累长度只保留与被调参数无关的条件（高低点各至少 2 个、收敛）都满足，
+        且在最宽松阈值下可能有效的行
+        """
+        det = self.detector
+        det.min_release_pips = min_release_pips
+        det.min_release_angle = min_release_angle
+        det.max_retrace_ratio = max_retrace_ratio
+        pivot_pos, pivot_kind = det.pivot_pos, det.pivot_kind
+        n = len(det.close)
+        cv_limit = touch_ratio_tolerance * (1 + 1e-9) + 1e-12
+
+        releases, windows = [], []
+        for k in range(len(pivot_pos) - 3):
+            for direction in (1, -1):
+                if pivot_kind[k] != -direction:
+                    continue
+                for j in range(k + 1, min(k + 4, len(pivot_pos))):
+                    if pivot_kind[j] != direction:
+                        continue
+                    release = det._is_valid_release(int(pivot_pos[k]), int(pivot_pos[j]), direction)
+                    if release is None:
+                        continue
+                    min_len = int(release.bars * min_time_ratio)
+                    if release.end_pos + min_len >= n:
+                        continue
+                    rows = self._window_rows(release, min_len, min(int(release.bars * 5), n - release.end_pos),
+                                             max_retrace_ratio, min_time_ratio, cv_limit)
+                    if not rows:
+                        continue
+                    rid = len(releases)
+                    releases.append((direction, release.start_pos, release.end_pos, release.bars,
+                                     release.amplitude_pips, release.angle))
+                    windows.extend((rid,) + row for row in rows)
+
+        self.releases = np.array(releases, dtype=RELEASE_DTYPE)
+        self.windows = np.array(windows, dtype=WINDOW_DTYPE)
+        self._bounds = (min_release_pips, min_release_angle, max_retrace_ratio, min_time_ratio,
+                        touch_ratio_tolerance)
+
+    def _window_rows(self, release, min_len, max_len, max_retrace_ratio, min_time_ratio, cv_limit):
+        """
+        一个释放候选的积累长度行 (长度, 时间比, 触及点数, 变异系数, 回撤比例)
+
+        与 EnergySystemDetector._scan_accumulation 同一扫描，只是不在第一个有效长度停下；
+        变异系数用 np.std 按 _validate_triangle 的算法精确计算，保证与检测器的判断一致
+        """
+        det = self.detector
+        acc_start = release.end_pos
+        if max_len <= min_len:
+            return []
+        highs = det.high[acc_start:acc_start + max_len].tolist()
+        lows = det.low[acc_start:acc_start + max_len].tolist()
+        release_amplitude = abs(release.end_price - release.start_price)
+        if release_amplitude <= 0:
+            return []
+
+        live = LiveZigZag(det.local_zigzag_deviation)
+        stats = TriangleStats()
+        confirmed_pos = []
+        rows = []
+        for acc_len in range(max_len):
+            for ev in live.update(highs[acc_len], lows[acc_len]):
+                if ev.event == 'confirmed':
+                    confirmed_pos.append(ev.index)
+                    stats.append(ev.index, ev.price, ev.kind)
+            if acc_len < min_len:
+                continue
+            if stats.count and (stats.max_price - stats.min_price) / release_amplitude > max_retrace_ratio:
+                break
+            time_ratio = acc_len / release.bars
+            if time_ratio < min_time_ratio:
+                continue
+            tentative = live.tentative
+            if tentative is None:
+                continue
+            count, n_high, n_low, high_slope, low_slope, cv, spread = stats.evaluate(
+                (tentative.index, tentative.price, tentative.kind))
+            if n_high < 2 or n_low < 2 or not (high_slope < 0 and low_slope > 0):
+                continue
+            if cv > cv_limit:
+                continue
+            retrace_ratio = spread / release_amplitude
+            if retrace_ratio > max_retrace_ratio:
+                continue
+            intervals = np.diff(confirmed_pos + [tentative.index])
+            cv = np.std(intervals) / np.mean(intervals)
+            rows.append((acc_len, time_ratio, count, cv, retrace_ratio))
+        return rows
+
+    def _ensure(self, params):
+        """当前超集不能覆盖这些参数时，按更宽松的阈值重建"""
+        bounds = (
+            min(p['min_release_pips'] for p in params),
+            min(p['min_release_angle'] for p in params),
+            max(p['max_retrace_ratio'] for p in params),
+            min(p['min_time_ratio'] for p in params),
+            max(p['touch_ratio_tolerance'] for p in params),
+        )
+        if self._bounds is not None:
+            old = self._bounds
+            if (old[0] <= bounds[0] and old[1] <= bounds[1] and old[2] >= bounds[2]
+                    and old[3] <= bounds[3] and old[4] >= bounds[4]):
+                return
+            bounds = (min(old[0], bounds[0]), min(old[1], bounds[1]), max(old[2], bounds[2]),
+                      min(old[3], bounds[3]), max(old[4], bounds[4]))
+        self.build(*bounds)
+
+    # ------------------------------------------------------------------
+    # 评估
+    # ------------------------------------------------------------------
+
+    def select(self, params):
+        """
+        一组参数选中的积累长度行（self.windows 的行号），按检测器的登记顺序，已去重
+
+        参数:
+            params: 参数字典（缺省的取检测器默认值），也可以是 evaluate 结果的一行
+        """
+        params = {name: params.get(name, default) for name, default in TUNED_PARAMS.items()}
+        self._ensure([params])
+        return self._select(params)
+
+    def _select(self, p):
+        rel, win = self.releases, self.windows
+        if len(win) == 0:
+            return np.empty(0, dtype=np.int64)
+        release_ok = (rel['amplitude_pips'] >= p['min_release_pips']) & np.where(
+            rel['direction'] == 1, rel['angle'] >= p['min_release_angle'], rel['angle'] <= -p['min_release_angle'])
+        min_len = (rel['bars'] * p['min_time_ratio']).astype(np.int64)
+        rid = win['release']
+        ok = (release_ok[rid]
+              & (win['acc_len'] >= min_len[rid])
+              & (win['time_ratio'] >= p['min_time_ratio'])
+              & (win['touches'] >= p['min_touch_points'])
+              & (win['cv'] <= p['touch_ratio_tolerance'])
+              & (win['retrace_ratio'] <= p['max_retrace_ratio']))
+        hits = np.flatnonzero(ok)
+        # 每个释放候选取第一个有效长度（行按 (释放候选, 长度) 排序）
+        first = hits[np.r_[True, rid[hits][1:] != rid[hits][:-1]]] if len(hits) else hits
+
+        det = self.detector
+        seen = IntervalIndex(det.duplicate_window_ns)
+        keep = []
+        for row in first.tolist():
+            end_pos = int(rel['end_pos'][rid[row]])
+            signal_ns = int(det.times_ns[end_pos + int(win['acc_len'][row])])
+            if det.duplicate_mode == 'span':
+                unique = seen.add(int(det.times_ns[end_pos]), signal_ns)
+            else:
+                unique = seen.add(signal_ns)
+            if unique:
+                keep.append(row)
+        return np.array(keep, dtype=np.int64)
+
+    def evaluate(self, params):
+        """
+        批量评估参数组合
+
+        参数:
+            params: {参数: 取值列表}（全组合网格）或参数字典列表（如 sample_params 的结果）；
+                    缺省的参数取检测器默认值
+
+        返回:
+            DataFrame，每行一组参数：参数列 + opportunities / up / down（机会数）
+            + mean_retrace / mean_time_ratio（选中机会的均值，没有机会时为 NaN）
+        """
+        if isinstance(params, dict):
+            params = expand_grid(params)
+        params = [{name: p.get(name, default) for name, default in TUNED_PARAMS.items()} for p in params]
+        if not params:
+            return pd.DataFrame(columns=list(TUNED_PARAMS))
+        self._ensure(params)
+
+        direction = self.releases['direction'][self.windows['release']] if len(self.windows) else None
+        results = []
+        for p in params:
+            rows = self._select(p)
+            up = int(np.count_nonzero(direction[rows] == 1)) if len(rows) else 0
+            results.append(dict(
+                p,
+                opportunities=len(rows),
+                up=up,
+                down=len(rows) - up,
+                mean_retrace=float(self.windows['retrace_ratio'][rows].mean()) if len(rows) else np.nan,
+                mean_time_ratio=float(self.windows['time_ratio'][rows].mean()) if len(rows) else np.nan,
+            ))
+        return pd.DataFrame(results)
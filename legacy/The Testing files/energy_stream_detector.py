@@ -0,0 +1,341 @@
+# -*- coding: utf-8 -*-
+"""
+流式能量系统检测器（逐根 K 线，事件驱动）
+
+批量的 EnergySystemDetector 需要完整的 DataFrame；实盘、回放和回测只能看到 data[:t]。
+StreamingEnergyDetector 每次接收一根 K 线，状态有界：
+    - 全局转折点：LiveZigZag，加上最近 4 个已定型转折点
+    - K 线环形缓冲：最近 capacity 根的 OHLC、时间与阳线/阴线累计数
+    - 进行中的积累扫描：每个有效释放一个 AccumulationScan（局部 LiveZigZag + TriangleStats）
+    - 去重区间：只保留还可能与缓冲内新信号冲突的；最近 history 条机会
+
+释放结束点定型（全局 ZigZag 反转）时验证以它结束的释放，有效则从释放结束点开始积累扫描，
+先用缓冲补算到当前 K 线，之后每来一根推进一步；第一个满足三角形条件的积累长度立即发出机会。
+每根 K 线的开销只与进行中的扫描数有关，与历史长度无关。
+
+判定规则与批量检测相同（_calculate_angle / _validate_triangle 直接复用），差别只在因果性：
+释放结束点必须已经定型，去重按信号出现的先后进行（批量检测按 ZigZag 起点顺序登记）。
+结果等于批量检测的未去重候选按信号时间排序后再去重。
+
+用法：
+    stream = StreamingEnergyDetector(callback=print, min_release_pips=30)
+    for t, o, h, l, c in bars:
+        stream.on_bar(t, o, h, l, c)
+
+    opportunities = StreamingEnergyDetector(**params).run(df)   # 回测：逐根喂入整个 DataFrame
+"""
+
+import os
+import sys
+from collections import deque
+from typing import NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from energy_system_detector import (
+    DUPLICATE_MODES,
+    DUPLICATE_WINDOW_NS,
+    EnergySystemDetector,
+    LiveZigZag,
+    Release,
+    TriangleStats,
+)
+from src.strategies import IntervalIndex
+
+# 积累阶段最长为释放的 5 倍（与批量检测相同）
+MAX_ACCUMULATION_FACTOR = 5
+
+
+class StreamOpportunity(NamedTuple):
+    """流式检测发出的交易机会（位置为自第一根起的 K 线序号）"""
+    direction: int
+    signal_pos: int
+    signal_time: pd.Timestamp
+    detected_pos: int            # 发出时的 K 线（补算时可能晚于信号）
+    detected_time: pd.Timestamp
+    release: Release
+    acc_len: int
+    touches: Tuple[np.ndarray, np.ndarray, np.ndarray]
+    retrace_ratio: float
+    entry_price: float
+
+    @property
+    def type(self):
+        return '上三' if self.direction == 1 else '下三'
+
+    @property
+    def time_ratio(self):
+        return self.acc_len / self.release.bars
+
+
+class AccumulationScan:
+    """
+    一个释放之后的积累窗口扫描，每根 K 线推进一步
+
+    与 EnergySystemDetector._scan_accumulation 的循环体逐步对应
+    """
+
+    def __init__(self, owner, release):
+        self.owner = owner
+        self.release = release
+        self.min_len = int(release.bars * owner.min_time_ratio)
+        self.max_len = int(release.bars * MAX_ACCUMULATION_FACTOR)
+        self.amplitude = abs(release.end_price - release.start_price)
+        self.cv_limit = owner.touch_ratio_tolerance * (1 + 1e-9) + 1e-12
+        self.live = LiveZigZag(owner.local_zigzag_deviation)
+        self.stats = TriangleStats()
+        self.confirmed_pos, self.confirmed_price, self.confirmed_kind = [], [], []
+        self.acc_len = -1
+
+    @property
+    def done(self):
+        return self.acc_len + 1 >= self.max_len
+
+    def step(self, high, low):
+        """
+        喂入积累窗口的下一根 K 线
+
+        返回:
+            'found' 时附带 (积累长度, 触及点, 回撤比例)；'stop' 表示不可能再有效；None 继续
+        """
+        owner, stats, live = self.owner, self.stats, self.live
+        self.acc_len += 1
+        acc_len, acc_start = self.acc_len, self.release.end_pos
+        for ev in live.update(high, low):
+            if ev.event == 'confirmed':
+                self.confirmed_pos.append(acc_start + ev.index)
+                self.confirmed_price.append(ev.price)
+                self.confirmed_kind.append(ev.kind)
+                stats.append(ev.index, ev.price, ev.kind)
+        if acc_len < self.min_len:
+            return None
+        if stats.count and (stats.max_price - stats.min_price) / self.amplitude > owner.max_retrace_ratio:
+            return 'stop'
+        if acc_len / self.release.bars < owner.min_time_ratio:
+            return None
+        tentative = live.tentative
+        if tentative is None:
+            return None
+        count, n_high, n_low, high_slope, low_slope, cv, spread = stats.evaluate(
+            (tentative.index, tentative.price, tentative.kind))
+        if count < owner.min_touch_points or n_high < 2 or n_low < 2:
+            return None
+        if not (high_slope < 0 and low_slope > 0):
+            return None
+        if count > 2 and cv > self.cv_limit:
+            return None
+        if spread / self.amplitude > owner.max_retrace_ratio:
+            return None
+        pos = np.array(self.confirmed_pos + [acc_start + tentative.index], dtype=np.int64)
+        price = np.array(self.confirmed_price + [tentative.price], dtype=np.float64)
+        kind = np.array(self.confirmed_kind + [tentative.kind], dtype=np.int8)
+        is_valid_tri, retrace_ratio = owner._validate_triangle(pos, price, kind, self.release)
+        if is_valid_tri:
+            return 'found', (acc_len, (pos, price, kind), retrace_ratio)
+        return None
+
+
+class StreamingEnergyDetector:
+    """逐根 K 线的能量系统检测器，状态有界"""
+
+    # 判定规则与批量检测器共用
+    _calculate_angle = EnergySystemDetector._calculate_angle
+    _validate_triangle = EnergySystemDetector._validate_triangle
+
+    def __init__(self,
+                 min_release_pips=50,
+                 min_release_angle=45,
+                 max_release_angle=135,
+                 max_retrace_ratio=0.5,
+                 min_time_ratio=2.0,
+                 touch_ratio_tolerance=0.3,
+                 min_touch_points=5,
+                 zigzag_deviation=0.0015,
+                 local_zigzag_deviation=0.0008,
+                 duplicate_mode='signal',
+                 duplicate_window_ns=DUPLICATE_WINDOW_NS,
+                 max_release_bars=200,
+                 history=1000,
+                 callback=None):
+        """
+        参数:
+            min_release_pips ... duplicate_window_ns: 含义同 EnergySystemDetector
+            max_release_bars: 释放阶段最长 K 线数，决定环形缓冲容量（释放 + 5 倍积累）；更长的释放被忽略
+            history: opportunities 保留最近多少条（None 不限制）；run() 另行收集全部结果
+            callback: 可选，发现机会时调用 callback(StreamOpportunity)
+        """
+        if duplicate_mode not in DUPLICATE_MODES:
+            raise ValueError(f"duplicate_mode 必须是 {DUPLICATE_MODES} 之一: {duplicate_mode!r}")
+        self.min_release_pips = min_release_pips
+        self.min_release_angle = min_release_angle
+        self.max_release_angle = max_release_angle
+        self.max_retrace_ratio = max_retrace_ratio
+        self.min_time_ratio = min_time_ratio
+        self.touch_ratio_tolerance = touch_ratio_tolerance
+        self.min_touch_points = min_touch_points
+        self.zigzag_deviation = zigzag_deviation
+        self.local_zigzag_deviation = local_zigzag_deviation
+        self.duplicate_mode = duplicate_mode
+        self.duplicate_window_ns = duplicate_window_ns
+        self.max_release_bars = max_release_bars
+        self.callback = callback
+
+        self.capacity = max_release_bars * (MAX_ACCUMULATION_FACTOR + 1) + 2
+        self._time = np.zeros(self.capacity, dtype=np.int64)
+        self._high = np.zeros(self.capacity)
+        self._low = np.zeros(self.capacity)
+        self._close = np.zeros(self.capacity)
+        self._bull = np.zeros(self.capacity, dtype=np.int64)    # 截至该根（含）的阳线累计数
+        self._bear = np.zeros(self.capacity, dtype=np.int64)
+        self.count = 0
+
+        self.zigzag = LiveZigZag(zigzag_deviation)
+        self.pivots = deque(maxlen=4)       # 最近的已定型转折点 (位置, 价格, 类型)
+        self.scans = []                     # 进行中的 AccumulationScan
+        self.seen = IntervalIndex(duplicate_window_ns)
+        self.opportunities = deque(maxlen=history)
+
+    # ------------------------------------------------------------------
+    # K 线缓冲
+    # ------------------------------------------------------------------
+
+    def _slot(self, pos):
+        return pos % self.capacity
+
+    def _count_between(self, cum, start_pos, end_pos):
+        """[start_pos, end_pos] 内的累计差"""
+        before = cum[self._slot(start_pos - 1)] if start_pos > 0 else 0
+        return int(cum[self._slot(end_pos)] - before)
+
+    # ------------------------------------------------------------------
+    # 逐根处理
+    # ------------------------------------------------------------------
+
+    def on_bar(self, time, open_, high, low, close):
+        """
+        接收一根已收盘的 K 线
+
+        参数:
+            time: K 线时间（Timestamp / datetime64 / 纳秒整数）
+            open_, high, low, close: 价格
+
+        返回:
+            本根发出的 StreamOpportunity 列表（通常为空）
+        """
+        pos = self.count
+        self.count += 1
+        s = self._slot(pos)
+        prev = self._slot(pos - 1)
+        self._time[s] = pd.Timestamp(time).value
+        self._high[s], self._low[s], self._close[s] = high, low, close
+        self._bull[s] = (self._bull[prev] if pos else 0) + (close > open_)
+        self._bear[s] = (self._bear[prev] if pos else 0) + (close < open_)
+        if pos >= self.capacity:
+            # 之后的信号（含补算）都在缓冲内，不早于最老一根；更早 window 以外的去重区间不会再冲突
+            self.seen.discard_before(int(self._time[self._slot(pos + 1)]) - self.duplicate_window_ns)
+
+        emitted = []
+        # 先推进已有的积累扫描（新开的扫描在补算时已包含本根）
+        alive = []
+        for scan in self.scans:
+            if self._advance(scan, high, low, pos, emitted):
+                alive.append(scan)
+        self.scans = alive
+
+        for ev in self.zigzag.update(high, low):
+            if ev.event == 'confirmed':
+                self._on_pivot(ev.index, ev.price, ev.kind, pos, emitted)
+        return emitted
+
+    def _on_pivot(self, end_pos, end_price, kind, pos, emitted):
+        """转折点定型：验证以它结束的释放（起点为之前 1 或 3 个转折点中类型相反的）"""
+        for start_pos, _, start_kind in list(self.pivots)[-3:]:
+            if start_kind != -kind or end_pos - start_pos > self.max_release_bars:
+                continue
+            # 释放验证要读 start_pos - 1 的累计数：它已被覆盖时跳过（积累也早已超过 5 倍）
+            if pos - start_pos >= self.capacity - 1:
+                continue
+            release = self._release(start_pos, end_pos, kind)
+            if release is None:
+                continue
+            scan = AccumulationScan(self, release)
+            # 用缓冲补算 [释放结束点, 当前] 的 K 线
+            keep = True
+            for p in range(end_pos, pos + 1):
+                s = self._slot(p)
+                if not self._advance(scan, self._high[s], self._low[s], pos, emitted):
+                    keep = False
+                    break
+            if keep:
+                self.scans.append(scan)
+        self.pivots.append((end_pos, end_price, kind))
+
+    def _release(self, start_pos, end_pos, direction) -> Optional[Release]:
+        """与 EnergySystemDetector._is_valid_release 相同的释放验证"""
+        start, end = self._slot(start_pos), self._slot(end_pos)
+        if direction == 1:
+            start_price, end_price = self._low[start], self._high[end]
+        else:
+            start_price, end_price = self._high[start], self._low[end]
+        amplitude_pips = abs(end_price - start_price) * 10000
+        if amplitude_pips < self.min_release_pips:
+            return None
+        bars = end_pos - start_pos
+        angle = self._calculate_angle(start_price, end_price, bars)
+        if direction == 1 and angle < self.min_release_angle:
+            return None
+        if direction == -1 and angle > -self.min_release_angle:
+            return None
+        bullish_bars = self._count_between(self._bull, start_pos, end_pos)
+        bearish_bars = self._count_between(self._bear, start_pos, end_pos)
+        if direction == 1 and bullish_bars <= bearish_bars:
+            return None
+        if direction == -1 and bearish_bars <= bullish_bars:
+            return None
+        return Release(start_pos, end_pos, float(start_price), float(end_price), amplitude_pips, angle, direction)
+
+    def _advance(self, scan, high, low, pos, emitted):
+        """推进一步，返回扫描是否继续"""
+        result = scan.step(high, low)
+        if result is None:
+            return not scan.done
+        if result != 'stop':
+            self._emit(scan.release, *result[1], pos, emitted)
+        return False
+
+    def _emit(self, release, acc_len, touches, retrace_ratio, pos, emitted):
+        signal_pos = release.end_pos + acc_len
+        signal_ns = int(self._time[self._slot(signal_pos)])
+        if self.duplicate_mode == 'span':
+            unique = self.seen.add(int(self._time[self._slot(release.end_pos)]), signal_ns)
+        else:
+            unique = self.seen.add(signal_ns)
+        if not unique:
+            return
+        opp = StreamOpportunity(
+            release.direction, signal_pos, pd.Timestamp(signal_ns), pos, pd.Timestamp(int(self._time[self._slot(pos)])),
+            release, acc_len, touches, retrace_ratio, float(self._close[self._slot(signal_pos)]))
+        self.opportunities.append(opp)
+        emitted.append(opp)
+        if self.callback is not None:
+            self.callback(opp)
+
+    # ------------------------------------------------------------------
+    # 回测
+    # ------------------------------------------------------------------
+
+    def run(self, df):
+        """
+        逐根喂入整个 DataFrame（Open/High/Low/Close 列，时间索引），返回全部机会
+
+        与实盘/回放走同一条 on_bar 路径
+        """
+        times = np.asarray(df.index.values, dtype='datetime64[ns]').view(np.int64).tolist()
+        columns = (df[c].to_numpy(dtype=np.float64).tolist() for c in ('Open', 'High', 'Low', 'Close'))
+        found = []
+        for t, o, h, l, c in zip(times, *columns):
+            found.extend(self.on_bar(t, o, h, l, c))
+        return found
@@ -27,9 +27,22 @@ import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 from datetime import datetime, timedelta
 import os
+import shutil
+import sys
+import tempfile
 import warnings
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import NamedTuple
 warnings.filterwarnings('ignore')
 
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.data_loader import BarArchive, CompactBars, load_bars, load_timeframe, load_window, bars_to_frame, write_bars
+from src.strategies import FeatureIndex, IntervalIndex, LiveZigZag, PivotCache, timeframe_of, zigzag_pivots
+
 # 设置中文字体
 plt.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei', 'DejaVu Sans']
 plt.rcParams['axes.unicode_minus'] = False
@@ -39,89 +52,136 @@ class ZigZag:
     """ZigZag算法 - 用于识别波峰波谷"""
     
     @staticmethod
-    def calculate(df, deviation=0.001):
+    def calculate(df, deviation=0.001, cache=None):
         """
         计算ZigZag点位
         
         参数:
             df: DataFrame，包含High, Low, Close列
             deviation: 最小偏离百分比（用于过滤噪音）
+            cache: 可选 PivotCache；数据内容不变时直接读取上次的结果
         
         返回:
             包含ZigZag点位的列表 [(index, price, type), ...]
             type: 1=波峰(高点), -1=波谷(低点)
         """
-        highs = df['High'].values
-        lows = df['Low'].values
-        
-        zigzag_points = []
-        
-        if len(df) < 3:
-            return zigzag_points
-        
-        # 初始化
-        last_pivot_type = 0  # 1=高点, -1=低点
-        last_pivot_price = 0
-        last_pivot_idx = 0
-        
-        # 找初始方向
-        for i in range(1, min(10, len(df))):
-            if highs[i] > highs[0] * (1 + deviation):
-                last_pivot_type = -1  # 开始是低点
-                last_pivot_price = lows[0]
-                last_pivot_idx = 0
-                break
-            elif lows[i] < lows[0] * (1 - deviation):
-                last_pivot_type = 1  # 开始是高点
-                last_pivot_price = highs[0]
-                last_pivot_idx = 0
-                break
-        
-        if last_pivot_type == 0:
-            return zigzag_points
-        
-        zigzag_points.append((df.index[last_pivot_idx], last_pivot_price, last_pivot_type))
-        
-        # 遍历寻找转折点
-        for i in range(1, len(df)):
-            if last_pivot_type == -1:  # 上一个是低点，找高点
-                if highs[i] > last_pivot_price * (1 + deviation):
-                    # 找到新高点
-                    if len(zigzag_points) > 0 and zigzag_points[-1][2] == 1:
-                        # 更新最后的高点
-                        if highs[i] > zigzag_points[-1][1]:
-                            zigzag_points[-1] = (df.index[i], highs[i], 1)
-                    else:
-                        zigzag_points.append((df.index[i], highs[i], 1))
-                    last_pivot_type = 1
-                    last_pivot_price = highs[i]
-                    last_pivot_idx = i
-                elif lows[i] < last_pivot_price:
-                    # 新低
-                    last_pivot_price = lows[i]
-                    last_pivot_idx = i
-                    if zigzag_points[-1][2] == -1:
-                        zigzag_points[-1] = (df.index[i], lows[i], -1)
-            else:  # 上一个是高点，找低点
-                if lows[i] < last_pivot_price * (1 - deviation):
-                    # 找到新低点
-                    if len(zigzag_points) > 0 and zigzag_points[-1][2] == -1:
-                        # 更新最后的低点
-                        if lows[i] < zigzag_points[-1][1]:
-                            zigzag_points[-1] = (df.index[i], lows[i], -1)
-                    else:
-                        zigzag_points.append((df.index[i], lows[i], -1))
-                    last_pivot_type = -1
-                    last_pivot_price = lows[i]
-                    last_pivot_idx = i
-                elif highs[i] > last_pivot_price:
-                    # 新高
-                    last_pivot_price = highs[i]
-                    last_pivot_idx = i
-                    if zigzag_points[-1][2] == 1:
-                        zigzag_points[-1] = (df.index[i], highs[i], 1)
-        
-        return zigzag_points
+        # 内核只处理数组（见 src/strategies/zigzag.py），时间戳在这里按位置一次性映射
+        if cache is not None:
+            pos, price, kind = cache.pivots(df['High'].values, df['Low'].values, deviation,
+                                            timeframe=timeframe_of(df.index.values))
+        else:
+            pos, price, kind = zigzag_pivots(df['High'].values, df['Low'].values, deviation)
+        times = df.index[pos]
+        return [(times[k], price[k], int(kind[k])) for k in range(len(pos))]
+
+
+class TriangleStats:
+    """
+    积累段触及点统计的增量维护
+
+    积累窗口每延长一根 K 线，局部 ZigZag 最多新定型一个触及点、移动一次暂定点；
+    已定型触及点的统计（首末高低点、间距和与平方和、价格极值）逐个累加，
+    暂定点只在求值时临时计入，因此每个窗口长度的求值是 O(1)。
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.n_high = self.n_low = 0
+        self.first_high = self.last_high = None
+        self.first_low = self.last_low = None
+        self.first_pos = self.last_pos = None
+        self.interval_sum = 0       # 相邻已定型触及点间距之和（整数，精确）
+        self.interval_sumsq = 0
+        self.max_price = -np.inf
+        self.min_price = np.inf
+
+    def append(self, pos, price, kind):
+        """追加一个已定型触及点（位置递增）"""
+        if self.count:
+            gap = pos - self.last_pos
+            self.interval_sum += gap
+            self.interval_sumsq += gap * gap
+        else:
+            self.first_pos = pos
+        self.last_pos = pos
+        self.count += 1
+        if kind == 1:
+            if self.n_high == 0:
+                self.first_high = price
+            self.last_high = price
+            self.n_high += 1
+        else:
+            if self.n_low == 0:
+                self.first_low = price
+            self.last_low = price
+            self.n_low += 1
+        self.max_price = max(self.max_price, price)
+        self.min_price = min(self.min_price, price)
+
+    def evaluate(self, tentative):
+        """
+        计入暂定点后的统计
+
+        返回:
+            (触及点数, 高点数, 低点数, 高点斜率, 低点斜率, 间距变异系数, 价格极差)
+            斜率/变异系数无法计算时为 None
+        """
+        pos, price, kind = tentative
+        count = self.count + 1
+        n_high, n_low = self.n_high + (kind == 1), self.n_low + (kind == -1)
+        first_high = self.first_high if self.n_high else price
+        first_low = self.first_low if self.n_low else price
+        last_high = price if kind == 1 else self.last_high
+        last_low = price if kind == -1 else self.last_low
+        high_slope = (last_high - first_high) / n_high if n_high > 1 else None
+        low_slope = (last_low - first_low) / n_low if n_low > 1 else None
+
+        cv = None
+        if count > 2:
+            gap = pos - self.last_pos
+            m = count - 1
+            total, sumsq = self.interval_sum + gap, self.interval_sumsq + gap * gap
+            cv = np.sqrt(max(m * sumsq - total * total, 0)) / total
+        spread = max(self.max_price, price) - min(self.min_price, price)
+        return count, n_high, n_low, high_slope, low_slope, cv, spread
+
+
+class Release(NamedTuple):
+    """有效释放阶段（K线位置与价格）"""
+    start_pos: int
+    end_pos: int
+    start_price: float
+    end_price: float
+    amplitude_pips: float
+    angle: float
+    direction: int
+
+    @property
+    def bars(self):
+        return self.end_pos - self.start_pos
+
+
+# 交易机会结构化记录；触及点存放在检测器的 touch_pos/touch_price/touch_kind 中，[touch_start, touch_end) 为本条的区间
+OPPORTUNITY_DTYPE = np.dtype([
+    ('direction', 'i1'),
+    ('signal_pos', 'i8'),
+    ('release_start_pos', 'i8'),
+    ('release_end_pos', 'i8'),
+    ('release_start_price', 'f8'),
+    ('release_end_price', 'f8'),
+    ('amplitude_pips', 'f8'),
+    ('angle', 'f8'),
+    ('time_ratio', 'f8'),
+    ('entry_price', 'f8'),
+    ('retrace_ratio', 'f8'),
+    ('touch_start', 'i8'),
+    ('touch_end', 'i8'),
+])
+
+# 相距不足 24 小时的机会视为重复
+DUPLICATE_WINDOW_NS = 24 * 3600 * 10**9
+# 去重语义：'signal' 比较信号时间；'span' 比较积累区间 [释放结束, 信号]
+DUPLICATE_MODES = ('signal', 'span')
 
 
 class EnergySystemDetector:
@@ -134,12 +194,19 @@ class EnergySystemDetector:
                  max_retrace_ratio=0.5,         # 最大回撤比例
                  min_time_ratio=2.0,            # 最小时间比例(积累/释放)
                  touch_ratio_tolerance=0.3,     # 触及点间距比例容差
-                 min_touch_points=5):           # 最小触及点数量
+                 min_touch_points=5,            # 最小触及点数量
+                 zigzag_deviation=0.0015,       # 全局ZigZag偏离阈值
+                 local_zigzag_deviation=0.0008,  # 积累段局部ZigZag偏离阈值
+                 pivot_cache=True,              # 全局转折点磁盘缓存
+                 duplicate_mode='signal',       # 去重语义
+                 duplicate_window_ns=DUPLICATE_WINDOW_NS,  # 去重时间窗口(纳秒)
+                 pivots=None):                  # 预先计算的全局转折点
         """
         初始化检测器
         
         参数:
-            df: OHLC数据，需要包含Open, High, Low, Close, 时间索引
+            df: OHLC数据，需要包含Open, High, Low, Close, 时间索引；
+                也可以直接传入列式 K 线字典或 CompactBars（紧凑定点表示）
             min_release_pips: 最小释放幅度（点数，对于EURUSD 1点=0.0001）
             min_release_angle: 上三的最小释放角度（度）
             max_release_angle: 下三的最大释放角度（度）
@@ -147,8 +214,18 @@ class EnergySystemDetector:
             min_time_ratio: 积累时间/释放时间的最小比例
             touch_ratio_tolerance: 三角形触及点间距比例的容差
             min_touch_points: 三角形最小触及点数量
+            zigzag_deviation: 全局 ZigZag 偏离阈值（调参可先用 src.strategies.zigzag_sweep 一次扫描多个阈值，需要 numba）
+            local_zigzag_deviation: 积累段内识别三角形触及点的 ZigZag 偏离阈值
+            pivot_cache: True 使用默认位置的 PivotCache（Data/pivot_cache），也可传入实例；False 不缓存
+            duplicate_mode: 'signal' 信号时间相距不足窗口视为重复；'span' 积累区间重叠或相距不足窗口视为重复
+            duplicate_window_ns: 去重时间窗口（纳秒），默认 24 小时
+            pivots: 已算好的全局 ZigZag (pos, price, kind)，给出时不再计算（并行检测的工作进程使用）
+        
+        注意: 检测器只读不写 df，因此不再复制（可直接使用内存映射档案的视图）
         """
-        self.df = df.copy()
+        if not isinstance(df, pd.DataFrame):
+            df = bars_to_frame(df)
+        self.df = df
         self.min_release_pips = min_release_pips
         self.min_release_angle = min_release_angle
         self.max_release_angle = max_release_angle
@@ -156,13 +233,86 @@ class EnergySystemDetector:
         self.min_time_ratio = min_time_ratio
         self.touch_ratio_tolerance = touch_ratio_tolerance
         self.min_touch_points = min_touch_points
+        self.zigzag_deviation = zigzag_deviation
+        self.local_zigzag_deviation = local_zigzag_deviation
+        if duplicate_mode not in DUPLICATE_MODES:
+            raise ValueError(f"duplicate_mode 必须是 {DUPLICATE_MODES} 之一: {duplicate_mode!r}")
+        self.duplicate_mode = duplicate_mode
+        self.duplicate_window_ns = duplicate_window_ns
+        
+        # 检测在连续数组和整数位置上进行，pandas 对象只在导出时生成
+        self.index = df.index
+        self.times_ns = np.asarray(df.index.values, dtype='datetime64[ns]').view(np.int64)
+        self.open = np.ascontiguousarray(df['Open'].values, dtype=np.float64)
+        self.high = np.ascontiguousarray(df['High'].values, dtype=np.float64)
+        self.low = np.ascontiguousarray(df['Low'].values, dtype=np.float64)
+        self.close = np.ascontiguousarray(df['Close'].values, dtype=np.float64)
+        # 阳线/阴线前缀计数：释放段的 K 线特征 O(1) 查询（High/Low 稀疏表不调用就不构建）
+        self.features = FeatureIndex(self.open, self.high, self.low, self.close)
         
         # 存储识别结果
         self.opportunities = []
+        self.records = np.empty(0, dtype=OPPORTUNITY_DTYPE)
+        
+        # 计算ZigZag（并行数组：K线位置、价格、类型）
+        if pivot_cache is True:
+            pivot_cache = PivotCache()
+        self.pivot_cache = pivot_cache or None
+        if pivots is None and self.pivot_cache is not None:
+            pivots = self.pivot_cache.pivots(self.high, self.low, zigzag_deviation,
+                                             timeframe=timeframe_of(self.times_ns.view('datetime64[ns]')))
+        elif pivots is None:
+            pivots = zigzag_pivots(self.high, self.low, zigzag_deviation)
+        self.pivot_pos, self.pivot_price, self.pivot_kind = pivots
+    
+    @property
+    def zigzag(self):
+        """ZigZag 点位 [(时间, 价格, 类型), ...]（导出用）"""
+        times = self.index[self.pivot_pos]
+        return [(times[k], self.pivot_price[k], int(self.pivot_kind[k])) for k in range(len(self.pivot_pos))]
+        
+    @classmethod
+    def from_archive(cls, archive, start=None, end=None, **kwargs):
+        """
+        直接基于内存映射档案创建检测器
+        
+        参数:
+            archive: BarArchive 或 .bars 文件路径
+            start, end: 时间区间 [start, end)，None 表示不限
+            **kwargs: 传给 __init__ 的检测参数
+        """
+        if not isinstance(archive, BarArchive):
+            archive = BarArchive(archive)
+        return cls(bars_to_frame(archive.slice(start, end)), **kwargs)
+    
+    @classmethod
+    def from_compact(cls, compact, start=None, end=None, **kwargs):
+        """
+        基于紧凑定点 K 线创建检测器：整段历史保持 int32 形态，只解码 [start, end) 检测窗口
         
-        # 计算ZigZag
-        self.zigzag = ZigZag.calculate(df, deviation=0.0015)
+        参数:
+            compact: CompactBars 或紧凑 .bars 文件路径
+            start, end: 时间区间 [start, end)，None 表示不限
+            **kwargs: 传给 __init__ 的检测参数
+        """
+        if not isinstance(compact, CompactBars):
+            compact = CompactBars.read(compact)
+        return cls(compact.slice(start, end), **kwargs)
+    
+    @classmethod
+    def from_dataset(cls, root, symbol='EURUSD', timeframe='H1', start=None, end=None, **kwargs):
+        """
+        基于分区数据集创建检测器（只读取与 [start, end) 重叠的月份分区）
         
+        参数:
+            root: 数据集根目录
+            symbol, timeframe: 品种与周期（高周期取自金字塔，缺失时先由 M1 生成）
+            start, end: 时间区间 [start, end)
+            **kwargs: 传给 __init__ 的检测参数
+        """
+        bars = load_timeframe(root, timeframe, symbol, start, end)
+        return cls(bars_to_frame(bars), **kwargs)
+    
     def _calculate_angle(self, start_price, end_price, bars):
         """
         计算价格运动的角度
@@ -187,33 +337,30 @@ class EnergySystemDetector:
         
         return angle
     
-    def _is_valid_release(self, start_idx, end_idx, direction):
+    def _is_valid_release(self, start_pos, end_pos, direction):
         """
         验证释放阶段是否有效
         
         参数:
-            start_idx: 释放开始的数据索引
-            end_idx: 释放结束的数据索引
+            start_pos: 释放开始的K线位置
+            end_pos: 释放结束的K线位置
             direction: 1=向上(上三), -1=向下(下三)
         
         返回:
-            (是否有效, 释放详情字典)
+            有效时返回 Release，否则 None
         """
-        start_pos = self.df.index.get_loc(start_idx)
-        end_pos = self.df.index.get_loc(end_idx)
-        
         if direction == 1:  # 向上释放
-            start_price = self.df.loc[start_idx, 'Low']
-            end_price = self.df.loc[end_idx, 'High']
+            start_price = self.low[start_pos]
+            end_price = self.high[end_pos]
         else:  # 向下释放
-            start_price = self.df.loc[start_idx, 'High']
-            end_price = self.df.loc[end_idx, 'Low']
+            start_price = self.high[start_pos]
+            end_price = self.low[end_pos]
         
         # 计算幅度（点数）
         amplitude_pips = abs(end_price - start_price) * 10000
         
         if amplitude_pips < self.min_release_pips:
-            return False, None
+            return None
         
         # 计算角度
         bars = end_pos - start_pos
@@ -222,91 +369,54 @@ class EnergySystemDetector:
         # 验证角度
         if direction == 1:  # 上三要求角度 >= 45°
             if angle < self.min_release_angle:
-                return False, None
+                return None
         else:  # 下三要求角度 <= -45°（即向下）
             if angle > -self.min_release_angle:
-                return False, None
+                return None
         
         # 检查K线特征（阳盛阴衰 或 阴盛阳衰）
-        release_df = self.df.iloc[start_pos:end_pos+1]
-        bullish_bars = (release_df['Close'] > release_df['Open']).sum()
-        bearish_bars = (release_df['Close'] < release_df['Open']).sum()
+        bullish_bars = self.features.bullish(start_pos, end_pos+1)
+        bearish_bars = self.features.bearish(start_pos, end_pos+1)
         
         if direction == 1 and bullish_bars <= bearish_bars:
-            return False, None
+            return None
         if direction == -1 and bearish_bars <= bullish_bars:
-            return False, None
-        
-        return True, {
-            'start_idx': start_idx,
-            'end_idx': end_idx,
-            'start_price': start_price,
-            'end_price': end_price,
-            'amplitude_pips': amplitude_pips,
-            'angle': angle,
-            'bars': bars,
-            'direction': direction
-        }
-    
-    def _find_triangle_touches(self, df_segment, direction):
-        """
-        在积累阶段寻找三角形的触及点
-        
-        参数:
-            df_segment: 积累阶段的数据片段
-            direction: 1=上三(找收敛三角形), -1=下三
+            return None
         
-        返回:
-            触及点列表 [(index, price, type), ...]
-        """
-        # 使用较小的deviation来捕捉积累阶段的小波动
-        local_zigzag = ZigZag.calculate(df_segment, deviation=0.0008)
-        
-        return local_zigzag
+        return Release(start_pos, end_pos, start_price, end_price, amplitude_pips, angle, direction)
     
-    def _validate_triangle(self, touches, release_info):
+    def _validate_triangle(self, pos, price, kind, release):
         """
         验证三角形形态是否有效
         
         参数:
-            touches: 触及点列表
-            release_info: 释放阶段信息
+            pos, price, kind: 触及点（K线位置、价格、类型）的并行数组
+            release: 释放阶段信息
         
         返回:
-            (是否有效, 三角形详情)
+            (是否有效, 回撤比例)
         """
-        if len(touches) < self.min_touch_points:
+        if len(pos) < self.min_touch_points:
             return False, None
         
-        direction = release_info['direction']
-        
         # 分离高点和低点
-        highs = [(t[0], t[1]) for t in touches if t[2] == 1]
-        lows = [(t[0], t[1]) for t in touches if t[2] == -1]
+        high_prices = price[kind == 1]
+        low_prices = price[kind == -1]
         
-        if len(highs) < 2 or len(lows) < 2:
+        if len(high_prices) < 2 or len(low_prices) < 2:
             return False, None
         
-        # 检查是否形成收敛形态
+        # 检查收敛（高点降低，低点升高）
         # 上三：高点递降，低点递升 -> 收敛三角形
         # 下三：高点递降，低点递升 -> 收敛三角形
+        high_slope = (high_prices[-1] - high_prices[0]) / len(high_prices)
+        low_slope = (low_prices[-1] - low_prices[0]) / len(low_prices)
         
-        high_prices = [h[1] for h in highs]
-        low_prices = [l[1] for l in lows]
-        
-        # 检查收敛（高点降低，低点升高）
-        high_slope = (high_prices[-1] - high_prices[0]) / len(high_prices) if len(high_prices) > 1 else 0
-        low_slope = (low_prices[-1] - low_prices[0]) / len(low_prices) if len(low_prices) > 1 else 0
-        
-        # 收敛条件：高点下降，低点上升
-        is_converging = high_slope < 0 and low_slope > 0
-        
-        if not is_converging:
+        if not (high_slope < 0 and low_slope > 0):
             return False, None
         
         # 检查触及点间距比例是否接近1:1
-        touch_times = [self.df.index.get_loc(t[0]) for t in touches]
-        intervals = np.diff(touch_times)
+        intervals = np.diff(pos)
         
         if len(intervals) > 1:
             mean_interval = np.mean(intervals)
@@ -317,54 +427,133 @@ class EnergySystemDetector:
                 return False, None
         
         # 检查回撤幅度
-        all_prices = [t[1] for t in touches]
-        max_price = max(all_prices)
-        min_price = min(all_prices)
-        
-        retrace_amplitude = max_price - min_price
-        release_amplitude = abs(release_info['end_price'] - release_info['start_price'])
+        retrace_amplitude = price.max() - price.min()
+        release_amplitude = abs(release.end_price - release.start_price)
         
         retrace_ratio = retrace_amplitude / release_amplitude if release_amplitude > 0 else float('inf')
         
         if retrace_ratio > self.max_retrace_ratio:
             return False, None
         
-        return True, {
-            'touches': touches,
-            'highs': highs,
-            'lows': lows,
-            'retrace_ratio': retrace_ratio,
-            'is_converging': is_converging
-        }
+        return True, retrace_ratio
     
     def detect_opportunities(self):
         """
         检测所有交易机会
         
+        结果以结构化数组保存在 self.records（字段见 OPPORTUNITY_DTYPE），触及点保存在
+        self.touch_pos / touch_price / touch_kind，每条记录的 [touch_start, touch_end) 指向其触及点；
+        返回值与 self.opportunities 是导出的字典列表（时间戳只在导出时映射）
+        
         返回:
             交易机会列表
         """
-        self.opportunities = []
-        
-        if len(self.zigzag) < 4:
-            print("ZigZag点位不足，无法进行检测")
+        if not self._begin_detection():
             return self.opportunities
         
-        print(f"共找到 {len(self.zigzag)} 个ZigZag点位，开始分析...")
-        
         # 遍历ZigZag点位寻找释放-积累模式
-        for i in range(len(self.zigzag) - 3):
+        for i in range(len(self.pivot_pos) - 3):
             # 尝试识别上三机会
             self._detect_pattern(i, direction=1)
             
             # 尝试识别下三机会
             self._detect_pattern(i, direction=-1)
         
-        # 按时间排序
-        self.opportunities.sort(key=lambda x: x['signal_time'])
+        self._finish_detection()
+        return self.opportunities
+    
+    def detect_opportunities_parallel(self, workers=None, shards=None):
+        """
+        多进程分片检测，结果与 detect_opportunities 完全一致
+        
+        全局 ZigZag 依赖从第一根起的全部历史，分片各自计算会在边界处得到不同的转折点，
+        所以转折点只在主进程计算一次（有 PivotCache 时直接命中），分片按 ZigZag 起点索引划分。
+        K 线写入临时 .bars 文件，各工作进程以内存映射打开（共享页缓存，不复制、不经过 pickle），
+        扫描积累窗口时可以读到分片末尾之后的 K 线，相当于每个分片自带覆盖最长释放+积累跨度的重叠区。
+        工作进程只产出未去重的候选，主进程按分片顺序、与串行相同的遍历顺序逐个登记去重。
+        
+        参数:
+            workers: 进程数，默认 CPU 核数；1 时直接串行检测
+            shards: 分片数，默认 workers * 4（分片小一些负载更均衡）
+        
+        返回:
+            交易机会列表
+        """
+        workers = workers or os.cpu_count() or 1
+        if workers == 1:
+            return self.detect_opportunities()
+        if not self._begin_detection():
+            return self.opportunities
         
+        n_starts = len(self.pivot_pos) - 3
+        shards = max(1, min(shards or workers * 4, n_starts))
+        bounds = np.linspace(0, n_starts, shards + 1).astype(np.int64)
+        
+        tmpdir = tempfile.mkdtemp(prefix='energy_shards_')
+        try:
+            path = write_bars(Path(tmpdir) / 'shard_source.bars', {
+                'time': self.times_ns // 10**9,
+                'open': self.open,
+                'high': self.high,
+                'low': self.low,
+                'close': self.close,
+                'volume': np.zeros(len(self.close)),
+            })
+            pivots = (self.pivot_pos, self.pivot_price, self.pivot_kind)
+            with ProcessPoolExecutor(workers, initializer=_init_shard_worker,
+                                     initargs=(str(path), pivots, self._detection_params())) as pool:
+                # map 按分片顺序返回，边界处的重复由同一个区间索引按串行顺序剔除
+                for candidates in pool.map(_shard_candidates, bounds[:-1].tolist(), bounds[1:].tolist()):
+                    for direction, *found in candidates:
+                        self._record(direction, *found)
+        finally:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+        
+        self._finish_detection()
         return self.opportunities
     
+    def _detection_params(self):
+        """产出候选所需的检测参数（并行检测时传给工作进程）"""
+        return dict(
+            min_release_pips=self.min_release_pips,
+            min_release_angle=self.min_release_angle,
+            max_release_angle=self.max_release_angle,
+            max_retrace_ratio=self.max_retrace_ratio,
+            min_time_ratio=self.min_time_ratio,
+            touch_ratio_tolerance=self.touch_ratio_tolerance,
+            min_touch_points=self.min_touch_points,
+            zigzag_deviation=self.zigzag_deviation,
+            local_zigzag_deviation=self.local_zigzag_deviation,
+        )
+    
+    def _begin_detection(self):
+        """重置检测状态；转折点不足时直接生成空结果并返回 False"""
+        self._rows = []
+        self._touch_parts = []
+        self._touch_count = 0
+        self._seen = IntervalIndex(self.duplicate_window_ns)
+        
+        if len(self.pivot_pos) < 4:
+            print("ZigZag点位不足，无法进行检测")
+            self._finish_detection()
+            return False
+        
+        print(f"共找到 {len(self.pivot_pos)} 个ZigZag点位，开始分析...")
+        return True
+    
+    def _finish_detection(self):
+        """把检测过程中收集的行转成结构化数组（按信号时间排序），并导出字典列表"""
+        records = np.array(self._rows, dtype=OPPORTUNITY_DTYPE)
+        self.records = records[np.argsort(records['signal_pos'], kind='stable')]
+        if self._touch_parts:
+            self.touch_pos, self.touch_price, self.touch_kind = (np.concatenate(col) for col in zip(*self._touch_parts))
+        else:
+            self.touch_pos = np.empty(0, dtype=np.int64)
+            self.touch_price = np.empty(0, dtype=np.float64)
+            self.touch_kind = np.empty(0, dtype=np.int8)
+        del self._rows, self._touch_parts, self._seen
+        self.opportunities = self.export_opportunities()
+    
     def _detect_pattern(self, zigzag_start_idx, direction):
         """
         检测特定方向的交易模式
@@ -373,101 +562,192 @@ class EnergySystemDetector:
             zigzag_start_idx: ZigZag起点索引
             direction: 1=上三, -1=下三
         """
-        # 获取释放阶段的起止点
-        point1 = self.zigzag[zigzag_start_idx]
+        for found in self._pattern_candidates(zigzag_start_idx, direction):
+            self._record(direction, *found)
+    
+    def _pattern_candidates(self, zigzag_start_idx, direction):
+        """
+        逐个释放结束点产出候选 (释放, 积累长度, 触及点数组, 回撤比例)，尚未去重
+        
+        候选只依赖 K 线与全局转折点，与已登记的机会无关；去重由 _record 按遍历顺序进行，
+        所以并行检测可以分片产出候选，再在主进程按同样顺序登记，结果与串行一致
+        """
+        pivot_pos, pivot_kind = self.pivot_pos, self.pivot_kind
         
         # 上三：从低点到高点；下三：从高点到低点
-        if direction == 1 and point1[2] != -1:  # 上三需要从低点开始
+        if direction == 1 and pivot_kind[zigzag_start_idx] != -1:  # 上三需要从低点开始
             return
-        if direction == -1 and point1[2] != 1:  # 下三需要从高点开始
+        if direction == -1 and pivot_kind[zigzag_start_idx] != 1:  # 下三需要从高点开始
             return
         
         # 寻找释放结束点
-        for j in range(zigzag_start_idx + 1, min(zigzag_start_idx + 4, len(self.zigzag))):
-            point2 = self.zigzag[j]
-            
+        for j in range(zigzag_start_idx + 1, min(zigzag_start_idx + 4, len(pivot_pos))):
             # 验证释放方向
-            if direction == 1 and point2[2] != 1:  # 上三释放结束在高点
+            if direction == 1 and pivot_kind[j] != 1:  # 上三释放结束在高点
                 continue
-            if direction == -1 and point2[2] != -1:  # 下三释放结束在低点
+            if direction == -1 and pivot_kind[j] != -1:  # 下三释放结束在低点
                 continue
             
             # 验证释放阶段
-            is_valid, release_info = self._is_valid_release(
-                point1[0], point2[0], direction
-            )
+            release = self._is_valid_release(int(pivot_pos[zigzag_start_idx]), int(pivot_pos[j]), direction)
             
-            if not is_valid:
+            if release is None:
                 continue
             
             # 寻找积累阶段
-            release_end_pos = self.df.index.get_loc(point2[0])
+            release_end_pos = release.end_pos
             
             # 积累阶段应该至少是释放时间的2倍
-            min_accumulation_bars = int(release_info['bars'] * self.min_time_ratio)
-            max_accumulation_bars = int(release_info['bars'] * 5)  # 不超过5倍
+            min_accumulation_bars = int(release.bars * self.min_time_ratio)
+            max_accumulation_bars = int(release.bars * 5)  # 不超过5倍
             
             # 检查是否有足够的数据
-            if release_end_pos + min_accumulation_bars >= len(self.df):
+            if release_end_pos + min_accumulation_bars >= len(self.close):
                 continue
             
-            # 尝试不同长度的积累阶段
-            for acc_len in range(min_accumulation_bars, 
-                                min(max_accumulation_bars, len(self.df) - release_end_pos)):
-                
-                acc_start = release_end_pos
-                acc_end = release_end_pos + acc_len
-                
-                if acc_end >= len(self.df):
-                    break
-                
-                df_accumulation = self.df.iloc[acc_start:acc_end+1]
-                
-                # 寻找三角形触及点
-                touches = self._find_triangle_touches(df_accumulation, direction)
-                
-                if len(touches) < self.min_touch_points:
-                    continue
-                
-                # 验证三角形
-                is_valid_tri, triangle_info = self._validate_triangle(touches, release_info)
-                
-                if not is_valid_tri:
-                    continue
-                
-                # 计算时间比例
-                time_ratio = acc_len / release_info['bars']
-                
-                if time_ratio < self.min_time_ratio:
-                    continue
-                
-                # 找到有效机会！
-                signal_time = self.df.index[acc_end]
-                
-                opportunity = {
-                    'type': '上三' if direction == 1 else '下三',
-                    'direction': direction,
-                    'signal_time': signal_time,
-                    'release_info': release_info,
-                    'triangle_info': triangle_info,
-                    'time_ratio': time_ratio,
-                    'acc_start_idx': self.df.index[acc_start],
-                    'acc_end_idx': signal_time,
-                    'entry_price': self.df.loc[signal_time, 'Close']
-                }
-                
-                # 避免重复添加相近的机会
-                is_duplicate = False
-                for existing in self.opportunities:
-                    if abs((existing['signal_time'] - signal_time).total_seconds()) < 3600 * 24:
-                        is_duplicate = True
-                        break
-                
-                if not is_duplicate:
-                    self.opportunities.append(opportunity)
-                    print(f"发现 {opportunity['type']} 机会: {signal_time}")
-                
-                break  # 找到一个有效的积累阶段后跳出
+            # 尝试不同长度的积累阶段：窗口逐根延长，局部 ZigZag 与三角形统计增量更新，
+            # 取第一个有效的积累长度
+            found = self._scan_accumulation(
+                release_end_pos, release, min_accumulation_bars,
+                min(max_accumulation_bars, len(self.close) - release_end_pos))
+            if found is None:
+                continue
+            yield (release,) + found
+    
+    def _record(self, direction, release, acc_len, touches, retrace_ratio):
+        """登记一个候选：与已有机会重复时丢弃"""
+        # 找到有效机会！
+        release_end_pos = release.end_pos
+        signal_pos = release_end_pos + acc_len
+        
+        # 避免重复添加相近的机会（有序区间索引，二分判重）
+        if not self._add_unique(release_end_pos, signal_pos):
+            return
+        
+        touch_start = self._touch_count
+        self._touch_parts.append(touches)
+        self._touch_count += len(touches[0])
+        self._rows.append((
+            direction, signal_pos, release.start_pos, release_end_pos,
+            release.start_price, release.end_price, release.amplitude_pips, release.angle,
+            acc_len / release.bars, self.close[signal_pos], retrace_ratio,
+            touch_start, self._touch_count,
+        ))
+        print(f"发现 {'上三' if direction == 1 else '下三'} 机会: {self.index[signal_pos]}")
+    
+    def _add_unique(self, acc_start, signal_pos):
+        """按 duplicate_mode 判重，不重复时登记并返回 True"""
+        signal_ns = int(self.times_ns[signal_pos])
+        if self.duplicate_mode == 'span':
+            return self._seen.add(int(self.times_ns[acc_start]), signal_ns)
+        return self._seen.add(signal_ns)
+    
+    def _scan_accumulation(self, acc_start, release, min_len, max_len):
+        """
+        从释放结束点开始逐根延长积累窗口，返回第一个有效的 (积累长度, 触及点数组, 回撤比例)，没有则 None
+        
+        与逐个长度切片重算等价：窗口 [acc_start, acc_start+L] 的局部 ZigZag 等于
+        LiveZigZag 喂入这 L+1 根后的已定型点加暂定点（见 src/strategies/zigzag.py），
+        三角形统计由 TriangleStats 增量维护，只有通过全部快速检查的窗口才构造触及点数组做最终验证。
+        已定型触及点的价格极差只增不减，一旦超过回撤上限，更长的窗口都不可能有效，提前结束。
+        
+        参数:
+            acc_start: 积累起点位置（释放结束点）
+            release: 释放阶段信息
+            min_len, max_len: 积累长度范围 [min_len, max_len)
+        """
+        if max_len <= min_len:
+            return None
+        highs = self.high[acc_start:acc_start + max_len].tolist()
+        lows = self.low[acc_start:acc_start + max_len].tolist()
+        release_amplitude = abs(release.end_price - release.start_price)
+        if release_amplitude <= 0:
+            return None
+        # 变异系数的增量算法与 np.std 可能差最后几位，留出余量，边界情况交给最终验证
+        cv_limit = self.touch_ratio_tolerance * (1 + 1e-9) + 1e-12
+        
+        live = LiveZigZag(self.local_zigzag_deviation)
+        stats = TriangleStats()
+        confirmed_pos, confirmed_price, confirmed_kind = [], [], []
+        for acc_len in range(max_len):
+            for ev in live.update(highs[acc_len], lows[acc_len]):
+                if ev.event == 'confirmed':
+                    confirmed_pos.append(acc_start + ev.index)
+                    confirmed_price.append(ev.price)
+                    confirmed_kind.append(ev.kind)
+                    stats.append(ev.index, ev.price, ev.kind)
+            if acc_len < min_len:
+                continue
+            if stats.count and (stats.max_price - stats.min_price) / release_amplitude > self.max_retrace_ratio:
+                break
+            if acc_len / release.bars < self.min_time_ratio:
+                continue
+            tentative = live.tentative
+            if tentative is None:
+                continue
+            count, n_high, n_low, high_slope, low_slope, cv, spread = stats.evaluate(
+                (tentative.index, tentative.price, tentative.kind))
+            if count < self.min_touch_points or n_high < 2 or n_low < 2:
+                continue
+            if not (high_slope < 0 and low_slope > 0):
+                continue
+            if count > 2 and cv > cv_limit:
+                continue
+            if spread / release_amplitude > self.max_retrace_ratio:
+                continue
+            
+            # 最终验证沿用 _validate_triangle
+            pos = np.array(confirmed_pos + [acc_start + tentative.index], dtype=np.int64)
+            price = np.array(confirmed_price + [tentative.price], dtype=np.float64)
+            kind = np.array(confirmed_kind + [tentative.kind], dtype=np.int8)
+            is_valid_tri, retrace_ratio = self._validate_triangle(pos, price, kind, release)
+            if is_valid_tri:
+                return acc_len, (pos, price, kind), retrace_ratio
+        return None
+    
+    def export_opportunities(self):
+        """
+        把结构化结果导出为字典列表（时间戳、价格在这里映射，供绘图、汇总和外部调用使用）
+        
+        返回:
+            [{'type', 'direction', 'signal_time', 'release_info', 'triangle_info', ...}, ...]
+        """
+        index = self.index
+        result = []
+        for rec in self.records:
+            direction = int(rec['direction'])
+            start_pos, end_pos, signal_pos = int(rec['release_start_pos']), int(rec['release_end_pos']), int(rec['signal_pos'])
+            a, b = int(rec['touch_start']), int(rec['touch_end'])
+            pos, price, kind = self.touch_pos[a:b], self.touch_price[a:b], self.touch_kind[a:b]
+            touches = [(index[p], price[k], int(kind[k])) for k, p in enumerate(pos)]
+            signal_time = index[signal_pos]
+            result.append({
+                'type': '上三' if direction == 1 else '下三',
+                'direction': direction,
+                'signal_time': signal_time,
+                'release_info': {
+                    'start_idx': index[start_pos],
+                    'end_idx': index[end_pos],
+                    'start_price': rec['release_start_price'],
+                    'end_price': rec['release_end_price'],
+                    'amplitude_pips': rec['amplitude_pips'],
+                    'angle': rec['angle'],
+                    'bars': end_pos - start_pos,
+                    'direction': direction
+                },
+                'triangle_info': {
+                    'touches': touches,
+                    'highs': [(t[0], t[1]) for t in touches if t[2] == 1],
+                    'lows': [(t[0], t[1]) for t in touches if t[2] == -1],
+                    'retrace_ratio': rec['retrace_ratio'],
+                    'is_converging': True
+                },
+                'time_ratio': float(rec['time_ratio']),
+                'acc_start_idx': index[end_pos],
+                'acc_end_idx': signal_time,
+                'entry_price': rec['entry_price']
+            })
+        return result
     
     def plot_opportunity(self, opportunity, save_path=None, show_bars=100):
         """
@@ -634,63 +914,54 @@ class EnergySystemDetector:
         return len(self.opportunities)
 
 
-def load_forex_data(filepath):
+# 并行检测工作进程内的检测器（每个进程在初始化时建立一次）
+_SHARD_DETECTOR = None
+
+
+def _init_shard_worker(path, pivots, params):
+    """工作进程初始化：内存映射打开 K 线，用主进程的全局转折点建立检测器"""
+    global _SHARD_DETECTOR
+    archive = BarArchive(path)
+    _SHARD_DETECTOR = EnergySystemDetector(bars_to_frame(archive.slice()), pivot_cache=False,
+                                           pivots=pivots, **params)
+
+
+def _shard_candidates(start, end):
+    """ZigZag 起点索引 [start, end) 的全部候选，按串行遍历顺序 (起点, 方向, 释放结束点) 排列"""
+    detector = _SHARD_DETECTOR
+    candidates = []
+    for i in range(start, end):
+        for direction in (1, -1):
+            for found in detector._pattern_candidates(i, direction):
+                candidates.append((direction,) + found)
+    return candidates
+
+
+def load_forex_data(filepath, start=None, end=None):
     """
     加载外汇数据
     
     支持常见的CSV格式，特别是无表头的MT4/MT5导出格式
     格式: Date, Time, Open, High, Low, Close, Volume, ...
     示例: 2024.01.01,22:00,1.10427,1.10429,1.10425,1.10429,5900000,...
-    """
-    import pandas as pd
     
-    # 尝试读取前几行来判断格式
+    首次读取时转换为同名 .bars 列式缓存，之后直接读取二进制列；
+    给定 [start, end) 时只读取该窗口（CSV 借助稀疏行索引只解析窗口内的字节）
+    """
     try:
-        # 先尝试读取一行
-        with open(filepath, 'r') as f:
-            first_line = f.readline()
-        
-        # 检查是否包含表头关键字
-        has_header = any(x in first_line.lower() for x in ['date', 'time', 'open', 'close'])
-        
-        if has_header:
-            df = pd.read_csv(filepath)
-            # 标准化列名
-            col_mapping = {
-                'time': 'Time', 'date': 'Time', 'datetime': 'Time',
-                'open': 'Open', 'high': 'High', 'low': 'Low', 'close': 'Close',
-                'volume': 'Volume', 'vol': 'Volume'
-            }
-            df.columns = [col_mapping.get(c.lower(), c) for c in df.columns]
+        if start is not None or end is not None:
+            bars = load_window(filepath, start, end)
         else:
-            # 无表头，使用默认列名
-            # 假设格式: Date, Time, Open, High, Low, Close, Volume, ...
-            df = pd.read_csv(filepath, header=None)
-            
-            # 根据列数分配列名
-            if len(df.columns) >= 7:
-                df.columns = ['Date', 'TimeStr', 'Open', 'High', 'Low', 'Close', 'Volume'] + [f'Col_{i}' for i in range(7, len(df.columns))]
-                
-                # 合并日期和时间
-                # 处理日期格式 2024.01.01
-                df['Date'] = df['Date'].astype(str).str.replace('.', '-')
-                df['Time'] = pd.to_datetime(df['Date'] + ' ' + df['TimeStr'])
-            else:
-                print("警告: CSV列数不足，无法识别")
-                return None
-        
-        # 设置索引
-        if 'Time' in df.columns:
-            if not pd.api.types.is_datetime64_any_dtype(df['Time']):
-                df['Time'] = pd.to_datetime(df['Time'])
-            df.set_index('Time', inplace=True)
-            return df
-            
+            bars = load_bars(filepath)
     except Exception as e:
         print(f"读取文件出错: {e}")
         return None
     
-    return df
+    if len(bars['time']) == 0:
+        print("警告: 文件中没有可识别的K线")
+        return None
+    
+    return bars_to_frame(bars)
 
 
 def generate_sample_data(start_date='2024-01-01', end_date='2025-01-01'):
@@ -10,6 +10,12 @@
 4. polygon.io (需要API key，数据质量高)
 5. Dukascopy (免费Tick数据，需要转换)
 
+并发模式（fetch_auto(concurrent=True) / fetch_race）：
+- 所有数据源同时启动，各自有独立超时；按优先级取第一个有效结果，其余取消/放弃
+- 结果写入按 (数据源, 品种, 周期, 区间) 内容寻址的磁盘缓存（Data/fetch_cache/*.bars），
+  重复的研究运行直接读缓存，不再访问网络
+- StubProvider 提供离线桩数据源，可在无网络环境下验证优先级、超时与缓存
+
 作者: AI Assistant
 日期: 2024
 """
@@ -24,12 +30,121 @@ if sys.platform == 'win32':
     except:
         pass
 
+import hashlib
+import json
+import time
 import pandas as pd
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 from datetime import datetime, timedelta
+from pathlib import Path
 import warnings
 warnings.filterwarnings('ignore')
 
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.data_loader import bars_to_frame, read_bars, write_bars
+
+CACHE_DIR = PROJECT_ROOT / "Data" / "fetch_cache"
+
+# 并发模式下各数据源的超时（秒）
+PROVIDER_TIMEOUTS = {
+    'mt5': 30,
+    'investpy': 20,
+    'yfinance': 20,
+    'yahooquery': 20,
+    'polygon': 30,
+}
+
+
+def _is_valid(df):
+    return df is not None and len(df) > 0
+
+
+class FetchCache:
+    """
+    数据源结果的磁盘缓存
+    
+    键由 (provider, symbol, timeframe, start_date, end_date) 的内容哈希得到，
+    每个结果存为一个 .bars 文件，元数据中保留完整的键，便于核对
+    """
+    
+    def __init__(self, root=CACHE_DIR):
+        self.root = Path(root)
+    
+    @staticmethod
+    def key(provider, symbol, timeframe, start_date, end_date):
+        content = json.dumps([provider, symbol, timeframe, str(start_date), str(end_date)])
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()[:20]
+    
+    def path_for(self, provider, symbol, timeframe, start_date, end_date):
+        key = self.key(provider, symbol, timeframe, start_date, end_date)
+        safe_symbol = ''.join(ch if ch.isalnum() else '_' for ch in symbol)
+        return self.root / f"{provider}_{safe_symbol}_{timeframe}_{key}.bars"
+    
+    def get(self, provider, symbol, timeframe, start_date, end_date):
+        """命中返回 DataFrame（Open/High/Low/Close/Volume，UTC 时间索引），否则 None"""
+        path = self.path_for(provider, symbol, timeframe, start_date, end_date)
+        if not path.exists():
+            return None
+        try:
+            return bars_to_frame(read_bars(path))
+        except (OSError, ValueError):
+            return None
+    
+    @staticmethod
+    def to_bars(df):
+        """数据源结果 -> 列式数组：时间转为 UTC 秒（去掉时区），只保留 OHLCV 列并转为 float64"""
+        index = pd.DatetimeIndex(df.index)
+        if index.tz is not None:
+            index = index.tz_convert('UTC').tz_localize(None)
+        bars = {'time': index.values.astype('datetime64[s]').astype(np.int64)}
+        for col in ['Open', 'High', 'Low', 'Close', 'Volume']:
+            bars[col.lower()] = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=np.float64)
+        return bars
+    
+    def put(self, provider, symbol, timeframe, start_date, end_date, df):
+        meta = {'provider': provider, 'symbol': symbol, 'timeframe': timeframe,
+                'start_date': str(start_date), 'end_date': str(end_date)}
+        return write_bars(self.path_for(provider, symbol, timeframe, start_date, end_date),
+                          self.to_bars(df), meta=meta)
+
+
+class StubProvider:
+    """
+    离线桩数据源：按指定延迟返回合成数据、空结果或抛出异常
+    
+    用法：
+        providers = [('mt5', StubProvider(delay=5)), ('yfinance', StubProvider(delay=0.1))]
+        ForexDataFetcher.fetch_race('EURUSD', providers=providers, timeouts={'mt5': 1})
+    """
+    
+    def __init__(self, df=None, delay=0.0, fail=False, empty=False):
+        self.df = df
+        self.delay = delay
+        self.fail = fail
+        self.empty = empty
+        self.calls = 0
+    
+    def __call__(self, symbol, timeframe, start_date, end_date):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("stub provider failure")
+        if self.empty:
+            return pd.DataFrame(columns=['Open', 'High', 'Low', 'Close', 'Volume'])
+        if self.df is not None:
+            return self.df
+        freq = {'M1': '1min', 'M5': '5min', 'M15': '15min', 'M30': '30min',
+                'H1': '1h', 'H4': '4h', 'D1': '1D'}.get(timeframe, '1h')
+        index = pd.date_range(start_date, end_date, freq=freq, inclusive='left', name='Time')
+        rng = np.random.default_rng(0)
+        close = 1.08 + np.cumsum(rng.normal(0, 0.0005, len(index)))
+        return pd.DataFrame({'Open': close, 'High': close + 0.0003, 'Low': close - 0.0003,
+                             'Close': close, 'Volume': 100.0}, index=index)
+
 
 class ForexDataFetcher:
     """外汇数据获取器 - 统一接口"""
@@ -357,10 +472,106 @@ class ForexDataFetcher:
             print(f"❌ Polygon.io获取数据失败: {e}")
             return None
     
+    @staticmethod
+    def providers(symbol='EURUSD', timeframe='H1', polygon_api_key=None):
+        """
+        按优先级排列的数据源 [(名称, fetch(symbol, timeframe, start_date, end_date)), ...]
+        
+        各数据源的品种/周期写法在这里统一转换，与 fetch_auto 顺序模式一致
+        """
+        interval = {'H1': '1h', 'H4': '4h', 'D1': '1d'}.get(timeframe, '1h')
+        chain = [
+            ('mt5', lambda s, tf, a, b: ForexDataFetcher.fetch_from_mt5(s, tf, a, b)),
+            ('investpy', lambda s, tf, a, b: ForexDataFetcher.fetch_from_investpy(s[:3] + '/' + s[3:], tf, a, b)),
+            ('yfinance', lambda s, tf, a, b: ForexDataFetcher.fetch_from_yfinance(s + '=X', a, b, interval)),
+            ('yahooquery', lambda s, tf, a, b: ForexDataFetcher.fetch_from_yahooquery(s + '=X', a, b, interval)),
+        ]
+        if polygon_api_key:
+            timespan = {'H1': 'hour', 'H4': 'hour', 'D1': 'day'}.get(timeframe, 'hour')
+            multiplier = 4 if timeframe == 'H4' else 1
+            chain.append(('polygon', lambda s, tf, a, b: ForexDataFetcher.fetch_from_polygon(
+                polygon_api_key, f'C:{s}', a, b, timespan, multiplier)))
+        return chain
+    
+    @staticmethod
+    def fetch_race(symbol='EURUSD', timeframe='H1',
+                   start_date='2024-01-01', end_date='2025-01-01',
+                   polygon_api_key=None, providers=None, timeouts=None, cache=True):
+        """
+        并发获取：所有数据源同时启动，按优先级取第一个有效结果
+        
+        参数:
+            providers: [(名称, fetch), ...]，默认 ForexDataFetcher.providers(...)；可传入 StubProvider
+            timeouts: {名称: 秒}，覆盖 PROVIDER_TIMEOUTS；超时从同一起点计时，互不累加
+            cache: True 使用默认缓存目录，False 关闭，也可传入 FetchCache 实例
+        
+        返回:
+            DataFrame（Open/High/Low/Close/Volume，UTC 时间索引，与缓存命中时的形式相同）或 None
+        """
+        if providers is None:
+            providers = ForexDataFetcher.providers(symbol, timeframe, polygon_api_key)
+        timeouts = dict(PROVIDER_TIMEOUTS, **(timeouts or {}))
+        if cache is True:
+            cache = FetchCache()
+        request = (symbol, timeframe, start_date, end_date)
+        
+        # 1. 缓存：按优先级取第一个命中的结果，完全不访问网络
+        if cache:
+            for name, _ in providers:
+                df = cache.get(name, *request)
+                if _is_valid(df):
+                    print(f"✓ 缓存命中: {name} ({len(df)} 条)")
+                    return df
+        
+        # 2. 并发启动全部数据源
+        pool = ThreadPoolExecutor(max_workers=len(providers), thread_name_prefix='fetch')
+        started = time.monotonic()
+        futures = [(name, pool.submit(fetch, *request)) for name, fetch in providers]
+        result = None
+        try:
+            # 按优先级依次等待：高优先级失败或超时后才采用低优先级的结果
+            # （低优先级先返回的结果保存在 future 中，不会丢失）
+            for name, future in futures:
+                remaining = started + timeouts.get(name, 30) - time.monotonic()
+                try:
+                    df = future.result(timeout=max(0.0, remaining))
+                except FutureTimeout:
+                    print(f"⏱ {name} 超时")
+                    continue
+                except Exception as e:
+                    print(f"❌ {name} 失败: {e}")
+                    continue
+                if not _is_valid(df):
+                    continue
+                # 按缓存的形式规范化，返回结果与是否命中缓存无关
+                try:
+                    df = bars_to_frame(FetchCache.to_bars(df))
+                except (KeyError, ValueError, TypeError) as e:
+                    print(f"❌ {name} 数据格式无效: {e}")
+                    continue
+                print(f"✓ 采用数据源: {name}")
+                result = (name, df)
+                break
+        finally:
+            # 取消尚未开始的请求；已在运行的线程无法强制终止，放弃其结果
+            for _, future in futures:
+                future.cancel()
+            pool.shutdown(wait=False, cancel_futures=True)
+        
+        if result is None:
+            return None
+        name, df = result
+        if cache:
+            try:
+                cache.put(name, *request, df)
+            except (OSError, KeyError, ValueError) as e:
+                print(f"⚠️ 无法写入缓存: {e}")
+        return df
+    
     @staticmethod
     def fetch_auto(symbol='EURUSD', timeframe='H1', 
                    start_date='2024-01-01', end_date='2025-01-01',
-                   polygon_api_key=None):
+                   polygon_api_key=None, concurrent=False, cache=True):
         """
         自动尝试多个数据源（按优先级）
         
@@ -370,7 +581,13 @@ class ForexDataFetcher:
         3. yfinance
         4. yahooquery
         5. polygon.io (如果提供API key)
+        
+        concurrent=True 时改用 fetch_race：并发启动、独立超时、结果缓存
         """
+        if concurrent:
+            return ForexDataFetcher.fetch_race(symbol, timeframe, start_date, end_date,
+                                               polygon_api_key=polygon_api_key, cache=cache)
+        
         print("=" * 60)
         print("自动获取EURUSD历史数据")
         print("=" * 60)
@@ -460,6 +677,9 @@ def main():
     # 方式2：手动指定数据源（如果自动失败）
     # ========================================
     
+    # # 并发获取：各数据源同时启动，结果缓存到 Data/fetch_cache，重复运行不再联网
+    # df = ForexDataFetcher.fetch_auto('EURUSD', 'H1', '2024-01-01', '2025-01-01', concurrent=True)
+    
     # # 从MT5获取（最推荐）
     # df = ForexDataFetcher.fetch_from_mt5('EURUSD', 'H1', '2024-01-01', '2025-01-01')
     
@@ -2,36 +2,190 @@
 """
 iTick外汇历史数据获取工具
 获取EURUSD 2024-01-01 至 2025-01-01 的历史数据
+
+长区间日内数据用 backfill()：
+    - 区间按月切段，每段以 et 游标向过去翻页（每页 page_size 根）
+    - 复用同一个 requests.Session（连接保持），同时进行的请求数不超过 max_in_flight
+    - 所有请求共享一个令牌桶限流（rate 次/秒），429 时退避重试
+    - 每页取到后立即写入分区数据集（src/data_loader/partitioned.py），不在内存中累积
+本地验证可使用 itick_stub_server.ITickStubServer
 """
 
+import sys
+import threading
+import time
 import requests
+import numpy as np
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from pathlib import Path
 import matplotlib.pyplot as plt
 import warnings
 warnings.filterwarnings('ignore')
 
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.data_loader import PartitionedDataset, format_epoch, month_windows
+
+# iTick K线周期 -> 数据集周期名
+KTYPE_TIMEFRAMES = {'1': 'M1', '2': 'M5', '3': 'M15', '4': 'M30', '5': 'H1', '8': 'D1'}
+
 # 设置中文字体
 plt.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei', 'DejaVu Sans']
 plt.rcParams['axes.unicode_minus'] = False
 
 
+class TokenBucket:
+    """线程安全的令牌桶：平均每秒 rate 个令牌，最多积累 capacity 个（默认 1，即不允许突发）"""
+    
+    def __init__(self, rate, capacity=1):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def acquire(self):
+        """取一个令牌，不足时阻塞等待"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
 class ITickForexData:
     """iTick外汇数据获取类"""
     
-    def __init__(self, api_key):
+    def __init__(self, api_key, base_url='https://api.itick.org/forex/kline'):
         """
         初始化
         
         参数:
             api_key: iTick API密钥
+            base_url: K线接口地址（本地验证时指向 ITickStubServer.url）
         """
         self.api_key = api_key
-        self.base_url = 'https://api.itick.org/forex/kline'
+        self.base_url = base_url
         self.headers = {
             'accept': 'application/json',
             'token': api_key
         }
+        self._session = None
+    
+    @property
+    def session(self):
+        """持久连接的 Session（首次使用时创建）"""
+        if self._session is None:
+            self._session = requests.Session()
+            self._session.headers.update(self.headers)
+        return self._session
+    
+    def fetch_page(self, symbol, ktype, et_ms, limit, region='GB', bucket=None, retries=3):
+        """
+        取 t <= et_ms 的最近 limit 根K线（一页）
+        
+        返回:
+            [{'t': 毫秒, 'o':.., 'h':.., 'l':.., 'c':.., 'v':..}, ...]
+        """
+        params = {'region': region, 'code': symbol, 'kType': ktype, 'et': int(et_ms), 'limit': int(limit)}
+        for attempt in range(retries + 1):
+            if bucket is not None:
+                bucket.acquire()
+            response = self.session.get(self.base_url, params=params, timeout=30)
+            if response.status_code == 429 and attempt < retries:
+                time.sleep(0.5 * 2 ** attempt)
+                continue
+            response.raise_for_status()
+            data = response.json()
+            if data.get('code') != 0:
+                raise RuntimeError(f"API返回错误: {data.get('msg', 'Unknown error')}")
+            return data.get('data') or []
+        raise RuntimeError("请求被持续限流 (429)")
+    
+    def _backfill_segment(self, symbol, ktype, lo, hi, page_size, region, bucket, sink):
+        """以 et 游标从 hi 向 lo 翻页，每页交给 sink 写入；返回写入根数"""
+        et = hi * 1000 - 1
+        total = 0
+        while True:
+            page = self.fetch_page(symbol, ktype, et, page_size, region, bucket)
+            if not page:
+                break
+            t = np.array([row['t'] for row in page], dtype=np.int64) // 1000
+            keep = (t >= lo) & (t < hi)
+            if keep.any():
+                rows = [row for row, k in zip(page, keep) if k]
+                sink({
+                    'time': t[keep],
+                    'open': np.array([row['o'] for row in rows], dtype=np.float64),
+                    'high': np.array([row['h'] for row in rows], dtype=np.float64),
+                    'low': np.array([row['l'] for row in rows], dtype=np.float64),
+                    'close': np.array([row['c'] for row in rows], dtype=np.float64),
+                    'volume': np.array([row.get('v', 0) for row in rows], dtype=np.float64),
+                })
+                total += int(keep.sum())
+            oldest = int(t.min())
+            # 已越过段起点、返回不足一页（没有更早的数据）或游标不再前进时结束
+            if oldest <= lo or len(page) < page_size or oldest * 1000 - 1 >= et:
+                break
+            et = oldest * 1000 - 1
+        return total
+    
+    def backfill(self, dataset, symbol='EURUSD', ktype='1', start_date='2024-01-01', end_date='2025-01-01',
+                 region='GB', page_size=1000, max_in_flight=4, rate=10, timeframe=None):
+        """
+        回补长区间K线并直接写入分区数据集
+        
+        参数:
+            dataset: PartitionedDataset 或数据集目录
+            symbol, ktype, region: 同 get_historical_data
+            start_date, end_date: 区间 [start_date, end_date)
+            page_size: 每页根数（iTick 的 limit）
+            max_in_flight: 同时进行的请求数上限（按月分段并行，段内翻页是串行的）
+            rate: 令牌桶速率（请求/秒），所有段共享
+            timeframe: 写入数据集的周期名，默认由 ktype 推断
+        
+        返回:
+            写入的K线根数
+        """
+        if not isinstance(dataset, PartitionedDataset):
+            dataset = PartitionedDataset(dataset)
+        timeframe = timeframe or KTYPE_TIMEFRAMES[ktype]
+        bucket = TokenBucket(rate)
+        write_lock = threading.Lock()
+        
+        def sink(bars):
+            # 不同段的页可能落在同一个月份分区：写入串行化，保证合并-替换的原子性
+            with write_lock:
+                dataset.write(symbol, timeframe, bars)
+        
+        segments = month_windows(start_date, end_date)
+        print(f"正在从iTick回补 {symbol} {self._get_ktype_name(ktype)}: {len(segments)} 段, "
+              f"并发 {max_in_flight}, 限速 {rate} 次/秒")
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max_in_flight)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        
+        total = 0
+        with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+            futures = [pool.submit(self._backfill_segment, symbol, ktype, lo, hi, page_size, region, bucket, sink)
+                       for _, lo, hi in segments]
+            for (key, _, _), future in zip(segments, futures):
+                n = future.result()
+                total += n
+                print(f"  ✓ {key}: {n} 条")
+        
+        last = dataset.last_time(symbol, timeframe)
+        print(f"✓ 回补完成，共 {total} 条" + (f"，最新 {format_epoch(last)}" if last else ""))
+        return total
     
     def get_historical_data(self, symbol='EURUSD', ktype='8', 
                            start_date='2024-01-01', end_date='2025-01-01',
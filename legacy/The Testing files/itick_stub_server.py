@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+iTick K线接口的本地替身服务器
+
+模拟 GET /forex/kline?region=GB&code=EURUSD&kType=1&et=<毫秒>&limit=<N>：
+    - 返回 t <= et 的最近 limit 根合成 K 线（按时间升序，周末无数据），格式与 iTick 一致：
+      {"code": 0, "msg": "ok", "data": [{"t": 毫秒, "o": .., "h": .., "l": .., "c": .., "v": ..}, ...]}
+    - 校验 token 请求头
+    - 超过每秒请求数上限时返回 429（用于验证客户端限流）
+    - 记录请求总数、429 次数和同时处理中的最大请求数（用于验证并发上限）
+
+用法：
+    with ITickStubServer(rate_limit=20) as server:
+        itick = ITickForexData("test-key", base_url=server.url)
+        itick.backfill(dataset, "EURUSD", "1", "2024-01-01", "2024-03-01")
+        print(server.stats)
+
+    命令行：py "The Testing files/itick_stub_server.py" --port 8765
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+KTYPE_SECONDS = {'1': 60, '2': 300, '3': 900, '4': 1800, '5': 3600, '8': 86400}
+EPOCH_START = 1577836800  # 2020-01-01 00:00 UTC，合成行情的起点
+
+
+def synthetic_bar(index: np.ndarray) -> dict:
+    """第 index 根合成 K 线（由序号确定，多次请求结果一致）"""
+    drift = np.sin(index / 500.0) * 0.02 + np.cos(index / 37.0) * 0.002
+    close = np.round(1.08 + drift, 5)
+    return {
+        'o': np.round(close - 0.0001, 5),
+        'h': np.round(close + 0.0003, 5),
+        'l': np.round(close - 0.0004, 5),
+        'c': close,
+        'v': (index % 97 + 10).astype(float),
+    }
+
+
+class ITickStubServer:
+    """在后台线程运行的 iTick 替身服务器"""
+
+    def __init__(self, host='127.0.0.1', port=0, token='test-key', rate_limit=None, latency=0.0, now=None):
+        """
+        参数:
+            port: 0 表示自动分配
+            token: 期望的 token 请求头
+            rate_limit: 每秒允许的请求数，超过返回 429；None 表示不限
+            latency: 每个请求的处理延迟（秒），用于观察并发
+            now: 最新一根 K 线的时间（纪元秒），默认当前时间
+        """
+        self.token = token
+        self.rate_limit = rate_limit
+        self.latency = latency
+        self.now = int(now if now is not None else time.time())
+        self.stats = {'requests': 0, 'throttled': 0, 'in_flight': 0, 'max_in_flight': 0}
+        self._lock = threading.Lock()
+        self._window = []
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}/forex/kline'
+
+    def bars_before(self, ktype: str, et_ms: int, limit: int) -> list:
+        step = KTYPE_SECONDS[ktype]
+        last = min(et_ms // 1000, self.now) // step * step
+        # 多取 limit 的两倍再加 3 天，保证跨周末时仍能凑满一页
+        times = np.arange(last - step * limit * 2 - 3 * 86400, last + 1, step, dtype=np.int64)
+        times = times[(times >= EPOCH_START) & (((times // 86400 + 3) % 7) < 5)][-limit:]
+        cols = synthetic_bar((times - EPOCH_START) // step)
+        return [{'t': int(t) * 1000, **{k: float(v[i]) for k, v in cols.items()}}
+                for i, t in enumerate(times)]
+
+    def _throttled(self) -> bool:
+        if self.rate_limit is None:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            self._window = [t for t in self._window if now - t < 1.0]
+            if len(self._window) >= self.rate_limit:
+                self.stats['throttled'] += 1
+                return True
+            self._window.append(now)
+        return False
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, payload):
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                with server._lock:
+                    server.stats['requests'] += 1
+                    server.stats['in_flight'] += 1
+                    server.stats['max_in_flight'] = max(server.stats['max_in_flight'], server.stats['in_flight'])
+                try:
+                    if server.latency:
+                        time.sleep(server.latency)
+                    if self.headers.get('token') != server.token:
+                        return self._send(401, {'code': 401, 'msg': 'invalid token'})
+                    if server._throttled():
+                        return self._send(429, {'code': 429, 'msg': 'too many requests'})
+                    q = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+                    ktype = q.get('kType', '8')
+                    if ktype not in KTYPE_SECONDS:
+                        return self._send(200, {'code': 1, 'msg': f'unsupported kType {ktype}'})
+                    data = server.bars_before(ktype, int(q.get('et', server.now * 1000)), int(q.get('limit', 100)))
+                    self._send(200, {'code': 0, 'msg': 'ok', 'data': data})
+                finally:
+                    with server._lock:
+                        server.stats['in_flight'] -= 1
+
+        return Handler
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='ITickStubServer', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local stand-in for the iTick forex kline API')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--rate-limit', type=int, default=None, help='requests per second before 429')
+    parser.add_argument('--latency', type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = ITickStubServer(port=args.port, rate_limit=args.rate_limit, latency=args.latency)
+    print(f"✓ iTick 替身服务器: {server.url} (token=test-key)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
@@ -15,9 +15,11 @@
     2) 回撤段：回撤幅度 <= 释放幅度的 1/2
     3) 累积段（三角形）：至少 3 个高低点交替（高-低-高-低-高），高点递降/低点递升
     4) 时间比：累积时间 >= 释放时间 * min_time_ratio
+下三（direction=-1）是价格取负后的镜像。条件在拐点数组的六点滑动窗口上以布尔掩码一次算完（scan_six_pivots）。
 """
 
 import os
+import sys
 import math
 from pathlib import Path
 from typing import List, Tuple
@@ -27,6 +29,13 @@ import mplfinance as mpf
 import numpy as np
 import pandas as pd
 
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.data_loader import bars_to_frame, load_timeframe
+from src.strategies import THREE, PivotCache, data_fingerprint, timeframe_of
+
 ROOT = Path(__file__).resolve().parent.parent
 SRC = ROOT / "Data" / "split_by_year" / "EURUSD_2024.csv"
 OUT_DIR = ROOT / "Data" / "pattern_snapshots"
@@ -34,26 +43,8 @@ OUT_DIR.mkdir(parents=True, exist_ok=True)
 
 
 def load_h1(csv_path: Path) -> pd.DataFrame:
-    """读取无表头 CSV，转为 H1 K 线"""
-    df = pd.read_csv(
-        csv_path,
-        header=None,
-        names=["Date", "Clock", "Open", "High", "Low", "Close", "Volume", "Volume2", "Extra"],
-    )
-    df["Time"] = pd.to_datetime(df["Date"].astype(str) + " " + df["Clock"].astype(str), errors="coerce")
-    df = df.dropna(subset=["Time"]).set_index("Time")
-    df = df[["Open", "High", "Low", "Close", "Volume"]]
-    # 重采样到 H1
-    h1 = df.resample("1H").agg(
-        {
-            "Open": "first",
-            "High": "max",
-            "Low": "min",
-            "Close": "last",
-            "Volume": "sum",
-        }
-    ).dropna()
-    return h1
+    """读取 H1 K 线（由 M1 聚合一次后缓存为 EURUSD_2024.H1.bars，见 src/data_loader/pyramid.py）"""
+    return bars_to_frame(load_timeframe(csv_path, "H1"))
 
 
 def zigzag(df: pd.DataFrame, pct: float = 0.003) -> List[Tuple[pd.Timestamp, float, int]]:
@@ -93,6 +84,25 @@ def zigzag(df: pd.DataFrame, pct: float = 0.003) -> List[Tuple[pd.Timestamp, flo
     return cleaned
 
 
+CLOSE_ZIGZAG_VERSION = "close-zigzag-1"  # zigzag() 规则变化时递增，使旧缓存失效
+
+
+def cached_zigzag(df: pd.DataFrame, pct: float, cache: PivotCache = None) -> List[Tuple[pd.Timestamp, float, int]]:
+    """带磁盘缓存的 zigzag：收盘价序列不变时直接读取上次的拐点（按位置存储，返回时映射回时间）"""
+    cache = cache or PivotCache()
+    close = df["Close"].to_numpy(dtype=np.float64)
+
+    def compute():
+        pivots = zigzag(df, pct)
+        pos = df.index.get_indexer([t for t, _, _ in pivots])
+        return (pos.astype(np.int64), np.array([p for _, p, _ in pivots], dtype=np.float64),
+                np.array([k for _, _, k in pivots], dtype=np.int8))
+
+    pos, price, kind = cache.get_or_compute(data_fingerprint(close), timeframe_of(df.index.values), pct, compute,
+                                            algo=CLOSE_ZIGZAG_VERSION)
+    return [(df.index[p], float(v), int(k)) for p, v, k in zip(pos, price, kind)]
+
+
 def angle_deg(p1: float, p2: float, bars: int) -> float:
     """估算角度：使用价格涨幅/价格 * 100 与时间的斜率，arctan 转角度"""
     if bars <= 0:
@@ -101,6 +111,53 @@ def angle_deg(p1: float, p2: float, bars: int) -> float:
     return abs(math.degrees(math.atan(slope)))
 
 
+SIX_PIVOT_DTYPE = np.dtype([
+    ("start", "i8"),          # 窗口第一个拐点在拐点数组中的下标
+    ("direction", "i1"),
+    ("release_pips", "f8"),
+    ("release_bars", "i8"),
+    ("angle", "f8"),
+    ("acc_bars", "i8"),
+])
+
+
+def scan_six_pivots(
+    times,
+    price,
+    kind,
+    direction: int = 1,
+    min_release_pips: float = 80,
+    min_release_angle: float = 45,
+    max_retrace_ratio: float = 0.5,
+    min_time_ratio: float = 2.0,
+) -> np.ndarray:
+    """
+    在拐点数组的六点滑动窗口上一次性判断全部条件，百万级拐点一次调用
+
+    条件即 src.strategies.pattern_rules.THREE 规则；下三是它的镜像（价格取负后条件完全相同）
+
+    参数:
+        times: 拐点时间（datetime64 或纳秒整数）
+        price, kind: 拐点价格与类型（1=高点，-1=低点）
+        direction: 1=上三，-1=下三
+        其余: 同 find_patterns
+
+    返回:
+        SIX_PIVOT_DTYPE 结构化数组，按窗口起点排序
+    """
+    times = np.asarray(times)
+    if not np.issubdtype(times.dtype, np.datetime64):
+        times = times.astype("datetime64[ns]")
+    hits = THREE.scan(times, price, kind, direction=direction,
+                      min_release_pips=min_release_pips, min_release_angle=min_release_angle,
+                      max_retrace_ratio=max_retrace_ratio, min_time_ratio=min_time_ratio)
+
+    out = np.empty(len(hits), dtype=SIX_PIVOT_DTYPE)
+    for name in SIX_PIVOT_DTYPE.names:
+        out[name] = hits[name]
+    return out
+
+
 def find_patterns(
     df: pd.DataFrame,
     pivots: List[Tuple[pd.Timestamp, float, int]],
@@ -108,55 +165,41 @@ def find_patterns(
     min_release_angle: float = 45,  # 最小释放角度
     max_retrace_ratio: float = 0.5, # 回撤不超过释放的 1/2
     min_time_ratio: float = 2.0,    # 累积时间 >= 释放时间 * 2
+    direction: int = 1,             # 1=上三，-1=下三，0=两者
 ) -> List[dict]:
-    results = []
-    for i in range(len(pivots) - 5):
-        t1, p1, tp1 = pivots[i]
-        t2, p2, tp2 = pivots[i + 1]
-        t3, p3, tp3 = pivots[i + 2]
-        t4, p4, tp4 = pivots[i + 3]
-        t5, p5, tp5 = pivots[i + 4]
-        t6, p6, tp6 = pivots[i + 5]
-
-        # 需要 低-高-低-高-低-高 的结构
-        if not (tp1 == -1 and tp2 == 1 and tp3 == -1 and tp4 == 1 and tp5 == -1 and tp6 == 1):
-            continue
-
-        # 释放段：t1->t2 上涨
-        release_pips = (p2 - p1) * 10000
-        release_bars = int((t2 - t1).total_seconds() / 3600)
-        if release_pips < min_release_pips or release_bars <= 0:
-            continue
-        ang = angle_deg(p1, p2, release_bars)
-        if ang < min_release_angle:
-            continue
-
-        # 回撤幅度
-        retrace_pips = (p2 - p3) * 10000
-        if retrace_pips < 0 or retrace_pips > release_pips * max_retrace_ratio:
-            continue
-
-        # 三角形高点递降，低点递升
-        if not (p4 < p2 and p6 < p2 and p4 < p6):
-            continue
-        if not (p3 < p5 < p2):
-            continue
-
-        # 累积时间
-        acc_bars = int((t6 - t2).total_seconds() / 3600)
-        if acc_bars < release_bars * min_time_ratio:
-            continue
+    """
+    在拐点序列上识别上三/下三（逐窗口条件见 scan_six_pivots）
+
+    返回:
+        字典列表（start / release_end / pattern_end 为拐点时间），两个方向时按起点时间排序
+    """
+    if not pivots:
+        return []
+    times = pd.DatetimeIndex([t for t, _, _ in pivots])
+    price = np.array([p for _, p, _ in pivots], dtype=np.float64)
+    kind = np.array([k for _, _, k in pivots], dtype=np.int8)
 
+    found = [scan_six_pivots(times.values, price, kind, d, min_release_pips, min_release_angle,
+                             max_retrace_ratio, min_time_ratio)
+             for d in ((1, -1) if direction == 0 else (direction,))]
+    found = np.concatenate(found)
+    found = found[np.argsort(found["start"], kind="stable")]
+
+    results = []
+    for rec in found:
+        i = int(rec["start"])
+        release_pips, release_bars, acc_bars = float(rec["release_pips"]), int(rec["release_bars"]), int(rec["acc_bars"])
         results.append(
             dict(
-                start=t1,
-                release_end=t2,
-                pattern_end=t6,
+                start=times[i],
+                release_end=times[i + 1],
+                pattern_end=times[i + 5],
                 release_pips=release_pips,
                 release_bars=release_bars,
-                angle=ang,
+                angle=float(rec["angle"]),
                 acc_bars=acc_bars,
                 acc_ratio=acc_bars / release_bars if release_bars else None,
+                direction=int(rec["direction"]),
             )
         )
     return results
@@ -169,7 +212,7 @@ def plot_pattern(df_h1: pd.DataFrame, res: dict, out_path: Path):
     df_sub = df_h1.loc[start - pd.Timedelta(hours=30): end + pd.Timedelta(hours=30)]
     addplots = []
     title = (
-        f"上三交易机会 | 释放: {res['start']} -> {res['release_end']} "
+        f"{'上三' if res.get('direction', 1) == 1 else '下三'}交易机会 | 释放: {res['start']} -> {res['release_end']} "
         f"| 累积结束: {res['pattern_end']} "
         f"| 幅度: {res['release_pips']:.1f}p | 角度: {res['angle']:.1f}° | 时间比: {res['acc_ratio']:.1f}x"
     )
@@ -190,7 +233,7 @@ def main():
         return
     df_h1 = load_h1(SRC)
     # 放宽条件：更敏感的拐点、较低的释放要求
-    pivots = zigzag(df_h1, pct=0.0015)  # 原 0.003，约 15p 波动识别拐点
+    pivots = cached_zigzag(df_h1, pct=0.0015)  # 原 0.003，约 15p 波动识别拐点
     patterns = find_patterns(
         df_h1,
         pivots,
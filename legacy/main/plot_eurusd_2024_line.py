@@ -11,6 +11,12 @@ import sys
 import pandas as pd
 import matplotlib.pyplot as plt
 
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.data_loader import bars_to_frame, load_timeframe
+
 # 项目根目录
 ROOT = Path(__file__).resolve().parent.parent
 SRC_FILE = ROOT / "Data" / "split_by_year" / "EURUSD_2024.csv"
@@ -22,58 +28,14 @@ def load_and_filter(csv_path: Path) -> pd.DataFrame:
         print(f"❌ 找不到数据文件: {csv_path}")
         sys.exit(1)
 
-    # 判断是否有表头
-    with open(csv_path, "r", encoding="utf-8") as f:
-        first_line = f.readline().strip().lower()
-    has_header = any(h in first_line for h in ["time", "date", "open", "high", "low", "close"])
-
-    if has_header:
-        df = pd.read_csv(csv_path)
-    else:
-        # 无表头，按常见tick格式：日期,时间,open,high,low,close,vol,...
-        df = pd.read_csv(
-            csv_path,
-            header=None,
-            names=[
-                "Date",
-                "Clock",
-                "Open",
-                "High",
-                "Low",
-                "Close",
-                "Volume",
-                "Volume2",
-                "Extra",
-            ],
-            engine="python",
-        )
-        df["Time"] = pd.to_datetime(df["Date"].astype(str) + " " + df["Clock"].astype(str), errors="coerce")
-
-    # 寻找时间列
-    time_col = None
-    for c in ["Time", "time", "Datetime", "datetime", "Date", "date"]:
-        if c in df.columns:
-            time_col = c
-            break
-    if time_col is None:
-        print("❌ 未找到时间列，请检查列名")
-        sys.exit(1)
-
-    df[time_col] = pd.to_datetime(df[time_col], errors="coerce")
-    df = df.dropna(subset=[time_col])
-    df = df.sort_values(time_col).set_index(time_col)
+    # 日线取自金字塔缓存（EURUSD_2024.D1.bars，由 M1 聚合一次后复用），Close 即每日最后一笔
+    df = bars_to_frame(load_timeframe(csv_path, "D1"))
 
     # 只保留2024年
-    df = df.loc[(df.index >= "2024-01-01") & (df.index <= "2024-12-31")]
-
-    # 如果是高频数据，按日取收盘价；如果已是日频，直接使用
-    if len(df) == 0:
+    df_daily = df.loc[df.index.year == 2024, ["Close"]]
+    if len(df_daily) == 0:
         print("❌ 过滤后无2024年的数据")
         sys.exit(1)
-
-    # 按日重采样，取每日最后一笔Close
-    df_daily = df.resample("D").agg({"Close": "last"})
-    df_daily = df_daily.dropna(subset=["Close"])
     return df_daily
 
 
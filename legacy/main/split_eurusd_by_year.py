@@ -5,94 +5,255 @@
 1) 有表头，时间列名包含 Time/Datetime/Date 等。
 2) 无表头，默认列顺序为：Date, Time/Clock, Open, High, Low, Close, Volume, ...
 
+流式单遍处理：
+    - 源文件按大块二进制读取一遍，行/字段边界用 NumPy 在字节数组上一次算出
+    - 年份直接取时间字段前 4 个字节；价格已是 5 位小数的块原样写出（不解析、不重新格式化）
+    - 只有价格位数不符或时间无法识别的块才交给 pandas 解析，并用 float_format 统一为 5 位小数
+    - 每个年份保持一个打开的缓冲写入器，不再逐块反复以追加模式打开文件
+    - 可选 --store：同时为每个年份写出 .bars 列式文件（见 src/data_loader/bar_store.py），
+      之后的加载器直接读取，无需再解析 CSV
+
 运行（项目根目录）：
-    py main/split_eurusd_by_year.py
+    py main/split_eurusd_by_year.py [--store]
 """
 
-import pandas as pd
+import argparse
+import io
+import sys
 from pathlib import Path
 
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.data_loader.bar_store import (
+    frame_to_bars,
+    has_header,
+    normalize_columns,
+    source_stamp,
+    store_path_for,
+    write_bars,
+)
+
 # 项目根目录
 ROOT = Path(__file__).resolve().parent.parent
 SRC_FILE = ROOT / "Data" / "EURUSD.csv"
 OUT_DIR = ROOT / "Data" / "split_by_year"
-CHUNK_SIZE = 200_000  # 分块读取行数，可按需调整
+BLOCK_SIZE = 32 << 20  # 每次读取的字节数，可按需调整
+WRITE_BUFFER = 1 << 20  # 每个年份写入器的缓冲区大小
 
 TIME_CANDIDATES = ["Time", "time", "Datetime", "datetime", "Date", "date"]
+LOCAL_COLUMNS = ["Date", "Clock", "Open", "High", "Low", "Close", "Volume", "Volume2", "Extra"]
+PRICE_COLUMNS = ["Open", "High", "Low", "Close"]
+PRICE_DECIMALS = 5
+
+_NL, _COMMA, _DOT, _ZERO = ord("\n"), ord(","), ord("."), ord("0")
 
 
 def ensure_out_dir():
     OUT_DIR.mkdir(parents=True, exist_ok=True)
     # 清理旧的拆分文件，避免混入此前写过的表头或重复数据
-    for f in OUT_DIR.glob("EURUSD_*.csv"):
-        try:
-            f.unlink()
-        except Exception:
-            pass
-
-
-def detect_header_and_read_chunk(chunk):
-    """尝试判断是否有表头；如果是首块且无表头，重新按无表头格式读取整个块"""
-    # 简单判断：若首行含 time/date/open 等字段名，视为有表头
-    first_row = chunk.iloc[0].astype(str).str.lower().tolist()
-    has_header = any(any(k in cell for k in ["time", "date", "open", "high", "low", "close"]) for cell in first_row)
-    if has_header:
-        return chunk, True
-    else:
-        # 无表头，按默认格式重新解析（日期+时间在前两列）
-        chunk.columns = [
-            "Date",
-            "Clock",
-            "Open",
-            "High",
-            "Low",
-            "Close",
-            "Volume",
-            "Volume2",
-            "Extra",
-        ][: len(chunk.columns)]
-        chunk["Time"] = pd.to_datetime(chunk["Date"].astype(str) + " " + chunk["Clock"].astype(str), errors="coerce")
-        return chunk, False
-
-
-def find_time_column(df):
+    for pattern in ("EURUSD_*.csv", "EURUSD_*.bars"):
+        for f in OUT_DIR.glob(pattern):
+            try:
+                f.unlink()
+            except Exception:
+                pass
+
+
+def find_time_column(columns):
     for c in TIME_CANDIDATES:
-        if c in df.columns:
+        if c in columns:
             return c
     return None
 
 
-def process_chunk(df, time_col):
-    df[time_col] = pd.to_datetime(df[time_col], errors="coerce")
-    df = df.dropna(subset=[time_col])
-    df["Year"] = df[time_col].dt.year
-    grouped = {}
-    for y, g in df.groupby("Year"):
-        grouped[y] = g.drop(columns=["Year"])
-    return grouped
-
-
-def append_grouped(grouped, header_known: bool):
-    for year, g in grouped.items():
-        out_path = OUT_DIR / f"EURUSD_{year}.csv"
-        # 对无表头的原始格式，去掉新增的 Time 列并不写表头
-        if not header_known:
-            if "Time" in g.columns:
-                g = g.drop(columns=["Time"])
-            write_header = False  # 强制不写表头
-        else:
-            write_header = not out_path.exists()
+def iter_blocks(f, block_size: int = BLOCK_SIZE):
+    """按块读取，每块都在换行符处截断，剩余部分并入下一块"""
+    carry = b""
+    while True:
+        data = f.read(block_size)
+        if not data:
+            break
+        data = carry + data
+        cut = data.rfind(b"\n") + 1
+        if cut == 0:
+            carry = data
+            continue
+        carry = data[cut:]
+        yield data[:cut]
+    if carry.strip():
+        yield carry + b"\n"
+
+
+def field_bounds(arr: np.ndarray):
+    """
+    计算块内每行每个字段的字节区间
+
+    返回:
+        (starts, ends) 形状均为 (行数, 字段数)；各行字段数不一致时返回 None
+    """
+    nl = np.flatnonzero(arr == _NL)
+    line_starts = np.concatenate(([0], nl[:-1] + 1))
+    line_ends = nl.copy()
+    # 兼容 \r\n
+    cr = (line_ends > line_starts) & (arr[np.maximum(line_ends - 1, 0)] == ord("\r"))
+    line_ends[cr] -= 1
+    keep = line_ends > line_starts
+    line_starts, line_ends = line_starts[keep], line_ends[keep]
+    if len(line_starts) == 0:
+        return None
+
+    commas = np.flatnonzero(arr == _COMMA)
+    per_line = np.searchsorted(commas, line_ends) - np.searchsorted(commas, line_starts)
+    n_commas = per_line[0]
+    if np.any(per_line != n_commas):
+        return None
+    lo = np.searchsorted(commas, line_starts)
+    inner = commas[lo[:, None] + np.arange(n_commas)] if n_commas else np.empty((len(lo), 0), dtype=np.int64)
+    starts = np.concatenate((line_starts[:, None], inner + 1), axis=1)
+    ends = np.concatenate((inner, line_ends[:, None]), axis=1)
+    return starts, ends
+
+
+def years_at(arr: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """字段前 4 个字节组成的年份；不是 4 位数字的记为 -1"""
+    ok = ends - starts >= 4
+    idx = np.minimum(starts[:, None] + np.arange(4), len(arr) - 1)
+    digits = arr[idx].astype(np.int64) - _ZERO
+    ok &= np.all((digits >= 0) & (digits <= 9), axis=1)
+    years = digits @ np.array([1000, 100, 10, 1])
+    return np.where(ok, years, -1)
+
+
+def prices_conform(arr: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> bool:
+    """价格字段是否都已是 PRICE_DECIMALS 位小数（小数点位于倒数第 6 个字节）"""
+    if starts.size == 0:
+        return True
+    dot = ends - PRICE_DECIMALS - 1
+    if np.any(dot <= starts):
+        return False
+    return bool(np.all(arr[dot] == _DOT))
+
 
-        # 价格列保留 5 位小数（仅对价格列进行格式化，不影响成交量）
-        price_cols = ["Open", "High", "Low", "Close"]
-        for c in price_cols:
-            if c in g.columns:
-                g[c] = pd.to_numeric(g[c], errors="coerce").round(5).map(lambda x: f"{x:.5f}")
+class YearWriters:
+    """每个年份一个打开的缓冲写入器（以及可选的 .bars 累积）"""
 
-        g.to_csv(out_path, mode="a", index=False, header=write_header)
+    def __init__(self, out_dir: Path, header_line: bytes, store: bool):
+        self.out_dir = out_dir
+        self.header_line = header_line
+        self.store = store
+        self.files = {}
+        self.bars = {}
 
+    def path_for(self, year: int) -> Path:
+        return self.out_dir / f"EURUSD_{year}.csv"
 
-def split_by_year():
+    def _file(self, year: int):
+        f = self.files.get(year)
+        if f is None:
+            f = open(self.path_for(year), "wb", buffering=WRITE_BUFFER)
+            if self.header_line:
+                f.write(self.header_line)
+            self.files[year] = f
+        return f
+
+    def write_raw(self, year: int, data: bytes):
+        self._file(year).write(data)
+
+    def write_frame(self, year: int, g: pd.DataFrame):
+        text = g.to_csv(index=False, header=False, float_format=f"%.{PRICE_DECIMALS}f", lineterminator="\n")
+        self._file(year).write(text.encode("utf-8"))
+
+    def add_bars(self, year: int, g: pd.DataFrame):
+        chunk = g.copy()
+        chunk.columns = normalize_columns(chunk.columns)
+        self.bars.setdefault(year, []).append(frame_to_bars(chunk))
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+        for year, parts in self.bars.items():
+            csv_path = self.path_for(year)
+            bars = {c: np.concatenate([p[c] for p in parts]) for c in parts[0]}
+            write_bars(store_path_for(csv_path), bars, meta=source_stamp(csv_path))
+
+
+class BlockSplitter:
+    """把一个字节块按年份分发到 YearWriters"""
+
+    def __init__(self, writers: YearWriters, columns, time_col: str):
+        self.writers = writers
+        self.columns = columns
+        self.time_idx = columns.index(time_col)
+        self.time_col = time_col
+        self.price_idx = [columns.index(c) for c in PRICE_COLUMNS if c in columns]
+        self.fast_blocks = 0
+        self.slow_blocks = 0
+
+    def process(self, block: bytes):
+        arr = np.frombuffer(block, dtype=np.uint8)
+        bounds = field_bounds(arr)
+        frame = None
+        if bounds is not None and bounds[0].shape[1] == len(self.columns):
+            starts, ends = bounds
+            years = years_at(arr, starts[:, self.time_idx], ends[:, self.time_idx])
+            if np.all(years >= 0) and prices_conform(arr, starts[:, self.price_idx], ends[:, self.price_idx]):
+                self._write_runs(block, starts[:, 0], ends[:, -1], years)
+                self.fast_blocks += 1
+                if self.writers.store:
+                    frame = self._parse(block)
+                    self._store_frame(frame, years)
+                return
+        self.slow_blocks += 1
+        self._process_slow(self._parse(block))
+
+    def _write_runs(self, block: bytes, line_starts, line_ends, years):
+        """源文件按时间排序时年份成段出现：每段一次性写出原始字节"""
+        change = np.flatnonzero(np.diff(years)) + 1
+        run_starts = np.concatenate(([0], change))
+        run_ends = np.concatenate((change, [len(years)]))
+        for a, b in zip(run_starts, run_ends):
+            # 用下一行起点（而不是本行终点）截断，保留原始换行符
+            stop = line_starts[b] if b < len(line_starts) else len(block)
+            self.writers.write_raw(int(years[a]), block[line_starts[a]:stop])
+
+    def _parse(self, block: bytes) -> pd.DataFrame:
+        text_cols = {self.columns[0]: str, self.time_col: str}
+        if self.time_col == "Date" and "Clock" in self.columns:
+            text_cols["Clock"] = str
+        return pd.read_csv(io.BytesIO(block), header=None, names=self.columns, dtype=text_cols)
+
+    def _frame_years(self, df: pd.DataFrame) -> np.ndarray:
+        times = df[self.time_col].astype(str)
+        if self.time_col == "Date" and "Clock" in df.columns:
+            times = times + " " + df["Clock"].astype(str)
+        parsed = pd.to_datetime(times.str.replace(".", "-", n=2, regex=False), errors="coerce")
+        return parsed.dt.year.fillna(-1).to_numpy(dtype=np.int64)
+
+    def _process_slow(self, df: pd.DataFrame):
+        years = self._frame_years(df)
+        # 价格列保留 5 位小数（仅对价格列格式化，不影响成交量）
+        for c in PRICE_COLUMNS:
+            if c in df.columns:
+                df[c] = pd.to_numeric(df[c], errors="coerce").round(PRICE_DECIMALS)
+        valid = years >= 0
+        df, years = df[valid], years[valid]
+        for year in np.unique(years):
+            g = df[years == year]
+            self.writers.write_frame(int(year), g)
+            if self.writers.store:
+                self.writers.add_bars(int(year), g)
+
+    def _store_frame(self, df: pd.DataFrame, years: np.ndarray):
+        for year in np.unique(years):
+            self.writers.add_bars(int(year), df[years == year])
+
+
+def split_by_year(store: bool = False):
     if not SRC_FILE.exists():
         print(f"❌ 源文件不存在: {SRC_FILE}")
         return
@@ -101,59 +262,41 @@ def split_by_year():
     print(f"开始拆分: {SRC_FILE}")
     print(f"输出目录: {OUT_DIR}")
 
-    first_chunk = True
-    time_col = None
-    header_known = None
-
-    reader = pd.read_csv(SRC_FILE, chunksize=CHUNK_SIZE, header=None)
-
-    for i, raw_chunk in enumerate(reader):
-        if first_chunk:
-            chunk, has_header = detect_header_and_read_chunk(raw_chunk)
-            header_known = has_header
-            if has_header:
-                # 重新构造 reader 带 header
-                reader = pd.read_csv(SRC_FILE, chunksize=CHUNK_SIZE)
-                # 已经处理过首块，继续下一块循环
-                first_chunk = False
-                # 先处理当前块（已带表头）
-                time_col = find_time_column(chunk)
-            else:
-                time_col = "Time"
+    with open(SRC_FILE, "rb") as f:
+        if has_header(SRC_FILE):
+            header_line = f.readline()
+            columns = [c.strip() for c in header_line.decode("utf-8-sig").strip().split(",")]
+            time_col = find_time_column(columns)
             if time_col is None:
                 print("❌ 未找到时间列，请检查数据格式")
                 return
         else:
-            if header_known:
-                chunk = raw_chunk
-                if time_col is None:
-                    time_col = find_time_column(chunk)
-            else:
-                chunk = raw_chunk
-                chunk.columns = [
-                    "Date",
-                    "Clock",
-                    "Open",
-                    "High",
-                    "Low",
-                    "Close",
-                    "Volume",
-                    "Volume2",
-                    "Extra",
-                ][: len(chunk.columns)]
-                chunk["Time"] = pd.to_datetime(chunk["Date"].astype(str) + " " + chunk["Clock"].astype(str), errors="coerce")
-                time_col = "Time"
-
-        grouped = process_chunk(chunk, time_col)
-        append_grouped(grouped, header_known)
-        print(f"  已处理分块 {i + 1}")
-        first_chunk = False
+            # 无表头：日期在第一列，年份直接取日期前 4 位
+            header_line = b""
+            first = f.readline()
+            f.seek(0)
+            n_fields = first.count(b",") + 1
+            columns = LOCAL_COLUMNS[:n_fields] + [f"Col_{i}" for i in range(len(LOCAL_COLUMNS), n_fields)]
+            time_col = "Date"
+
+        writers = YearWriters(OUT_DIR, header_line, store)
+        splitter = BlockSplitter(writers, columns, time_col)
+        try:
+            for i, block in enumerate(iter_blocks(f)):
+                splitter.process(block)
+                print(f"  已处理数据块 {i + 1}")
+        finally:
+            writers.close()
 
+    if splitter.slow_blocks:
+        print(f"ℹ️ {splitter.slow_blocks} 个数据块价格位数不符或时间无法识别，已重新解析并格式化")
     print("✔ 拆分完成，生成文件：")
-    for f in sorted(OUT_DIR.glob("EURUSD_*.csv")):
+    for f in sorted(OUT_DIR.glob("EURUSD_*.*")):
         print("  ", f.name)
 
 
 if __name__ == "__main__":
-    split_by_year()
-
+    parser = argparse.ArgumentParser(description="按年份拆分 EURUSD.csv")
+    parser.add_argument("--store", action="store_true", help="同时写出每年的 .bars 列式文件")
+    args = parser.parse_args()
+    split_by_year(store=args.store)
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+"""
+数据加载层：行情文件的转换、存储与读取
+"""
+
+from .bar_store import (
+    BAR_COLUMNS,
+    bars_to_frame,
+    convert_csv,
+    csv_to_bars,
+    format_epoch,
+    frame_to_bars,
+    has_header,
+    load_bars,
+    normalize_columns,
+    read_bars,
+    to_epoch,
+    write_bars,
+)
+from .bar_archive import BarArchive, build_archive, merge_bars
+from .compact import CompactBars, convert_to_compact, price_scale
+from .partitioned import PartitionedDataset, month_bounds, months_between
+from .pyramid import PYRAMID, TIMEFRAME_SECONDS, build_pyramid, load_timeframe, resample_bars, update_pyramid
+from .mt5_sync import load_mt5, rates_to_bars, sync_symbol
+from .mt5_backfill import backfill, month_windows
+from .csv_index import build_index, load_window, read_csv_window
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+只读内存映射 K 线档案 (Bar Archive)
+
+每个 symbol/timeframe 一个 .bars 文件（格式见 bar_store），例如：
+    Data/archive/EURUSD_M1.bars
+
+打开档案时只做 mmap，不读入数据；各列是指向同一映射的零拷贝 NumPy 视图。
+紧凑编码的档案（见 compact）columns 为原始定点列，二分查找直接在 int32 分钟列上进行，slice 只解码所取区间。
+多个进程（回放器、检测器、绘图）打开同一文件时共享操作系统页缓存中的同一份物理数据。
+time 列严格升序，按时间取区间是对它的二分查找，复杂度 O(log n)。
+
+用法：
+    archive = BarArchive.open("Data/archive", "EURUSD", "M1")
+    window = archive.slice("2024-03-01", "2024-03-15")   # [start, end) 的零拷贝视图
+    df = bars_to_frame(window)
+
+构建：
+    py -m src.data_loader.bar_archive EURUSD M1 Data/split_by_year/EURUSD_*.csv --root Data/archive
+"""
+
+import argparse
+from pathlib import Path
+from typing import Iterable, Optional
+
+import numpy as np
+
+from .bar_store import (
+    BARS_SUFFIX,
+    Bars,
+    PathLike,
+    _columns_from_buffer,
+    load_bars,
+    read_header,
+    to_epoch,
+    write_bars,
+)
+from .compact import decode_bars, is_compact, search_time
+
+
+def merge_bars(*parts: Bars) -> Bars:
+    """合并多段 K 线：按时间排序，同一时间戳保留最后出现的那一根；全部为空时保留列结构（零行）"""
+    parts = [p for p in parts if p]
+    if not parts:
+        return {}
+    if not any(len(p["time"]) for p in parts):
+        return {c: np.asarray(col)[:0] for c, col in parts[0].items()}
+    parts = [p for p in parts if len(p["time"])]
+    names = list(parts[0].keys())
+    merged = {c: np.concatenate([p[c] for p in parts]) for c in names}
+    times = merged["time"]
+    # 稳定排序后，相同时间戳中靠后的（后写入的）排在最后
+    order = np.argsort(times, kind="stable")
+    times = times[order]
+    keep = np.ones(len(times), dtype=bool)
+    keep[:-1] = times[1:] != times[:-1]
+    order = order[keep]
+    return {c: merged[c][order] for c in names}
+
+
+class BarArchive:
+    """只读内存映射 K 线档案"""
+
+    def __init__(self, path: PathLike):
+        """
+        参数:
+            path: .bars 文件路径
+        """
+        self.path = Path(path)
+        self.header = read_header(self.path)
+        self.meta = self.header.get("meta", {})
+        self._buf = np.memmap(self.path, dtype=np.uint8, mode="r")
+        self.columns = _columns_from_buffer(self._buf, self.header)
+        self.compact = is_compact(self.meta)
+        self.time_step = self.meta["time_step"] if self.compact else 1
+
+    @staticmethod
+    def path_for(root: PathLike, symbol: str, timeframe: str) -> Path:
+        """档案文件路径：<root>/<SYMBOL>_<TF>.bars"""
+        return Path(root) / f"{symbol}_{timeframe}{BARS_SUFFIX}"
+
+    @classmethod
+    def open(cls, root: PathLike, symbol: str, timeframe: str) -> "BarArchive":
+        return cls(cls.path_for(root, symbol, timeframe))
+
+    @classmethod
+    def build(cls, root: PathLike, symbol: str, timeframe: str, bars: Bars) -> "BarArchive":
+        """
+        写入（或整体替换）一个档案，保证时间升序且唯一
+
+        参数:
+            root: 档案根目录
+            symbol / timeframe: 品种与周期，如 'EURUSD', 'M1'
+            bars: 列式 K 线；零行时写入空档案
+        """
+        bars = merge_bars(bars)
+        if not bars:
+            raise ValueError(f"没有 K 线列，无法建立档案: {symbol} {timeframe}")
+        path = write_bars(
+            cls.path_for(root, symbol, timeframe),
+            bars,
+            meta={"symbol": symbol, "timeframe": timeframe},
+        )
+        return cls(path)
+
+    def __len__(self) -> int:
+        return len(self.columns["time"])
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def index_of(self, t, side: str = "left") -> int:
+        """时间 t 在档案中的插入位置（二分查找）"""
+        return search_time(self.columns["time"], to_epoch(t), self.time_step, side=side)
+
+    def range_slice(self, start=None, end=None) -> slice:
+        """[start, end) 时间区间对应的位置切片；None 表示不限"""
+        lo = 0 if start is None else self.index_of(start)
+        hi = len(self) if end is None else self.index_of(end)
+        return slice(lo, max(lo, hi))
+
+    def slice(self, start=None, end=None) -> Bars:
+        """[start, end) 时间区间的零拷贝列视图（紧凑档案返回解码后的副本）"""
+        sl = self.range_slice(start, end)
+        window = {name: col[sl] for name, col in self.columns.items()}
+        if self.compact:
+            return decode_bars(window, self.meta)
+        return window
+
+    @property
+    def times(self) -> np.ndarray:
+        """纪元秒列（紧凑档案每次访问都解码出完整的 int64 副本；查找与 first/last_time 不使用它）"""
+        if self.compact:
+            return self.columns["time"].astype(np.int64) * self.time_step
+        return self.columns["time"]
+
+    @property
+    def first_time(self) -> Optional[int]:
+        col = self.columns["time"]
+        return int(col[0]) * self.time_step if len(col) else None
+
+    @property
+    def last_time(self) -> Optional[int]:
+        col = self.columns["time"]
+        return int(col[-1]) * self.time_step if len(col) else None
+
+    def close(self):
+        """释放映射（之后不要再使用已取出的视图）"""
+        self.columns = {}
+        self._buf._mmap.close()
+
+
+def build_archive(root: PathLike, symbol: str, timeframe: str, sources: Iterable[PathLike]) -> BarArchive:
+    """把若干 CSV/.bars 文件（如逐年拆分的文件）合并为一个档案"""
+    parts = [load_bars(p) for p in sources]
+    return BarArchive.build(root, symbol, timeframe, merge_bars(*parts))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build a memory-mapped bar archive")
+    parser.add_argument("symbol", help="e.g. EURUSD")
+    parser.add_argument("timeframe", help="e.g. M1")
+    parser.add_argument("sources", nargs="+", help="CSV or .bars files to merge")
+    parser.add_argument("--root", default="Data/archive", help="archive directory")
+    args = parser.parse_args()
+
+    archive = build_archive(args.root, args.symbol, args.timeframe, args.sources)
+    print(f"✅ {archive.path}: {len(archive)} bars")
@@ -0,0 +1,350 @@
+# -*- coding: utf-8 -*-
+"""
+K线列式二进制存储 (Bar Store)
+
+把 EURUSD_YYYY.csv 这类文本行情一次性转换为列式二进制文件（.bars），
+之后所有加载器直接读取二进制列，不再重复解析 CSV。
+
+列定义：
+    time   : int64，Unix 纪元秒（CSV 中的墙钟时间按 UTC 解释）
+    open / high / low / close / volume : float64
+
+文件格式：
+    8 字节魔数 + 4 字节头长度 + JSON 头（列名、dtype、偏移、行数、元数据）
+    之后各列数据按 64 字节对齐依次存放。
+
+用法：
+    bars = load_bars("Data/split_by_year/EURUSD_2024.csv")   # 首次转换并缓存，之后毫秒级读取
+    df = bars_to_frame(bars)                                  # 需要 DataFrame 时再转换
+"""
+
+import json
+import os
+import struct
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+BAR_COLUMNS = ("time", "open", "high", "low", "close", "volume")
+BAR_DTYPES = {
+    "time": np.dtype("<i8"),
+    "open": np.dtype("<f8"),
+    "high": np.dtype("<f8"),
+    "low": np.dtype("<f8"),
+    "close": np.dtype("<f8"),
+    "volume": np.dtype("<f8"),
+}
+BARS_SUFFIX = ".bars"
+
+MAGIC = b"QTMBARS\x01"
+_ALIGN = 64
+
+# 本地无表头格式：Date, Time, Open, High, Low, Close, TickVol, RealVol, Spread
+_LOCAL_NAMES = ["date", "clock", "open", "high", "low", "close", "volume"]
+
+# 有表头格式的列名归一化
+_HEADER_ALIASES = {
+    "time": "time", "datetime": "time", "timestamp": "time",
+    "date": "date", "clock": "clock",
+    "open": "open", "high": "high", "low": "low", "close": "close",
+    "tick_volume": "volume", "volume": "volume", "vol": "volume",
+}
+
+Bars = Dict[str, np.ndarray]
+PathLike = Union[str, Path]
+
+
+# ----------------------------------------------------------------------
+# 时间工具
+# ----------------------------------------------------------------------
+
+def to_epoch(value) -> int:
+    """
+    把各种时间表示转换为 Unix 纪元秒
+
+    支持: int/float 秒, datetime, pd.Timestamp, np.datetime64,
+          字符串 'YYYY-MM-DD HH:MM[:SS]' 或 MT5 风格 'YYYY.MM.DD HH:MM'
+    """
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        return int(value)
+    if isinstance(value, str):
+        text = value.strip()
+        date_part, _, rest = text.partition(" ")
+        value = date_part.replace(".", "-") + (" " + rest if rest else "")
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert("UTC").tz_localize(None)
+    return int(ts.value // 1_000_000_000)
+
+
+def format_epoch(t: int, fmt: str = "%Y.%m.%d %H:%M") -> str:
+    """纪元秒 -> 字符串（默认 MT5 风格 'YYYY.MM.DD HH:MM'）"""
+    return datetime.fromtimestamp(int(t), tz=timezone.utc).strftime(fmt)
+
+
+def _parse_dates(values: pd.Series) -> np.ndarray:
+    """解析日期列（重复值很多，只解析唯一值）-> 当日 0 点的纪元秒"""
+    codes, uniques = pd.factorize(values.astype(str))
+    parsed = np.empty(len(uniques), dtype=np.int64)
+    for k, text in enumerate(uniques):
+        d = datetime.strptime(text.strip().replace("-", ".").replace("/", "."), "%Y.%m.%d")
+        parsed[k] = int(d.replace(tzinfo=timezone.utc).timestamp())
+    return parsed[codes]
+
+
+def _parse_clock(values: pd.Series) -> np.ndarray:
+    """解析 'HH:MM[:SS]' 列 -> 当日秒数（最多 86400 个唯一值）"""
+    codes, uniques = pd.factorize(values.astype(str))
+    parsed = np.empty(len(uniques), dtype=np.int64)
+    for k, text in enumerate(uniques):
+        parts = [int(p) for p in text.strip().split(":")]
+        parts += [0] * (3 - len(parts))
+        parsed[k] = parts[0] * 3600 + parts[1] * 60 + parts[2]
+    return parsed[codes]
+
+
+def _parse_timestamps(values: pd.Series) -> np.ndarray:
+    """解析完整时间戳列 -> 纪元秒"""
+    text = values.astype(str).str.replace(".", "-", n=2, regex=False)
+    times = pd.to_datetime(text, format="ISO8601")
+    return times.to_numpy(dtype="datetime64[s]").astype(np.int64)
+
+
+# ----------------------------------------------------------------------
+# CSV 解析
+# ----------------------------------------------------------------------
+
+def has_header(csv_path: PathLike) -> bool:
+    """首行是否为表头（含 time/date/open/close 等字段名）"""
+    with open(csv_path, "r", encoding="utf-8", errors="ignore") as f:
+        first_line = f.readline().lower()
+    return any(k in first_line for k in ("time", "date", "open", "close"))
+
+
+def csv_to_bars(csv_path: PathLike) -> Bars:
+    """
+    解析 CSV 为列式数组（只在转换时调用一次）
+
+    支持两种格式：
+        1) 无表头 MT4/MT5 导出：2024.01.01,22:00,1.10427,1.10429,1.10425,1.10429,5900000,...
+        2) 有表头：time,open,high,low,close,tick_volume（列名大小写不敏感）
+    """
+    if has_header(csv_path):
+        df = pd.read_csv(csv_path)
+        df.columns = normalize_columns(df.columns)
+    else:
+        df = pd.read_csv(
+            csv_path,
+            header=None,
+            usecols=range(len(_LOCAL_NAMES)),
+            names=_LOCAL_NAMES,
+            dtype={"date": str, "clock": str},
+        )
+    return frame_to_bars(df)
+
+
+def normalize_columns(columns) -> list:
+    """把有表头 CSV 的列名归一化为 time/date/clock/open/high/low/close/volume"""
+    names = [_HEADER_ALIASES.get(str(c).strip().lower(), str(c)) for c in columns]
+    if "time" in names and "date" in names:
+        # Date + Time 两列表头：time 列是钟点
+        names = ["clock" if n == "time" else n for n in names]
+    return names
+
+
+def frame_times(df: pd.DataFrame) -> np.ndarray:
+    """已归一化列名的 DataFrame 的时间列 -> 纪元秒（time 列，或 date + clock 两列）"""
+    if "time" in df.columns:
+        return _parse_timestamps(df["time"])
+    if "date" in df.columns and "clock" in df.columns:
+        return _parse_dates(df["date"]) + _parse_clock(df["clock"])
+    if "date" in df.columns:
+        return _parse_timestamps(df["date"])
+    raise ValueError(f"未找到时间列: {list(df.columns)}")
+
+
+def frame_to_bars(df: pd.DataFrame) -> Bars:
+    """
+    已归一化列名的 DataFrame -> 列式数组
+
+    时间取自 time 列（完整时间戳），或 date + clock 两列
+    """
+    bars = {"time": np.ascontiguousarray(frame_times(df), dtype=BAR_DTYPES["time"])}
+    for col in BAR_COLUMNS[1:]:
+        if col in df.columns:
+            bars[col] = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=BAR_DTYPES[col])
+        else:
+            bars[col] = np.zeros(len(df), dtype=BAR_DTYPES[col])
+
+    # 丢弃无法解析的行，并保证时间升序
+    valid = ~np.isnan(bars["close"])
+    if not valid.all():
+        bars = {k: v[valid] for k, v in bars.items()}
+    if len(bars["time"]) > 1 and np.any(np.diff(bars["time"]) < 0):
+        order = np.argsort(bars["time"], kind="stable")
+        bars = {k: v[order] for k, v in bars.items()}
+    return bars
+
+
+# ----------------------------------------------------------------------
+# 二进制读写
+# ----------------------------------------------------------------------
+
+def write_bars(path: PathLike, bars: Bars, meta: Optional[dict] = None) -> Path:
+    """
+    写入 .bars 文件（先写临时文件再原子替换）
+
+    参数:
+        path: 输出路径
+        bars: 列名 -> 一维数组，所有列长度一致
+        meta: 附加元数据（如来源文件大小/修改时间、symbol、timeframe）
+    """
+    path = Path(path)
+    names = [c for c in BAR_COLUMNS if c in bars] + [c for c in bars if c not in BAR_COLUMNS]
+    arrays = [np.ascontiguousarray(bars[c]) for c in names]
+    rows = len(arrays[0]) if arrays else 0
+    if any(len(a) != rows for a in arrays):
+        raise ValueError("所有列的长度必须一致")
+
+    # 头部长度依赖偏移量，偏移量又依赖头部长度：按保守上限预留头部空间
+    columns = [{"name": n, "dtype": a.dtype.str, "offset": 0} for n, a in zip(names, arrays)]
+    header = {"version": 1, "rows": rows, "columns": columns, "meta": meta or {}}
+    reserve = len(json.dumps(header).encode("utf-8")) + 32 * len(columns) + 64
+    offset = _round_up(len(MAGIC) + 4 + reserve)
+    for col, arr in zip(columns, arrays):
+        col["offset"] = offset
+        offset = _round_up(offset + arr.nbytes)
+    header_bytes = json.dumps(header).encode("utf-8")
+    header_bytes += b" " * (columns[0]["offset"] - len(MAGIC) - 4 - len(header_bytes) if columns else 0)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header_bytes)))
+        f.write(header_bytes)
+        for col, arr in zip(columns, arrays):
+            f.seek(col["offset"])
+            f.write(arr.tobytes())
+        f.truncate(offset)
+    os.replace(tmp, path)
+    return path
+
+
+def read_header(path: PathLike) -> dict:
+    """只读取 .bars 文件头（行数、列布局、元数据）"""
+    with open(path, "rb") as f:
+        magic = f.read(len(MAGIC))
+        if magic != MAGIC:
+            raise ValueError(f"不是有效的 .bars 文件: {path}")
+        (length,) = struct.unpack("<I", f.read(4))
+        return json.loads(f.read(length).decode("utf-8"))
+
+
+def read_bars(path: PathLike) -> Bars:
+    """读取 .bars 文件的全部列（一次 read，按列切出视图；紧凑编码的文件解码为常规列）"""
+    header = read_header(path)
+    buf = np.fromfile(path, dtype=np.uint8)
+    columns = _columns_from_buffer(buf, header)
+    meta = header.get("meta", {})
+    if meta.get("encoding"):
+        from .compact import decode_bars
+        return decode_bars(columns, meta)
+    return columns
+
+
+def _columns_from_buffer(buf: np.ndarray, header: dict) -> Bars:
+    rows = header["rows"]
+    bars = {}
+    for col in header["columns"]:
+        dtype = np.dtype(col["dtype"])
+        start = col["offset"]
+        bars[col["name"]] = buf[start:start + rows * dtype.itemsize].view(dtype)
+    return bars
+
+
+def _round_up(n: int) -> int:
+    return (n + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+# ----------------------------------------------------------------------
+# CSV -> .bars 缓存
+# ----------------------------------------------------------------------
+
+def store_path_for(csv_path: PathLike) -> Path:
+    """CSV 对应的 .bars 缓存路径（与 CSV 同目录同名）"""
+    return Path(csv_path).with_suffix(BARS_SUFFIX)
+
+
+def source_stamp(csv_path: PathLike) -> dict:
+    """来源文件的大小与修改时间（用于判断 .bars 缓存是否过期）"""
+    st = os.stat(csv_path)
+    return {"source": Path(csv_path).name, "source_size": st.st_size, "source_mtime_ns": st.st_mtime_ns}
+
+
+def convert_csv(csv_path: PathLike, store_path: Optional[PathLike] = None) -> Path:
+    """把 CSV 转换为 .bars 文件，返回输出路径"""
+    bars = csv_to_bars(csv_path)
+    return write_bars(store_path or store_path_for(csv_path), bars, meta=source_stamp(csv_path))
+
+
+def load_bars(path: PathLike, cache: bool = True) -> Bars:
+    """
+    统一加载入口
+
+    参数:
+        path: .bars 文件或 CSV 文件
+        cache: CSV 输入时是否使用/生成同名 .bars 缓存（源文件大小或修改时间变化会自动重建）
+
+    返回:
+        列名 -> 数组 的字典
+    """
+    path = Path(path)
+    if path.suffix == BARS_SUFFIX:
+        return read_bars(path)
+
+    store = store_path_for(path)
+    if cache and store.exists():
+        try:
+            meta = read_header(store).get("meta", {})
+            stamp = source_stamp(path)
+            if all(meta.get(k) == v for k, v in stamp.items()):
+                return read_bars(store)
+        except (OSError, ValueError):
+            pass
+
+    bars = csv_to_bars(path)
+    if cache:
+        try:
+            write_bars(store, bars, meta=source_stamp(path))
+        except OSError as e:
+            print(f"⚠️ 无法写入缓存 {store}: {e}")
+    return bars
+
+
+def bars_to_frame(bars: Bars) -> pd.DataFrame:
+    """
+    列式数组 -> DataFrame（只在需要 pandas 的边界调用）
+
+    不复制数据：输入是内存映射视图时，DataFrame 各列仍指向映射
+
+    返回:
+        以 Time (datetime64) 为索引，包含 Open/High/Low/Close/Volume 列
+    """
+    index = pd.DatetimeIndex(np.ascontiguousarray(bars["time"]).view("datetime64[s]"), name="Time")
+    return pd.DataFrame(
+        {
+            "Open": bars["open"],
+            "High": bars["high"],
+            "Low": bars["low"],
+            "Close": bars["close"],
+            "Volume": bars["volume"],
+        },
+        index=index,
+        copy=False,
+    )
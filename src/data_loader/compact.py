@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""
+紧凑定点表示 (Compact Bars)
+
+EURUSD 报价只有 5 位小数，float64 OHLC 是浪费。紧凑表示：
+    time   : int32，纪元分钟（所有时间都是整分钟时）；否则保留 int64 纪元秒
+    open / high / low / close : int32，以“点”为单位（价格 × price_scale，EURUSD 为 1e5）
+    volume : uint32
+
+每根 K 线 24 字节（float64 表示为 48 字节，带字符串日期/时间列的 DataFrame 超过 150 字节）。
+编码必须无损：价格不是 1/scale 的整数倍、成交量不是非负整数时拒绝编码。
+
+文件仍是 .bars 格式，只是列 dtype 不同，元数据里记录编码：
+    {"encoding": "compact-v1", "price_scale": 100000, "time_step": 60}
+read_bars / load_bars / BarArchive / PartitionedDataset 读取时按元数据自动解码为常规 float64 K 线，
+因此所有加载器无需修改即可直接使用紧凑文件；需要保持紧凑形态时使用 CompactBars。
+
+用法：
+    cb = CompactBars.from_bars(load_bars("EURUSD_2024.csv"), symbol="EURUSD")
+    cb.write("EURUSD_2024.compact.bars")
+    cb = CompactBars.read("EURUSD_2024.compact.bars")
+    highs = cb.columns["high"]            # int32 点数，适合热循环
+    bars = cb.to_bars()                   # 需要浮点时再解码
+
+命令行转换：
+    py -m src.data_loader.compact EURUSD Data/split_by_year/EURUSD_2024.csv EURUSD_2024.compact.bars
+"""
+
+import argparse
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from .bar_store import (
+    BAR_COLUMNS,
+    BAR_DTYPES,
+    Bars,
+    PathLike,
+    _columns_from_buffer,
+    load_bars,
+    read_header,
+    to_epoch,
+    write_bars,
+)
+
+COMPACT_ENCODING = "compact-v1"
+PRICE_COLUMNS = ("open", "high", "low", "close")
+
+# 报价小数位：大多数货币对 5 位，日元交叉盘 3 位，黄金 2 位
+PRICE_SCALES = {
+    "JPY": 1000,
+    "XAU": 100,
+}
+DEFAULT_PRICE_SCALE = 100000
+
+
+def price_scale(symbol: str) -> int:
+    """品种的价格精度（每 1.0 价格的点数），忽略经纪商后缀，如 'EURUSD@'"""
+    name = "".join(ch for ch in symbol.upper() if ch.isalpha())
+    for key, scale in PRICE_SCALES.items():
+        if key in name:
+            return scale
+    return DEFAULT_PRICE_SCALE
+
+
+def is_compact(meta: Optional[dict]) -> bool:
+    return bool(meta) and meta.get("encoding") == COMPACT_ENCODING
+
+
+def encode_bars(bars: Bars, scale: int) -> dict:
+    """
+    常规 K 线 -> 紧凑列
+
+    返回:
+        {"columns": 紧凑列, "meta": 编码元数据}
+
+    异常:
+        ValueError: 价格不在 1/scale 网格上、超出 int32，或成交量不是非负整数
+    """
+    times = np.asarray(bars["time"], dtype=np.int64)
+    if len(times) and np.all(times % 60 == 0) and np.abs(times // 60).max() < 2 ** 31:
+        time_step, time_col = 60, (times // 60).astype(np.int32)
+    else:
+        time_step, time_col = 1, times
+    columns = {"time": time_col}
+
+    for name in PRICE_COLUMNS:
+        prices = np.asarray(bars[name], dtype=np.float64)
+        points = np.rint(prices * scale)
+        if not np.allclose(points / scale, prices, rtol=0, atol=1e-3 / scale):
+            raise ValueError(f"{name} 列的价格超出 1/{scale} 精度，无法无损编码")
+        if len(points) and np.abs(points).max() >= 2 ** 31:
+            raise ValueError(f"{name} 列的价格超出 int32 范围")
+        columns[name] = points.astype(np.int32)
+
+    volume = np.asarray(bars["volume"], dtype=np.float64)
+    if np.any(volume < 0) or np.any(volume >= 2 ** 32) or np.any(volume != np.floor(volume)):
+        raise ValueError("volume 列不是 uint32 范围内的整数")
+    columns["volume"] = volume.astype(np.uint32)
+
+    return {"columns": columns,
+            "meta": {"encoding": COMPACT_ENCODING, "price_scale": int(scale), "time_step": time_step}}
+
+
+def decode_bars(columns: dict, meta: dict) -> Bars:
+    """紧凑列 -> 常规 float64 K 线"""
+    scale = meta["price_scale"]
+    bars = {"time": columns["time"].astype(np.int64) * meta["time_step"]}
+    for name in PRICE_COLUMNS:
+        bars[name] = columns[name] / scale
+    bars["volume"] = columns["volume"].astype(BAR_DTYPES["volume"])
+    return bars
+
+
+def search_time(column: np.ndarray, t: int, time_step: int, side: str = "left") -> int:
+    """
+    在 time 列（单位 time_step 秒）上二分查找纪元秒 t 的插入位置，结果与在解码后的纪元秒上查找相同
+
+    边界换算为列的单位并转成列的 dtype 再查找：直接传 Python 整数时 NumPy 会先把整列转换为 int64
+    """
+    if side == "left":
+        value = -(-t // time_step)      # 第一根 time*step >= t
+    else:
+        value = t // time_step          # 第一根 time*step > t
+    info = np.iinfo(column.dtype)
+    if value < info.min:
+        return 0
+    if value > info.max:
+        return len(column)
+    return int(np.searchsorted(column, column.dtype.type(value), side=side))
+
+
+class CompactBars:
+    """保持紧凑形态的 K 线：columns 为定点整数列，按需解码"""
+
+    def __init__(self, columns: dict, scale: int = DEFAULT_PRICE_SCALE, time_step: int = 60):
+        """
+        参数:
+            columns: time / open / high / low / close / volume 的紧凑列
+            scale: 价格精度（点数 / 1.0）
+            time_step: time 列的单位秒数（60 = 纪元分钟，1 = 纪元秒）
+        """
+        self.columns = columns
+        self.scale = scale
+        self.time_step = time_step
+        self._times = None
+
+    @classmethod
+    def from_bars(cls, bars: Bars, symbol: Optional[str] = None, scale: Optional[int] = None) -> "CompactBars":
+        """由常规 K 线编码；scale 缺省时按 symbol 推断"""
+        if scale is None:
+            scale = price_scale(symbol) if symbol else DEFAULT_PRICE_SCALE
+        encoded = encode_bars(bars, scale)
+        return cls(encoded["columns"], scale, encoded["meta"]["time_step"])
+
+    @classmethod
+    def read(cls, path: PathLike) -> "CompactBars":
+        """读取紧凑 .bars 文件（不解码）"""
+        header = read_header(path)
+        meta = header.get("meta", {})
+        if not is_compact(meta):
+            raise ValueError(f"不是紧凑编码的 .bars 文件: {path}")
+        columns = _columns_from_buffer(np.fromfile(path, dtype=np.uint8), header)
+        return cls(columns, meta["price_scale"], meta["time_step"])
+
+    @property
+    def meta(self) -> dict:
+        return {"encoding": COMPACT_ENCODING, "price_scale": self.scale, "time_step": self.time_step}
+
+    def write(self, path: PathLike, meta: Optional[dict] = None) -> Path:
+        return write_bars(path, self.columns, meta=dict(meta or {}, **self.meta))
+
+    def __len__(self) -> int:
+        return len(self.columns["time"])
+
+    @property
+    def nbytes(self) -> int:
+        return sum(c.nbytes for c in self.columns.values())
+
+    @property
+    def times(self) -> np.ndarray:
+        """纪元秒（int64，首次访问时解码并缓存）"""
+        if self._times is None:
+            self._times = self.columns["time"].astype(np.int64) * self.time_step
+        return self._times
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        """按常规 K 线的列名取解码后的列，使 CompactBars 可直接传给 bars_to_frame 等接口"""
+        if name == "time":
+            return self.times
+        if name in PRICE_COLUMNS:
+            return self.columns[name] / self.scale
+        if name == "volume":
+            return self.columns["volume"].astype(BAR_DTYPES["volume"])
+        raise KeyError(name)
+
+    def keys(self):
+        return BAR_COLUMNS
+
+    def items(self):
+        return ((name, self[name]) for name in BAR_COLUMNS)
+
+    def to_points(self, price: float) -> int:
+        """价格 -> 点数（与列中的整数可直接比较）"""
+        return int(round(price * self.scale))
+
+    def slice(self, start=None, end=None) -> "CompactBars":
+        """[start, end) 时间区间的紧凑视图（不复制）"""
+        raw = self.columns["time"]
+        lo = 0 if start is None else search_time(raw, to_epoch(start), self.time_step)
+        hi = len(raw) if end is None else search_time(raw, to_epoch(end), self.time_step)
+        hi = max(lo, hi)
+        return CompactBars({k: v[lo:hi] for k, v in self.columns.items()}, self.scale, self.time_step)
+
+    def to_bars(self) -> Bars:
+        return decode_bars(self.columns, self.meta)
+
+
+def convert_to_compact(source: PathLike, output: PathLike, symbol: str) -> CompactBars:
+    """把 CSV / .bars 文件转换为紧凑 .bars 文件"""
+    cb = CompactBars.from_bars(load_bars(source), symbol=symbol)
+    cb.write(output, meta={"symbol": symbol})
+    return cb
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert bars to the compact fixed-point encoding")
+    parser.add_argument("symbol", help="e.g. EURUSD (selects the price scale)")
+    parser.add_argument("source", help="CSV or .bars file")
+    parser.add_argument("output", help="compact .bars file")
+    args = parser.parse_args()
+
+    cb = convert_to_compact(args.source, args.output, args.symbol)
+    print(f"✅ {args.output}: {len(cb)} bars, {cb.nbytes / 1e6:.1f} MB (float64: {len(cb) * 48 / 1e6:.1f} MB)")
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+CSV 稀疏行索引 (Sparse CSV Index)
+
+只能使用 CSV 的场景（供应商数据、MT5 导出）下，从年中开始的回放不应解析整个文件。
+索引构建时按字节块扫描一遍文件，只记录每第 N 行的字节偏移与时间戳（只解析这些采样行的时间）；
+读取 [start, end) 时二分查找采样点，seek 到第一个需要的行，只解析窗口覆盖的字节。
+
+索引文件与 CSV 同目录：EURUSD_2024.csv -> EURUSD_2024.idx.bars
+    列 offset / time : int64（.bars 格式，见 bar_store）
+    元数据记录采样间隔、数据起始偏移、表头列名、CSV 大小/修改时间（变化后自动重建）
+
+用法：
+    bars = read_csv_window("Data/split_by_year/EURUSD_2024.csv", "2024-06-01", "2024-06-15")
+    bars = load_window("...csv", start, end)   # 有新鲜的 .bars 缓存时直接切片，否则走稀疏索引
+"""
+
+import io
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from .bar_store import (
+    _LOCAL_NAMES,
+    BAR_COLUMNS,
+    BAR_DTYPES,
+    Bars,
+    PathLike,
+    frame_times,
+    frame_to_bars,
+    has_header,
+    normalize_columns,
+    read_bars,
+    read_header,
+    source_stamp,
+    store_path_for,
+    to_epoch,
+    write_bars,
+)
+
+INDEX_SUFFIX = ".idx.bars"
+INDEX_EVERY = 4096
+BLOCK_SIZE = 16 << 20
+
+
+def index_path_for(csv_path: PathLike) -> Path:
+    path = Path(csv_path)
+    return path.with_name(path.stem + INDEX_SUFFIX)
+
+
+def _parse_frame(data: bytes, columns: Optional[list]) -> pd.DataFrame:
+    """解析一段不含表头的 CSV 字节；columns 为 None 时按本地无表头格式"""
+    if columns is None:
+        return pd.read_csv(io.BytesIO(data), header=None, usecols=range(len(_LOCAL_NAMES)),
+                           names=_LOCAL_NAMES, dtype={"date": str, "clock": str})
+    return pd.read_csv(io.BytesIO(data), header=None, names=columns)
+
+
+def build_index(csv_path: PathLike, every: int = INDEX_EVERY) -> Path:
+    """
+    扫描 CSV 一遍，写出稀疏索引
+
+    参数:
+        csv_path: CSV 文件
+        every: 每隔多少行记录一个采样点
+
+    返回:
+        索引文件路径
+    """
+    csv_path = Path(csv_path)
+    columns = None
+    data_start = 0
+    with open(csv_path, "rb") as f:
+        if has_header(csv_path):
+            header_line = f.readline()
+            columns = normalize_columns(header_line.decode("utf-8-sig").strip().split(","))
+            data_start = len(header_line)
+
+        offsets, lines = [], []
+        row = 0
+        pos = data_start
+        carry = b""
+        while True:
+            chunk = f.read(BLOCK_SIZE)
+            if not chunk:
+                if not carry:
+                    break
+                # 最后一行没有换行符
+                data, carry = (carry if carry.endswith(b"\n") else carry + b"\n"), b""
+            else:
+                data = carry + chunk
+                cut = data.rfind(b"\n") + 1
+                carry, data = data[cut:], data[:cut]
+                if not data:
+                    continue
+            arr = np.frombuffer(data, dtype=np.uint8)
+            nl = np.flatnonzero(arr == ord("\n"))
+            starts = np.concatenate(([0], nl[:-1] + 1))
+            # 空行（含 \r\n 的空行）不计入行号
+            nonempty = (nl - starts) > (arr[np.maximum(nl - 1, 0)] == ord("\r")).astype(np.int64)
+            starts, ends = starts[nonempty], nl[nonempty]
+            pick = np.flatnonzero((row + np.arange(len(starts))) % every == 0)
+            for k in pick:
+                offsets.append(pos + int(starts[k]))
+                lines.append(data[starts[k]:ends[k] + 1])
+            row += len(starts)
+            pos += len(data)
+
+    if lines:
+        times = frame_times(_parse_frame(b"".join(lines), columns))
+    else:
+        times = np.empty(0, dtype=np.int64)
+
+    meta = dict(source_stamp(csv_path), kind="csv_index", every=every, rows=row, data_start=data_start,
+                columns=columns, sorted=bool(np.all(np.diff(times) >= 0)))
+    return write_bars(index_path_for(csv_path),
+                      {"offset": np.asarray(offsets, dtype=np.int64), "time": np.asarray(times, dtype=np.int64)},
+                      meta=meta)
+
+
+def load_index(csv_path: PathLike, every: int = INDEX_EVERY):
+    """读取稀疏索引（不存在或 CSV 已变化时重建），返回 (列, 元数据)"""
+    path = index_path_for(csv_path)
+    if path.exists():
+        try:
+            meta = read_header(path).get("meta", {})
+            if all(meta.get(k) == v for k, v in source_stamp(csv_path).items()):
+                return read_bars(path), meta
+        except (OSError, ValueError):
+            pass
+    build_index(csv_path, every)
+    return read_bars(path), read_header(path)["meta"]
+
+
+def read_csv_window(csv_path: PathLike, start=None, end=None) -> Bars:
+    """
+    只解析 [start, end) 时间窗口覆盖的 CSV 字节
+
+    要求 CSV 按时间升序；索引发现乱序时退回整表解析再截取
+    """
+    index, meta = load_index(csv_path)
+    columns = meta.get("columns")
+    times, offsets = index["time"], index["offset"]
+    lo_t = None if start is None else to_epoch(start)
+    hi_t = None if end is None else to_epoch(end)
+
+    if not meta.get("sorted", False) or len(times) == 0:
+        with open(csv_path, "rb") as f:
+            f.seek(meta.get("data_start", 0))
+            data = f.read()
+    else:
+        # 起点：最后一个严格早于 start 的采样点（其后的行可能仍早于 start，解析后再截）
+        lo = 0 if lo_t is None else max(0, int(np.searchsorted(times, lo_t, side="left")) - 1)
+        # 终点：第一个时间 >= end 的采样点，之前的行都早于 end
+        hi = len(times) if hi_t is None else int(np.searchsorted(times, hi_t, side="left"))
+        with open(csv_path, "rb") as f:
+            f.seek(int(offsets[lo]))
+            data = f.read(-1 if hi >= len(times) else int(offsets[hi] - offsets[lo]))
+
+    if not data.strip():
+        return {c: np.empty(0, dtype=BAR_DTYPES[c]) for c in BAR_COLUMNS}
+    bars = frame_to_bars(_parse_frame(data, columns))
+    a = 0 if lo_t is None else int(np.searchsorted(bars["time"], lo_t, side="left"))
+    b = len(bars["time"]) if hi_t is None else int(np.searchsorted(bars["time"], hi_t, side="left"))
+    return {k: v[a:b] for k, v in bars.items()}
+
+
+def load_window(csv_path: PathLike, start=None, end=None) -> Bars:
+    """
+    读取 CSV 的时间窗口：已有新鲜的 .bars 缓存时直接二分切片，否则用稀疏索引只解析窗口
+    （不会为了一个窗口去转换整个文件）
+    """
+    store = store_path_for(csv_path)
+    if store.exists():
+        try:
+            meta = read_header(store).get("meta", {})
+            if all(meta.get(k) == v for k, v in source_stamp(csv_path).items()):
+                bars = read_bars(store)
+                a = 0 if start is None else int(np.searchsorted(bars["time"], to_epoch(start)))
+                b = len(bars["time"]) if end is None else int(np.searchsorted(bars["time"], to_epoch(end)))
+                return {k: v[a:b] for k, v in bars.items()}
+        except (OSError, ValueError):
+            pass
+    return read_csv_window(csv_path, start, end)
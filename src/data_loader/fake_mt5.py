@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+"""
+MetaTrader5 模块的本地替身 (Fake MT5)
+
+在没有 MT5 终端的环境（Linux、CI）里模拟 MetaTrader5 Python 包中
+同步/回补用到的接口，返回与真实接口相同 dtype 的结构化数组：
+    initialize / shutdown / last_error / version
+    copy_rates_range / copy_rates_from / copy_rates_from_pos
+
+行情来自 add_series() 注入的 K 线，或按需生成的确定性随机游走（周末无数据）。
+可以模拟终端可见历史上限（max_bars）、前 N 次调用失败（fail_first）和调用延迟（latency），
+calls 记录每次调用，便于核对实际请求的范围。
+
+使用：
+    mt5 = FakeMT5(start="2024-01-01", end="2024-03-01")
+    或设置环境变量 QTM_MT5_BACKEND=fake，由 mt5_sync.load_mt5() 自动选用
+"""
+
+import threading
+import time as _time
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from .bar_store import Bars, to_epoch
+
+RATES_DTYPE = np.dtype([
+    ("time", "<i8"),
+    ("open", "<f8"),
+    ("high", "<f8"),
+    ("low", "<f8"),
+    ("close", "<f8"),
+    ("tick_volume", "<u8"),
+    ("spread", "<i4"),
+    ("real_volume", "<u8"),
+])
+
+# 与 MetaTrader5 包一致的周期常量
+TIMEFRAME_M1 = 1
+TIMEFRAME_M5 = 5
+TIMEFRAME_M15 = 15
+TIMEFRAME_M30 = 30
+TIMEFRAME_H1 = 16385
+TIMEFRAME_H4 = 16388
+TIMEFRAME_D1 = 16408
+
+TIMEFRAME_SECONDS = {
+    TIMEFRAME_M1: 60,
+    TIMEFRAME_M5: 300,
+    TIMEFRAME_M15: 900,
+    TIMEFRAME_M30: 1800,
+    TIMEFRAME_H1: 3600,
+    TIMEFRAME_H4: 14400,
+    TIMEFRAME_D1: 86400,
+}
+
+RES_S_OK = 1
+RES_E_FAIL = -1
+
+
+def _epoch(value) -> int:
+    if isinstance(value, datetime) and value.tzinfo is None:
+        # 与真实接口一致：naive datetime 按 UTC 处理
+        value = value.replace(tzinfo=timezone.utc)
+    return to_epoch(value)
+
+
+def synthetic_rates(start, end, timeframe: int = TIMEFRAME_M1, seed: int = 0,
+                    base_price: float = 1.08) -> np.ndarray:
+    """生成 [start, end) 内的确定性随机游走 K 线（剔除周六、周日）"""
+    step = TIMEFRAME_SECONDS[timeframe]
+    t0 = _epoch(start) // step * step
+    times = np.arange(t0, _epoch(end), step, dtype=np.int64)
+    weekday = (times // 86400 + 3) % 7  # 1970-01-01 是周四
+    times = times[weekday < 5]
+
+    rng = np.random.default_rng(seed)
+    n = len(times)
+    closes = base_price * np.exp(np.cumsum(rng.normal(0, 0.0002 * np.sqrt(step / 60), n)))
+    opens = np.concatenate(([base_price], closes[:-1]))
+    wick = np.abs(rng.normal(0, 0.0001, (2, n)))
+    rates = np.empty(n, dtype=RATES_DTYPE)
+    rates["time"] = times
+    rates["open"] = np.round(opens, 5)
+    rates["close"] = np.round(closes, 5)
+    rates["high"] = np.round(np.maximum(opens, closes) + wick[0], 5)
+    rates["low"] = np.round(np.minimum(opens, closes) - wick[1], 5)
+    rates["tick_volume"] = rng.integers(10, 500, n)
+    rates["spread"] = 2
+    rates["real_volume"] = 0
+    return rates
+
+
+def bars_to_rates(bars: Bars) -> np.ndarray:
+    rates = np.zeros(len(bars["time"]), dtype=RATES_DTYPE)
+    for c in ("time", "open", "high", "low", "close"):
+        rates[c] = bars[c]
+    rates["tick_volume"] = bars["volume"]
+    return rates
+
+
+class FakeMT5:
+    """MetaTrader5 模块替身：实例属性与模块级函数同名，可直接替换 `import MetaTrader5 as mt5`"""
+
+    TIMEFRAME_M1 = TIMEFRAME_M1
+    TIMEFRAME_M5 = TIMEFRAME_M5
+    TIMEFRAME_M15 = TIMEFRAME_M15
+    TIMEFRAME_M30 = TIMEFRAME_M30
+    TIMEFRAME_H1 = TIMEFRAME_H1
+    TIMEFRAME_H4 = TIMEFRAME_H4
+    TIMEFRAME_D1 = TIMEFRAME_D1
+
+    def __init__(self, start="2024-01-01", end=None, seed: int = 0,
+                 max_bars: Optional[int] = None, fail_first: int = 0, latency: float = 0.0):
+        """
+        参数:
+            start, end: 合成行情的时间范围（end 默认当前时间）
+            seed: 随机种子
+            max_bars: 终端可见历史上限（模拟“图表最大K线数”），None 表示不限
+            fail_first: 前 N 次取数调用返回 None（用于验证重试）
+            latency: 每次取数调用的模拟延迟（秒）
+        """
+        self.start = start
+        self.end = end
+        self.seed = seed
+        self.max_bars = max_bars
+        self.fail_first = fail_first
+        self.latency = latency
+        self.series: Dict[Tuple[str, int], np.ndarray] = {}
+        self.calls = []
+        self.initialized = False
+        self._error = (RES_S_OK, "Success")
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # 数据注入
+    # ------------------------------------------------------------------
+
+    def add_series(self, symbol: str, timeframe: int, bars):
+        """注入行情（列式 K 线字典或 RATES_DTYPE 结构化数组）"""
+        rates = bars if isinstance(bars, np.ndarray) else bars_to_rates(bars)
+        self.series[(symbol, timeframe)] = np.sort(rates, order="time")
+
+    def extend_series(self, symbol: str, timeframe: int, end):
+        """把合成行情延长到 end（模拟新 K 线到达）"""
+        self.end = end
+        self.series.pop((symbol, timeframe), None)
+
+    def _rates(self, symbol: str, timeframe: int) -> np.ndarray:
+        key = (symbol, timeframe)
+        if key not in self.series:
+            end = self.end or datetime.now(timezone.utc)
+            self.series[key] = synthetic_rates(self.start, end, timeframe, seed=self.seed)
+        rates = self.series[key]
+        if self.max_bars is not None:
+            rates = rates[-self.max_bars:]
+        return rates
+
+    def _begin(self, name: str, *args) -> bool:
+        with self._lock:
+            self.calls.append((name,) + args)
+            if self.fail_first > 0:
+                self.fail_first -= 1
+                self._error = (RES_E_FAIL, "Fake failure")
+                return False
+            self._error = (RES_S_OK, "Success")
+        if self.latency:
+            _time.sleep(self.latency)
+        return True
+
+    # ------------------------------------------------------------------
+    # MetaTrader5 接口
+    # ------------------------------------------------------------------
+
+    def initialize(self, *args, **kwargs) -> bool:
+        self.initialized = True
+        return True
+
+    def shutdown(self):
+        self.initialized = False
+
+    def last_error(self):
+        return self._error
+
+    def version(self):
+        return (500, 0, "fake")
+
+    def copy_rates_range(self, symbol: str, timeframe: int, date_from, date_to):
+        """time 落在 [date_from, date_to] 的 K 线"""
+        if not self._begin("copy_rates_range", symbol, timeframe, _epoch(date_from), _epoch(date_to)):
+            return None
+        rates = self._rates(symbol, timeframe)
+        lo = np.searchsorted(rates["time"], _epoch(date_from), side="left")
+        hi = np.searchsorted(rates["time"], _epoch(date_to), side="right")
+        return rates[lo:hi].copy()
+
+    def copy_rates_from(self, symbol: str, timeframe: int, date_from, count: int):
+        """开盘时间不晚于 date_from 的最近 count 根 K 线"""
+        if not self._begin("copy_rates_from", symbol, timeframe, _epoch(date_from), count):
+            return None
+        rates = self._rates(symbol, timeframe)
+        hi = np.searchsorted(rates["time"], _epoch(date_from), side="right")
+        return rates[max(0, hi - count):hi].copy()
+
+    def copy_rates_from_pos(self, symbol: str, timeframe: int, start_pos: int, count: int):
+        """从当前K线（位置 0）向前数 start_pos 根开始，取 count 根"""
+        if not self._begin("copy_rates_from_pos", symbol, timeframe, start_pos, count):
+            return None
+        rates = self._rates(symbol, timeframe)
+        hi = len(rates) - start_pos
+        if hi <= 0:
+            return rates[:0].copy()
+        return rates[max(0, hi - count):hi].copy()
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+MT5 历史回补 (Backfill)
+
+一次向终端请求多年的 M1 数据很慢，也常常直接失败（见 VisualReplay_MVP/check_history_start.py）。
+回补把 [start, end) 切成按月的窗口：
+    - 线程池以有限并发（workers）逐窗口调用 copy_rates_range
+    - 失败（返回 None 或抛异常）按指数退避重试 retries 次
+    - 每个窗口取到后立即写入对应的月份分区（PartitionedDataset，原子替换）
+    - 清单文件记录每个窗口的状态，中断后重新运行只会补取未完成的窗口
+    - 还没结束的窗口（当前月）记为 partial，只覆盖到 now，下次运行会重新取
+
+清单位置：<root>/<SYMBOL>/<TF>/backfill_manifest.json
+    {"symbol": ..., "timeframe": ..., "windows": {"2024-03": {"status": "done", "bars": 31680}, ...}}
+
+用法：
+    mt5 = load_mt5(); mt5.initialize()
+    backfill(PartitionedDataset("Data/dataset"), "EURUSD@", "M1", "2020-01-01", "2026-01-01", mt5=mt5)
+"""
+
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .bar_store import to_epoch
+from .mt5_sync import load_mt5, rates_to_bars, timeframe_const
+from .partitioned import PartitionedDataset, month_bounds, months_between
+from .pyramid import BASE_TIMEFRAME, update_pyramid
+
+MANIFEST_NAME = "backfill_manifest.json"
+
+Window = Tuple[str, int, int]
+
+
+def month_windows(start, end) -> List[Window]:
+    """把 [start, end) 切成按月的窗口 (键 'YYYY-MM', 起, 止)，两端裁剪到区间内"""
+    lo, hi = to_epoch(start), to_epoch(end)
+    windows = []
+    for y, m in months_between(lo, hi):
+        m_start, m_end = month_bounds(y, m)
+        windows.append((f"{y:04d}-{m:02d}", max(lo, m_start), min(hi, m_end)))
+    return windows
+
+
+def _utc(t: int) -> datetime:
+    return datetime.fromtimestamp(int(t), tz=timezone.utc)
+
+
+class BackfillManifest:
+    """回补清单：窗口键 -> 状态，每次更新都原子写回磁盘"""
+
+    def __init__(self, path: Path, symbol: str, timeframe: str):
+        self.path = Path(path)
+        self.data = {"symbol": symbol, "timeframe": timeframe, "windows": {}}
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.data = json.load(f)
+
+    @property
+    def windows(self) -> Dict[str, Dict]:
+        return self.data["windows"]
+
+    def is_done(self, key: str, lo: int, hi: int) -> bool:
+        """窗口已完成且覆盖 [lo, hi)（之前按更窄区间回补的月份会重新取）"""
+        entry = self.windows.get(key, {})
+        return entry.get("status") == "done" and entry["start"] <= lo and entry["end"] >= hi
+
+    def mark(self, key: str, **entry):
+        self.windows[key] = entry
+        self.save()
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.path)
+
+
+def fetch_window(mt5, symbol: str, tf: int, lo: int, hi: int, retries: int = 3, backoff: float = 1.0):
+    """
+    取 [lo, hi) 内的 K 线，失败时按 backoff * 2^n 秒退避重试
+
+    返回:
+        MT5 结构化数组（该月没有历史时为空数组）
+    """
+    error = None
+    for attempt in range(retries + 1):
+        if attempt:
+            time.sleep(backoff * 2 ** (attempt - 1))
+        try:
+            # copy_rates_range 两端都包含，终点取 hi - 1 避免多取下个窗口的第一根
+            rates = mt5.copy_rates_range(symbol, tf, _utc(lo), _utc(hi - 1))
+        except Exception as e:
+            error = repr(e)
+            continue
+        if rates is not None:
+            return rates
+        error = str(mt5.last_error())
+    raise RuntimeError(f"{symbol} {_utc(lo):%Y-%m-%d} ~ {_utc(hi):%Y-%m-%d} 取数失败: {error}")
+
+
+def backfill(dataset: PartitionedDataset, symbol: str, timeframe: str, start, end, mt5=None,
+             workers: int = 4, retries: int = 3, backoff: float = 1.0,
+             manifest_path: Optional[Path] = None, pyramid: bool = True, now=None) -> Dict:
+    """
+    按月窗口并发回补 [start, end) 的历史数据
+
+    参数:
+        dataset: 目标数据集
+        symbol, timeframe: 品种与周期名（如 "EURUSD@", "M1"）
+        start, end: 回补区间
+        mt5: MT5 接口对象，None 时使用 load_mt5()；调用方负责 initialize/shutdown
+        workers: 同时进行的请求数
+        retries, backoff: 每个窗口的重试次数与初始退避秒数
+        manifest_path: 清单路径，默认放在序列目录下
+        pyramid: 回补 M1 时是否同时生成该窗口的高周期
+        now: 当前时间，默认当前 UTC 时间；终点晚于它的窗口只记为 partial（覆盖到 now）
+
+    返回:
+        {"done": 本次完成的窗口数, "skipped": 清单中已完成而跳过的窗口数, "failed": 失败窗口键列表,
+         "partial": 尚未结束的窗口键列表, "bars": 写入根数}
+    """
+    now = to_epoch(now) if now is not None else int(time.time())
+    mt5 = mt5 or load_mt5()
+    tf = timeframe_const(mt5, timeframe)
+    manifest = BackfillManifest(
+        manifest_path or dataset.series_dir(symbol, timeframe) / MANIFEST_NAME, symbol, timeframe
+    )
+
+    windows = month_windows(start, end)
+    pending = [w for w in windows if not manifest.is_done(*w)]
+    result = {"done": 0, "skipped": len(windows) - len(pending), "failed": [], "partial": [], "bars": 0}
+    if not pending:
+        return result
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(fetch_window, mt5, symbol, tf, lo, hi, retries, backoff): (key, lo, hi)
+                   for key, lo, hi in pending}
+        # 写分区与清单都在主线程完成：每个窗口只对应一个月份分区，清单只有一个写入者
+        for future in as_completed(futures):
+            key, lo, hi = futures[future]
+            try:
+                bars = rates_to_bars(future.result())
+            except RuntimeError as e:
+                manifest.mark(key, status="failed", start=lo, end=hi, error=str(e))
+                result["failed"].append(key)
+                print(f"  ❌ {key}: {e}")
+                continue
+            dataset.write(symbol, timeframe, bars)
+            if pyramid and timeframe.upper() == BASE_TIMEFRAME:
+                update_pyramid(dataset, symbol, lo, hi)
+            n = int(len(bars["time"]))
+            result["bars"] += n
+            if hi > now:
+                # 窗口还没结束：之后到达的 K 线不在本次结果里，不能记为完成
+                manifest.mark(key, status="partial", start=lo, end=max(lo, now), bars=n)
+                result["partial"].append(key)
+                print(f"  … {key}: {n} 根（窗口未结束，下次运行重新回补）")
+                continue
+            manifest.mark(key, status="done", start=lo, end=hi, bars=n)
+            result["done"] += 1
+            print(f"  ✔ {key}: {n} 根")
+
+    result["failed"].sort()
+    result["partial"].sort()
+    return result
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+MT5 增量同步 (Incremental Sync)
+
+每次只向 MT5 请求数据集中最后一根 K 线之后的数据：
+    1. 从 PartitionedDataset 读取已存储的最后时间戳
+    2. copy_rates_range(最后时间戳, 现在) —— 包含最后一根，以刷新当时尚未收盘的 K 线
+    3. 与已有分区合并去重（同一时间戳以新数据为准），每个分区原子替换
+数据集为空时先用 copy_rates_from_pos 取最近 initial_count 根作为起点。
+历史随每次同步累积，不受终端 10k 根窗口限制。
+
+MT5 模块可替换：
+    load_mt5()            优先 MetaTrader5；环境变量 QTM_MT5_BACKEND=fake 时使用 FakeMT5
+    sync_symbol(..., mt5=FakeMT5(...))  直接传入替身
+
+命令行：
+    py -m src.data_loader.mt5_sync EURUSD@ --timeframe M1 --root Data/dataset
+"""
+
+import argparse
+import os
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+import numpy as np
+
+from .bar_store import BAR_COLUMNS, BAR_DTYPES, Bars, format_epoch, to_epoch
+from .partitioned import PartitionedDataset
+from .pyramid import BASE_TIMEFRAME, TIMEFRAME_SECONDS, update_pyramid
+
+BACKEND_ENV = "QTM_MT5_BACKEND"
+INITIAL_COUNT = 10000
+
+
+def load_mt5(backend: Optional[str] = None):
+    """
+    返回 MT5 接口对象
+
+    参数:
+        backend: "mt5" / "fake"；None 时读取环境变量 QTM_MT5_BACKEND（默认 mt5）
+    """
+    backend = (backend or os.environ.get(BACKEND_ENV) or "mt5").lower()
+    if backend == "fake":
+        from .fake_mt5 import FakeMT5
+        return FakeMT5()
+    import MetaTrader5 as mt5
+    return mt5
+
+
+def timeframe_const(mt5, timeframe: str) -> int:
+    """'M1' / 'H1' 等周期名 -> MT5 常量"""
+    return getattr(mt5, f"TIMEFRAME_{timeframe.upper()}")
+
+
+def rates_to_bars(rates) -> Bars:
+    """MT5 结构化数组 -> 列式 K 线（tick_volume 作为 volume）"""
+    if rates is None or len(rates) == 0:
+        return {c: np.empty(0, dtype=BAR_DTYPES[c]) for c in BAR_COLUMNS}
+    return {
+        "time": np.asarray(rates["time"], dtype=np.int64),
+        "open": np.asarray(rates["open"], dtype=np.float64),
+        "high": np.asarray(rates["high"], dtype=np.float64),
+        "low": np.asarray(rates["low"], dtype=np.float64),
+        "close": np.asarray(rates["close"], dtype=np.float64),
+        "volume": np.asarray(rates["tick_volume"], dtype=np.float64),
+    }
+
+
+def _utc(t: int) -> datetime:
+    return datetime.fromtimestamp(int(t), tz=timezone.utc)
+
+
+def sync_symbol(dataset: PartitionedDataset, symbol: str, timeframe: str = "M1", mt5=None,
+                now=None, initial_count: int = INITIAL_COUNT, pyramid: bool = True) -> Dict:
+    """
+    把 MT5 上比数据集更新的 K 线同步进数据集
+
+    参数:
+        dataset: 目标数据集
+        symbol: 品种（如 "EURUSD@"）
+        timeframe: 周期名（如 "M1"）
+        mt5: MT5 接口对象，None 时使用 load_mt5()；调用方负责 initialize/shutdown
+        now: 同步截止时间，默认当前 UTC 时间
+        initial_count: 数据集为空时首次拉取的 K 线数
+        pyramid: 同步 M1 后是否增量更新高周期（只重算新数据所在的桶）
+
+    返回:
+        {"fetched": 本次收到的根数, "new": 新增根数, "last_time": 同步后最后时间戳,
+         "gap": 终端返回的数据没有覆盖到上次的最后一根（间隔超过终端历史窗口）, "partitions": 改写的分区}
+    """
+    mt5 = mt5 or load_mt5()
+    tf = timeframe_const(mt5, timeframe)
+    last = dataset.last_time(symbol, timeframe)
+
+    if last is None:
+        rates = mt5.copy_rates_from_pos(symbol, tf, 0, initial_count)
+    else:
+        end = _utc(to_epoch(now)) if now is not None else datetime.now(timezone.utc)
+        rates = mt5.copy_rates_range(symbol, tf, _utc(last), end)
+    if rates is None:
+        raise RuntimeError(f"MT5 取数失败: {mt5.last_error()}")
+
+    bars = rates_to_bars(rates)
+    new = int(len(bars["time"])) if last is None else int(np.count_nonzero(bars["time"] > last))
+    gap = last is not None and len(bars["time"]) > 0 and int(bars["time"][0]) > last
+    written = dataset.write(symbol, timeframe, bars)
+    if pyramid and timeframe.upper() == BASE_TIMEFRAME and len(bars["time"]):
+        update_pyramid(dataset, symbol, int(bars["time"][0]), int(bars["time"][-1]) + TIMEFRAME_SECONDS["M1"])
+    return {
+        "fetched": int(len(bars["time"])),
+        "new": new,
+        "last_time": dataset.last_time(symbol, timeframe),
+        "gap": gap,
+        "partitions": written,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incrementally sync MT5 bars into a partitioned dataset")
+    parser.add_argument("symbol", help="e.g. EURUSD@")
+    parser.add_argument("--timeframe", default="M1")
+    parser.add_argument("--root", default="Data/dataset", help="dataset directory")
+    parser.add_argument("--backend", default=None, help="mt5 / fake")
+    args = parser.parse_args()
+
+    mt5 = load_mt5(args.backend)
+    if not mt5.initialize():
+        raise SystemExit(f"❌ MT5 Initialize failed, error code = {mt5.last_error()}")
+    try:
+        result = sync_symbol(PartitionedDataset(args.root), args.symbol, args.timeframe, mt5=mt5)
+    finally:
+        mt5.shutdown()
+    last = result["last_time"]
+    print(f"✅ 收到 {result['fetched']} 根，新增 {result['new']} 根，"
+          f"最新 {format_epoch(last) if last is not None else '-'}")
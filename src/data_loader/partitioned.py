@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""
+分区 K 线数据集 (Partitioned Dataset)
+
+目录布局（每个分区是一个 .bars 文件，格式见 bar_store）：
+    <root>/<SYMBOL>/<TF>/<YYYY>/<MM>.bars
+    例：Data/dataset/EURUSD/M1/2024/03.bars
+
+读取接口接受 [start, end) 时间区间，只打开与区间重叠的月份分区，
+每个分区以内存映射方式打开并用二分查找截取，两周的回放/检测窗口不会触碰其余历史。
+
+用法：
+    ds = PartitionedDataset("Data/dataset")
+    ds.import_file("EURUSD", "M1", "Data/split_by_year/EURUSD_2024.csv")
+    bars = ds.read("EURUSD", "M1", "2024-03-01", "2024-03-15")
+
+紧凑存储：PartitionedDataset(root, compact=True) 以定点整数写入分区（见 compact），读取时自动解码。
+
+命令行导入：
+    py -m src.data_loader.partitioned EURUSD M1 Data/split_by_year/EURUSD_*.csv --root Data/dataset
+"""
+
+import argparse
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .bar_archive import BarArchive, merge_bars
+from .bar_store import BAR_COLUMNS, BAR_DTYPES, BARS_SUFFIX, Bars, PathLike, load_bars, to_epoch, write_bars
+from .compact import CompactBars
+
+Month = Tuple[int, int]
+
+
+def month_of(t: int) -> Month:
+    """纪元秒所在的 (年, 月)"""
+    m = int(np.datetime64(int(t), "s").astype("datetime64[M]").astype(np.int64))
+    return 1970 + m // 12, m % 12 + 1
+
+
+def month_bounds(year: int, month: int) -> Tuple[int, int]:
+    """月份分区覆盖的时间区间 [月初, 下月初)，纪元秒"""
+    m = (year - 1970) * 12 + (month - 1)
+    start = np.datetime64(m, "M").astype("datetime64[s]").astype(np.int64)
+    end = np.datetime64(m + 1, "M").astype("datetime64[s]").astype(np.int64)
+    return int(start), int(end)
+
+
+def months_between(start: int, end: int) -> List[Month]:
+    """与 [start, end) 重叠的所有月份"""
+    if end <= start:
+        return []
+    first = np.datetime64(int(start), "s").astype("datetime64[M]").astype(np.int64)
+    last = np.datetime64(int(end) - 1, "s").astype("datetime64[M]").astype(np.int64)
+    return [(1970 + m // 12, m % 12 + 1) for m in range(int(first), int(last) + 1)]
+
+
+class PartitionedDataset:
+    """按 symbol / timeframe / 年 / 月 分区的 K 线数据集"""
+
+    def __init__(self, root: PathLike, compact: bool = False):
+        """
+        参数:
+            root: 数据集根目录
+            compact: 写入时是否使用紧凑定点编码（见 compact；读取两种编码的分区都可以）
+        """
+        self.root = Path(root)
+        self.compact = compact
+
+    # ------------------------------------------------------------------
+    # 路径与分区枚举
+    # ------------------------------------------------------------------
+
+    def series_dir(self, symbol: str, timeframe: str) -> Path:
+        return self.root / symbol / timeframe
+
+    def partition_path(self, symbol: str, timeframe: str, year: int, month: int) -> Path:
+        return self.series_dir(symbol, timeframe) / f"{year:04d}" / f"{month:02d}{BARS_SUFFIX}"
+
+    def months(self, symbol: str, timeframe: str) -> List[Month]:
+        """已存在的全部月份分区（按时间排序）"""
+        base = self.series_dir(symbol, timeframe)
+        if not base.exists():
+            return []
+        found = []
+        for year_dir in base.iterdir():
+            if not (year_dir.is_dir() and year_dir.name.isdigit()):
+                continue
+            for f in year_dir.glob(f"*{BARS_SUFFIX}"):
+                if f.stem.isdigit():
+                    found.append((int(year_dir.name), int(f.stem)))
+        return sorted(found)
+
+    def partitions(self, symbol: str, timeframe: str, start=None, end=None) -> List[Path]:
+        """
+        与 [start, end) 重叠的分区文件
+
+        给定两端时直接按月份推算路径，不扫描目录
+        """
+        if start is not None and end is not None:
+            candidates = months_between(to_epoch(start), to_epoch(end))
+            paths = [self.partition_path(symbol, timeframe, y, m) for y, m in candidates]
+            return [p for p in paths if p.exists()]
+
+        lo = None if start is None else to_epoch(start)
+        hi = None if end is None else to_epoch(end)
+        paths = []
+        for y, m in self.months(symbol, timeframe):
+            m_start, m_end = month_bounds(y, m)
+            if (hi is None or m_start < hi) and (lo is None or m_end > lo):
+                paths.append(self.partition_path(symbol, timeframe, y, m))
+        return paths
+
+    # ------------------------------------------------------------------
+    # 读取
+    # ------------------------------------------------------------------
+
+    def read(self, symbol: str, timeframe: str, start=None, end=None) -> Bars:
+        """
+        读取 [start, end) 区间的 K 线
+
+        只打开重叠的分区；每个分区内用二分查找截取，再拼接为连续数组
+        """
+        parts = []
+        for path in self.partitions(symbol, timeframe, start, end):
+            archive = BarArchive(path)
+            parts.append({k: np.array(v) for k, v in archive.slice(start, end).items()})
+            archive.close()
+        if not parts:
+            return {c: np.empty(0, dtype=BAR_DTYPES[c]) for c in BAR_COLUMNS}
+        return {c: np.concatenate([p[c] for p in parts]) for c in parts[0]}
+
+    def first_time(self, symbol: str, timeframe: str) -> Optional[int]:
+        months = self.months(symbol, timeframe)
+        if not months:
+            return None
+        archive = BarArchive(self.partition_path(symbol, timeframe, *months[0]))
+        first = archive.first_time
+        archive.close()
+        return first
+
+    def last_time(self, symbol: str, timeframe: str) -> Optional[int]:
+        months = self.months(symbol, timeframe)
+        if not months:
+            return None
+        archive = BarArchive(self.partition_path(symbol, timeframe, *months[-1]))
+        last = archive.last_time
+        archive.close()
+        return last
+
+    # ------------------------------------------------------------------
+    # 写入
+    # ------------------------------------------------------------------
+
+    def write(self, symbol: str, timeframe: str, bars: Bars) -> List[Path]:
+        """
+        把 K 线写入对应的月份分区
+
+        与已有分区合并（同一时间戳以新数据为准），每个分区先写临时文件再原子替换
+
+        返回:
+            被改写的分区路径
+        """
+        if not bars or len(bars["time"]) == 0:
+            return []
+        bars = merge_bars(bars)
+        months = bars["time"].astype("datetime64[s]").astype("datetime64[M]").astype(np.int64)
+        change = np.flatnonzero(np.diff(months)) + 1
+        starts = np.concatenate(([0], change))
+        ends = np.concatenate((change, [len(months)]))
+
+        written = []
+        for a, b in zip(starts, ends):
+            m = int(months[a])
+            year, month = 1970 + m // 12, m % 12 + 1
+            chunk = {c: v[a:b] for c, v in bars.items()}
+            path = self.partition_path(symbol, timeframe, year, month)
+            if path.exists():
+                # 先复制并释放映射，再原子替换（Windows 不允许替换仍被映射的文件）
+                archive = BarArchive(path)
+                existing = {k: np.array(v) for k, v in archive.slice().items()}
+                archive.close()
+                chunk = merge_bars(existing, chunk)
+            meta = {"symbol": symbol, "timeframe": timeframe, "year": year, "month": month}
+            if self.compact:
+                CompactBars.from_bars(chunk, symbol=symbol).write(path, meta=meta)
+            else:
+                write_bars(path, chunk, meta=meta)
+            written.append(path)
+        return written
+
+    def import_file(self, symbol: str, timeframe: str, path: PathLike) -> List[Path]:
+        """导入一个 CSV 或 .bars 文件"""
+        return self.write(symbol, timeframe, load_bars(path))
+
+
+def import_files(root: PathLike, symbol: str, timeframe: str, sources: Iterable[PathLike],
+                 compact: bool = False) -> PartitionedDataset:
+    ds = PartitionedDataset(root, compact=compact)
+    for src in sources:
+        written = ds.import_file(symbol, timeframe, src)
+        print(f"  {src}: {len(written)} 个分区")
+    return ds
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import bar files into a partitioned dataset")
+    parser.add_argument("symbol", help="e.g. EURUSD")
+    parser.add_argument("timeframe", help="e.g. M1")
+    parser.add_argument("sources", nargs="+", help="CSV or .bars files")
+    parser.add_argument("--root", default="Data/dataset", help="dataset directory")
+    parser.add_argument("--compact", action="store_true", help="store partitions in the compact fixed-point encoding")
+    args = parser.parse_args()
+
+    import_files(args.root, args.symbol, args.timeframe, args.sources, compact=args.compact)
+    print("✅ 导入完成")
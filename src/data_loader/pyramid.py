@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+多周期金字塔 (Timeframe Pyramid)
+
+由 M1 一次性派生 M5 / M15 / H1 / H4 / D1，并与 M1 存放在一起，所有脚本读取同一份聚合结果。
+
+聚合规则与 df.resample(...).agg({Open: first, High: max, Low: min, Close: last, Volume: sum}).dropna() 一致：
+    - 桶按纪元秒对齐（bucket = time // 周期秒数 * 周期秒数），H4 从 00:00 起每 4 小时一桶，D1 为自然日
+    - 没有 M1 数据的桶不产生 K 线
+    - 整个过程是向量化的：一次 diff 找出桶边界，再用 ufunc.reduceat 计算 High/Low/Volume
+
+存放位置：
+    分区数据集：<root>/<SYMBOL>/<TF>/<YYYY>/<MM>.bars（与 M1 同构）
+    单个 CSV / .bars 文件：同目录的 <stem>.<TF>.bars，按 M1 来源文件的大小/修改时间判断是否过期
+
+增量更新：新 M1 追加后，只需从受影响的最粗一级桶（D1 的当天 00:00）开始重算，
+合并写入时同一时间戳以新结果为准，未收盘的高周期 K 线会被覆盖刷新。
+"""
+
+from pathlib import Path
+from typing import Dict, Iterable
+
+import numpy as np
+
+from .bar_store import BAR_COLUMNS, BAR_DTYPES, BARS_SUFFIX, Bars, PathLike, load_bars, read_bars, \
+    read_header, source_stamp, to_epoch, write_bars
+from .partitioned import PartitionedDataset, month_bounds
+
+TIMEFRAME_SECONDS: Dict[str, int] = {
+    "M1": 60,
+    "M5": 300,
+    "M15": 900,
+    "M30": 1800,
+    "H1": 3600,
+    "H4": 14400,
+    "D1": 86400,
+}
+PYRAMID = ("M5", "M15", "H1", "H4", "D1")
+BASE_TIMEFRAME = "M1"
+
+
+def resample_bars(bars: Bars, seconds: int) -> Bars:
+    """
+    把按时间排序的 K 线聚合到 seconds 周期（桶按纪元秒对齐）
+
+    返回:
+        聚合后的 K 线，time 为桶的起始时间
+    """
+    times = bars["time"]
+    if len(times) == 0:
+        return {c: np.empty(0, dtype=BAR_DTYPES[c]) for c in BAR_COLUMNS}
+    buckets = times // seconds * seconds
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(buckets)) + 1))
+    ends = np.concatenate((starts[1:], [len(times)]))
+    return {
+        "time": buckets[starts],
+        "open": bars["open"][starts],
+        "high": np.maximum.reduceat(bars["high"], starts),
+        "low": np.minimum.reduceat(bars["low"], starts),
+        "close": bars["close"][ends - 1],
+        "volume": np.add.reduceat(bars["volume"], starts),
+    }
+
+
+def timeframe_seconds(timeframe: str) -> int:
+    try:
+        return TIMEFRAME_SECONDS[timeframe.upper()]
+    except KeyError:
+        raise ValueError(f"未知周期: {timeframe}")
+
+
+# ----------------------------------------------------------------------
+# 分区数据集
+# ----------------------------------------------------------------------
+
+def update_pyramid(dataset: PartitionedDataset, symbol: str, start=None, end=None,
+                   timeframes: Iterable[str] = PYRAMID) -> Dict[str, int]:
+    """
+    由 M1 重算 [start, end) 内受影响的高周期 K 线
+
+    start / end 会分别向下 / 向上取整到最粗一级周期的桶边界，保证被截断的桶完整重算；
+    按月份逐个处理，内存占用与数据集总长度无关（所有周期都不跨自然日，自然也不跨月）。
+
+    返回:
+        周期 -> 写入的 K 线根数
+    """
+    timeframes = list(timeframes)
+    coarsest = max(timeframe_seconds(tf) for tf in timeframes)
+    lo = None if start is None else to_epoch(start) // coarsest * coarsest
+    hi = None if end is None else -(-to_epoch(end) // coarsest) * coarsest
+
+    counts = {tf: 0 for tf in timeframes}
+    for y, m in dataset.months(symbol, BASE_TIMEFRAME):
+        m_start, m_end = month_bounds(y, m)
+        if (lo is not None and m_end <= lo) or (hi is not None and m_start >= hi):
+            continue
+        m1 = dataset.read(symbol, BASE_TIMEFRAME,
+                          m_start if lo is None else max(m_start, lo),
+                          m_end if hi is None else min(m_end, hi))
+        for tf in timeframes:
+            agg = resample_bars(m1, timeframe_seconds(tf))
+            dataset.write(symbol, tf, agg)
+            counts[tf] += int(len(agg["time"]))
+    return counts
+
+
+def build_pyramid(dataset: PartitionedDataset, symbol: str,
+                  timeframes: Iterable[str] = PYRAMID) -> Dict[str, int]:
+    """由全部 M1 分区重建所有高周期"""
+    return update_pyramid(dataset, symbol, timeframes=timeframes)
+
+
+# ----------------------------------------------------------------------
+# 单文件（CSV / .bars）
+# ----------------------------------------------------------------------
+
+def timeframe_path_for(path: PathLike, timeframe: str) -> Path:
+    """单文件对应的高周期缓存：EURUSD_2024.csv -> EURUSD_2024.H1.bars"""
+    path = Path(path)
+    return path.with_name(f"{path.stem}.{timeframe.upper()}{BARS_SUFFIX}")
+
+
+def load_timeframe(source: PathLike, timeframe: str, symbol: str = "EURUSD", start=None, end=None) -> Bars:
+    """
+    读取任意周期的 K 线
+
+    参数:
+        source: 分区数据集目录，或 M1 的 CSV / .bars 文件
+        timeframe: 周期名（M1 直接返回原始数据）
+        symbol: 数据集目录时使用的品种
+        start, end: 数据集目录时的读取区间
+
+    返回:
+        列式 K 线
+    """
+    source = Path(source)
+    timeframe = timeframe.upper()
+    if source.is_dir():
+        ds = PartitionedDataset(source)
+        if timeframe != BASE_TIMEFRAME and not ds.months(symbol, timeframe):
+            build_pyramid(ds, symbol)
+        return ds.read(symbol, timeframe, start, end)
+
+    if timeframe == BASE_TIMEFRAME:
+        return load_bars(source)
+
+    cache = timeframe_path_for(source, timeframe)
+    stamp = source_stamp(source)
+    if cache.exists():
+        try:
+            meta = read_header(cache).get("meta", {})
+            if all(meta.get(k) == v for k, v in stamp.items()):
+                return read_bars(cache)
+        except (OSError, ValueError):
+            pass
+
+    bars = resample_bars(load_bars(source), timeframe_seconds(timeframe))
+    try:
+        write_bars(cache, bars, meta=dict(stamp, timeframe=timeframe))
+    except OSError as e:
+        print(f"⚠️ 无法写入缓存 {cache}: {e}")
+    return bars
@@ -0,0 +1,11 @@
+# -*- coding: utf-8 -*-
+"""
+策略层：形态识别使用的数组化算法
+"""
+
+from .zigzag import HAS_NUMBA, ZIGZAG_VERSION, LiveZigZag, PivotEvent, PivotSweep, zigzag_pivots, zigzag_sweep
+from .pivot_cache import PivotCache, data_fingerprint, timeframe_of
+from .feature_index import FeatureIndex
+from .interval_index import IntervalIndex
+from .pattern_rules import BUILTIN_RULES, FLAG, THREE, PatternRule
+from .dtw import MATCH_DTYPE, STANDARD_TEMPLATES, TemplateIndex, dtw_distance, lb_keogh, lb_kim, znorm
@@ -0,0 +1,473 @@
+# -*- coding: utf-8 -*-
+"""
+DTW 模板匹配引擎
+
+把价格窗口或拐点窗口与一组形态模板（标准上三、下三、上旗、下旗，或从实例截取的走势）比较，
+按约束 DTW 距离找出最相似的位置：
+
+    index = TemplateIndex.standard()                     # 内置标准结构模板
+    index.add("202010-01", close[i0:i1])                  # 从实例行情截取的模板
+    hits = index.search(close, windows=(60, 120, 240), k=5)          # 价格窗口
+    hits = index.search_pivots(pivot_pos, pivot_price, counts=(5, 6))  # 拐点窗口
+
+流程（UCR Suite 的做法，按批向量化）：
+    1. 窗口与模板都重采样到同一长度并 z 标准化（与价位、波动幅度、时间跨度无关）
+    2. 下界：LB_Kim（首尾两点）与双向 LB_Keogh（模板包络 vs 窗口、窗口包络 vs 模板），
+       所有窗口一次算完，取最大者
+    3. 按下界从小到大分批计算精确 DTW（Sakoe-Chiba 带），当前第 k 名的距离作为阈值：
+       下界超过阈值的窗口不再计算，DTW 逐行累积超过阈值时提前放弃
+    4. 同一模板的匹配默认互不重叠（按距离贪心，IntervalIndex 判重）
+
+距离为平方差累积后开方。内核：
+    - numba 可用时逐窗口调用 JIT 编译的带状 DTW
+    - 否则使用纯 NumPy 批量内核：逐行推进，行内 D[i, j] = c[j] + min(v[j], D[i, j-1]) 的递推
+      写成前缀和 + minimum.accumulate，一行只有几次向量运算；与逐格实现在舍入误差内一致
+多进程按模板划分（各模板的搜索相互独立），结果与串行完全相同。
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .interval_index import IntervalIndex
+
+try:
+    import numba
+except ImportError:  # numba 是可选依赖
+    numba = None
+
+HAS_NUMBA = numba is not None
+TEMPLATE_LENGTH = 64
+BATCH = 256
+
+MATCH_DTYPE = np.dtype([
+    ("template", "i4"),       # 模板序号（TemplateIndex.names 中的位置）
+    ("start", "i8"),          # 窗口起点（K 线位置）
+    ("end", "i8"),            # 窗口终点（不含）
+    ("distance", "f8"),       # DTW 距离
+])
+
+# 标准结构模型（triangle_standards.md 与 energy_theory_notes.md）：(拐点时间, 拐点价格)，向上形态，
+# 释放段高度为 1、时间为 1；向下形态是价格取负的镜像
+STANDARD_TEMPLATES: Dict[str, Tuple[Tuple[float, ...], Tuple[float, ...]]] = {
+    # 释放 0->1，回撤不过一半，高点 1-3-5 递降、低点 2-4 递升，积累时间 > 2 倍释放时间
+    "upper_three": ((0, 1, 1.6, 2.2, 2.8, 3.4), (0, 1, 0.55, 0.9, 0.65, 0.8)),
+    "lower_three": ((0, 1, 1.6, 2.2, 2.8, 3.4), (0, -1, -0.55, -0.9, -0.65, -0.8)),
+    # 旗杆 0->1，旗面 A-B-C-D 逆旗杆方向的平行通道，回撤不过一半
+    "upper_flag": ((0, 1, 1.5, 2, 2.5), (0, 1, 0.7, 0.85, 0.55)),
+    "lower_flag": ((0, 1, 1.5, 2, 2.5), (0, -1, -0.7, -0.85, -0.55)),
+}
+
+
+# ----------------------------------------------------------------------
+# 预处理：重采样、z 标准化、包络
+# ----------------------------------------------------------------------
+
+def znorm(x) -> np.ndarray:
+    """沿最后一维 z 标准化；常数窗口返回全 0"""
+    x = np.asarray(x, dtype=np.float64)
+    mean = x.mean(axis=-1, keepdims=True)
+    std = x.std(axis=-1, keepdims=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(std > 0, (x - mean) / std, 0.0)
+
+
+def resample(x, length: int) -> np.ndarray:
+    """沿最后一维线性插值到 length 个等距点（一维或按行的二维数组）"""
+    x = np.asarray(x, dtype=np.float64)
+    n = x.shape[-1]
+    if n == length:
+        return x.copy()
+    if n == 1:
+        return np.repeat(x, length, axis=-1)
+    t = np.linspace(0, n - 1, length)
+    i0 = np.minimum(t.astype(np.int64), n - 2)
+    w = t - i0
+    return x[..., i0] * (1 - w) + x[..., i0 + 1] * w
+
+
+def polyline(times, prices, length: int) -> np.ndarray:
+    """
+    拐点折线按时间等距采样 length 个点
+
+    参数:
+        times, prices: 一维（单条折线）或 (n, m) 二维（n 条 m 点折线），时间单调不减
+        length: 采样点数
+    """
+    times = np.asarray(times, dtype=np.float64)
+    prices = np.asarray(prices, dtype=np.float64)
+    single = times.ndim == 1
+    t, p = np.atleast_2d(times), np.atleast_2d(prices)
+    grid = t[:, :1] + (t[:, -1:] - t[:, :1]) * np.linspace(0, 1, length)
+    # 每个采样点落在第几段：内部拐点中不晚于它的个数
+    seg = (t[:, None, 1:-1] <= grid[:, :, None]).sum(axis=2)
+    rows = np.arange(len(t))[:, None]
+    t0, t1 = t[rows, seg], t[rows, seg + 1]
+    p0, p1 = p[rows, seg], p[rows, seg + 1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        w = np.where(t1 > t0, (grid - t0) / (t1 - t0), 0.0)
+    out = p0 + (p1 - p0) * w
+    return out[0] if single else out
+
+
+def envelope(x, radius: int) -> Tuple[np.ndarray, np.ndarray]:
+    """沿最后一维 [i - radius, i + radius] 的滑动最小 / 最大值（LB_Keogh 的上下包络）"""
+    x = np.asarray(x, dtype=np.float64)
+    # 边缘值填充：窗口越界部分重复端点，最小 / 最大值与截断窗口相同
+    pad = np.pad(x, [(0, 0)] * (x.ndim - 1) + [(radius, radius)], mode="edge")
+    win = sliding_window_view(pad, 2 * radius + 1, axis=-1)
+    return win.min(axis=-1), win.max(axis=-1)
+
+
+# ----------------------------------------------------------------------
+# 下界（平方距离）
+# ----------------------------------------------------------------------
+
+def lb_kim(query, candidates) -> np.ndarray:
+    """LB_Kim（首尾版）：DTW 路径必经首尾两格"""
+    query = np.asarray(query, dtype=np.float64)
+    candidates = np.asarray(candidates, dtype=np.float64)
+    return np.square(candidates[..., 0] - query[0]) + np.square(candidates[..., -1] - query[-1])
+
+
+def lb_keogh(candidates, lower, upper) -> np.ndarray:
+    """LB_Keogh：序列落在另一条序列的带状包络 [lower, upper] 之外的部分"""
+    candidates = np.asarray(candidates, dtype=np.float64)
+    above = np.maximum(candidates - upper, 0.0)
+    below = np.maximum(lower - candidates, 0.0)
+    return (np.square(above) + np.square(below)).sum(axis=-1)
+
+
+# ----------------------------------------------------------------------
+# DTW 内核（平方距离，超过 best 时返回 inf）
+# ----------------------------------------------------------------------
+
+def _dtw_loop(a, b, radius, best):
+    """逐格带状 DTW（numba 编译的对象；也是其它实现的参照）"""
+    n = len(a)
+    prev = np.full(n + 1, np.inf)
+    cur = np.full(n + 1, np.inf)
+    prev[0] = 0.0
+    # prev[j + 1] = D[i - 1, j]，prev[0] 是 j = -1 的哨兵（只有 D[-1, -1] = 0）
+    for i in range(n):
+        lo = max(0, i - radius)
+        hi = min(n - 1, i + radius)
+        cur[:] = np.inf
+        row_min = np.inf
+        for j in range(lo, hi + 1):
+            d = a[i] - b[j]
+            c = d * d + min(prev[j], prev[j + 1], cur[j])
+            cur[j + 1] = c
+            if c < row_min:
+                row_min = c
+        if row_min > best:
+            return np.inf
+        prev, cur = cur, prev
+    return prev[n]
+
+
+_dtw_jit = numba.njit(cache=True, nogil=True)(_dtw_loop) if HAS_NUMBA else None
+
+
+def _dtw_each(a, candidates, radius, best, kernel):
+    return np.array([kernel(a, c, radius, best) for c in candidates], dtype=np.float64)
+
+
+def _dtw_numpy(a, candidates, radius, best):
+    """批量带状 DTW：逐行推进所有窗口，行内递推用前缀和 + minimum.accumulate 一次求出"""
+    n, length = candidates.shape
+    out = np.full(n, np.inf)
+    alive = np.arange(n)
+    c = candidates
+    # prev[:, j + 1] = D[i - 1, j]；多留一列，带外的列始终为 inf
+    prev = np.full((n, length + 2), np.inf)
+    prev[:, 0] = 0.0
+    for i in range(length):
+        lo = max(0, i - radius)
+        hi = min(length - 1, i + radius)
+        cost = np.square(c[:, lo:hi + 1] - a[i])
+        v = np.minimum(prev[:, lo:hi + 1], prev[:, lo + 1:hi + 2])
+        # D[i, j] = min_{k<=j} (v[k] + cost[k..j]) = S[j] + min_{k<=j} (v[k] - S[k-1])
+        s = np.cumsum(cost, axis=1)
+        row = s + np.minimum.accumulate(v - (s - cost), axis=1)
+        prev[:, lo + 1:hi + 2] = row
+        prev[:, lo] = np.inf
+        keep = row.min(axis=1) <= best
+        if not keep.all():
+            alive, c, prev = alive[keep], c[keep], prev[keep]
+            if not len(alive):
+                return out
+    out[alive] = prev[:, length]
+    return out
+
+
+def _dtw_kernel(backend: str):
+    if backend == "auto":
+        backend = "numba" if HAS_NUMBA else "numpy"
+    if backend == "numba":
+        if not HAS_NUMBA:
+            raise ImportError("numba 未安装，无法使用 JIT 内核")
+        return lambda a, c, radius, best: _dtw_each(a, c, radius, best, _dtw_jit)
+    if backend == "numpy":
+        return _dtw_numpy
+    if backend == "python":
+        return lambda a, c, radius, best: _dtw_each(a, c, radius, best, _dtw_loop)
+    raise ValueError(f"未知 backend: {backend}")
+
+
+def dtw_distance(a, b, band: float = 0.1, backend: str = "auto") -> float:
+    """
+    两条等长序列的 Sakoe-Chiba 带约束 DTW 距离（不做标准化）
+
+    参数:
+        a, b: 一维等长序列
+        band: 带宽占长度的比例（0 即欧氏距离，1 即无约束）
+        backend: "auto" / "numba" / "numpy" / "python"
+    """
+    a = np.ascontiguousarray(a, dtype=np.float64)
+    b = np.ascontiguousarray(b, dtype=np.float64)
+    if a.shape != b.shape or a.ndim != 1:
+        raise ValueError(f"DTW 需要等长一维序列: {a.shape} vs {b.shape}")
+    radius = int(round(band * len(a)))
+    return float(np.sqrt(_dtw_kernel(backend)(a, b[None, :], radius, np.inf)[0]))
+
+
+# ----------------------------------------------------------------------
+# 单个模板的 k 近邻搜索
+# ----------------------------------------------------------------------
+
+def _select(dist, spans, k, overlap, limit) -> np.ndarray:
+    """按 (距离, 起点) 取前 k 个；overlap=False 时贪心跳过与已选窗口重叠的"""
+    idx = np.flatnonzero(dist <= limit)
+    idx = idx[np.lexsort((spans[idx, 0], dist[idx]))]
+    if overlap:
+        return idx if k is None else idx[:k]
+    seen = IntervalIndex()
+    picked = []
+    for i in idx.tolist():
+        if seen.add(int(spans[i, 0]), int(spans[i, 1]) - 1):
+            picked.append(i)
+            if k is not None and len(picked) == k:
+                break
+    return np.array(picked, dtype=np.int64)
+
+
+def _search_template(query, lower, upper, windows, win_lower, win_upper, spans, radius,
+                     k, max_distance, overlap, kernel) -> np.ndarray:
+    """一个模板对全部窗口：下界排序、分批精确 DTW、阈值随第 k 名收紧，返回 (窗口下标, 平方距离)"""
+    limit = np.inf if max_distance is None else float(max_distance) ** 2
+    lb = np.maximum(lb_kim(query, windows), lb_keogh(windows, lower, upper))
+    lb = np.maximum(lb, lb_keogh(query, win_lower, win_upper))
+    order = np.argsort(lb, kind="stable")
+    order = order[lb[order] <= limit]
+
+    dist = np.full(len(windows), np.inf)
+    best = limit
+    for s in range(0, len(order), BATCH):
+        chunk = order[s:s + BATCH]
+        chunk = chunk[lb[chunk] <= best]
+        if not len(chunk):
+            break  # 按下界排序，之后的窗口下界都超过阈值
+        dist[chunk] = kernel(query, windows[chunk], radius, best)
+        if k is not None:
+            picked = _select(dist, spans, k, overlap, limit)
+            if len(picked) == k:
+                best = dist[picked[-1]]
+    picked = _select(dist, spans, k, overlap, limit)
+    return picked, dist[picked]
+
+
+_SEARCH_STATE = None
+
+
+def _init_search_worker(state):
+    """工作进程初始化：保存窗口矩阵与模板，之后每个任务只传模板序号"""
+    global _SEARCH_STATE
+    _SEARCH_STATE = state
+
+
+def _search_templates(template_ids):
+    state = _SEARCH_STATE
+    kernel = _dtw_kernel(state["backend"])
+    out = []
+    for t in template_ids:
+        picked, dist = _search_template(
+            state["series"][t], state["lower"][t], state["upper"][t],
+            state["windows"], state["win_lower"], state["win_upper"], state["spans"],
+            state["radius"], state["k"], state["max_distance"], state["overlap"], kernel)
+        out.append((t, picked, dist))
+    return out
+
+
+# ----------------------------------------------------------------------
+# 模板索引
+# ----------------------------------------------------------------------
+
+class TemplateIndex:
+    """形态模板集合：统一长度、z 标准化，预先计算包络，供批量相似度搜索"""
+
+    def __init__(self, length: int = TEMPLATE_LENGTH, band: float = 0.1):
+        """
+        参数:
+            length: 模板与窗口重采样后的长度
+            band: Sakoe-Chiba 带宽占长度的比例
+        """
+        self.length = length
+        self.band = band
+        self.radius = max(0, int(round(band * length)))
+        self.names: List[str] = []
+        self._series: List[np.ndarray] = []
+        self._lower: List[np.ndarray] = []
+        self._upper: List[np.ndarray] = []
+
+    @classmethod
+    def standard(cls, length: int = TEMPLATE_LENGTH, band: float = 0.1) -> "TemplateIndex":
+        """内置标准结构模板（STANDARD_TEMPLATES）"""
+        index = cls(length, band)
+        for name, (times, prices) in STANDARD_TEMPLATES.items():
+            index.add_pivots(name, prices, times)
+        return index
+
+    def __len__(self):
+        return len(self.names)
+
+    def __repr__(self):
+        return f"TemplateIndex({len(self)} templates, length={self.length}, radius={self.radius})"
+
+    def add(self, name: str, series) -> int:
+        """添加一段走势（如实例截图对应的收盘价）作为模板，返回模板序号"""
+        series = np.asarray(series, dtype=np.float64).ravel()
+        if len(series) < 2:
+            raise ValueError(f"模板 {name} 至少需要 2 个点")
+        return self._append(name, znorm(resample(series, self.length)))
+
+    def add_pivots(self, name: str, prices, times=None) -> int:
+        """按拐点折线添加模板；times 缺省时拐点等距"""
+        prices = np.asarray(prices, dtype=np.float64).ravel()
+        if len(prices) < 2:
+            raise ValueError(f"模板 {name} 至少需要 2 个拐点")
+        times = np.arange(len(prices)) if times is None else times
+        return self._append(name, znorm(polyline(times, prices, self.length)))
+
+    def _append(self, name, series) -> int:
+        lower, upper = envelope(series, self.radius)
+        self.names.append(name)
+        self._series.append(series)
+        self._lower.append(lower)
+        self._upper.append(upper)
+        return len(self.names) - 1
+
+    def price_windows(self, series, windows: Union[int, Iterable[int]], stride: int = 1):
+        """
+        价格序列的滑动窗口（可多个长度），重采样并 z 标准化
+
+        返回:
+            (窗口矩阵 (n, length), 区间 (n, 2) = [起点, 终点))
+        """
+        series = np.asarray(series, dtype=np.float64).ravel()
+        mats, spans = [], []
+        for w in np.atleast_1d(windows).tolist():
+            if len(series) < w:
+                continue
+            view = sliding_window_view(series, w)[::stride]
+            starts = np.arange(0, len(series) - w + 1, stride, dtype=np.int64)
+            mats.append(znorm(resample(view, self.length)))
+            spans.append(np.column_stack((starts, starts + w)))
+        return self._stack(mats, spans)
+
+    def pivot_windows(self, pos, price, counts: Union[int, Iterable[int]] = (5, 6)):
+        """
+        连续 count 个拐点组成的折线窗口，按 K 线位置采样并 z 标准化
+
+        返回:
+            (窗口矩阵 (n, length), 区间 (n, 2) = [首个拐点位置, 末个拐点位置 + 1))
+        """
+        pos = np.asarray(pos, dtype=np.int64)
+        price = np.asarray(price, dtype=np.float64)
+        mats, spans = [], []
+        for m in np.atleast_1d(counts).tolist():
+            if len(pos) < m:
+                continue
+            t = sliding_window_view(pos, m)
+            mats.append(znorm(polyline(t, sliding_window_view(price, m), self.length)))
+            spans.append(np.column_stack((t[:, 0], t[:, -1] + 1)))
+        return self._stack(mats, spans)
+
+    def _stack(self, mats, spans):
+        if not mats:
+            return np.empty((0, self.length)), np.empty((0, 2), dtype=np.int64)
+        return np.ascontiguousarray(np.concatenate(mats)), np.concatenate(spans)
+
+    def search(self, series, windows: Union[int, Iterable[int]] = (60, 120, 240), stride: int = 1,
+               **kwargs) -> np.ndarray:
+        """
+        在价格序列上搜索与各模板相似的窗口
+
+        参数:
+            series: 价格序列（如收盘价）
+            windows: 窗口长度（K 线数），可给多个以匹配不同时间尺度
+            stride: 窗口步长
+            **kwargs: 见 match
+
+        返回:
+            MATCH_DTYPE 结构化数组，按 (模板, 距离) 排序
+        """
+        return self.match(*self.price_windows(series, windows, stride), **kwargs)
+
+    def search_pivots(self, pos, price, counts: Union[int, Iterable[int]] = (5, 6), **kwargs) -> np.ndarray:
+        """在 ZigZag 拐点序列上搜索：窗口为连续 count 个拐点的折线，其余同 search"""
+        return self.match(*self.pivot_windows(pos, price, counts), **kwargs)
+
+    def match(self, windows, spans, k: Optional[int] = 5, max_distance: Optional[float] = None,
+              overlap: bool = False, workers: Optional[int] = 1, backend: str = "auto") -> np.ndarray:
+        """
+        已标准化的窗口矩阵与全部模板匹配
+
+        参数:
+            windows, spans: price_windows / pivot_windows 的返回值
+            k: 每个模板最多返回的匹配数；None 时返回 max_distance 以内的全部
+            max_distance: 距离上限
+            overlap: 同一模板的匹配是否允许重叠（False 时按距离贪心取互不重叠的窗口）
+            workers: 进程数，None 为 CPU 核数；按模板划分，结果与串行相同
+            backend: DTW 内核 "auto" / "numba" / "numpy" / "python"
+
+        返回:
+            MATCH_DTYPE 结构化数组，按 (模板, 距离) 排序
+        """
+        if k is None and max_distance is None:
+            raise ValueError("k 与 max_distance 至少指定一个")
+        if not len(self) or not len(windows):
+            return np.empty(0, dtype=MATCH_DTYPE)
+        _dtw_kernel(backend)  # 先在主进程检查 backend
+        win_lower, win_upper = envelope(windows, self.radius)
+        state = dict(series=self._series, lower=self._lower, upper=self._upper,
+                     windows=windows, win_lower=win_lower, win_upper=win_upper, spans=spans,
+                     radius=self.radius, k=k, max_distance=max_distance, overlap=overlap, backend=backend)
+
+        ids = list(range(len(self)))
+        workers = min(workers or os.cpu_count() or 1, len(ids))
+        if workers == 1:
+            _init_search_worker(state)
+            try:
+                results = _search_templates(ids)
+            finally:
+                _init_search_worker(None)
+        else:
+            chunks = [ids[j::workers] for j in range(workers)]
+            with ProcessPoolExecutor(workers, initializer=_init_search_worker, initargs=(state,)) as pool:
+                results = [r for part in pool.map(_search_templates, chunks) for r in part]
+            results.sort(key=lambda r: r[0])
+
+        out = np.empty(sum(len(picked) for _, picked, _ in results), dtype=MATCH_DTYPE)
+        i = 0
+        for t, picked, dist in results:
+            j = i + len(picked)
+            out["template"][i:j] = t
+            out["start"][i:j] = spans[picked, 0]
+            out["end"][i:j] = spans[picked, 1]
+            out["distance"][i:j] = np.sqrt(dist)
+            i = j
+        return out
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+K 线特征索引 (Feature Index)
+
+形态检测反复查询任意区间 [a, b) 的统计量，逐次切片重算是 O(区间长度)。
+这里一次预计算，之后每次查询 O(1)：
+    - 阳线 / 阴线数量：前缀和，bullish(a, b) = P[b] - P[a]
+    - 区间最高价 / 最低价：稀疏表（Sparse Table），table[k][i] = 区间 [i, i+2^k) 的极值，
+      查询时用两个重叠的 2^k 区间覆盖 [a, b)
+
+内存：前缀和 O(n)，构造时建好；稀疏表 O(n log n)（M1 十年约 1.3 GB），
+在第一次调用 max_high / min_low 时才构建，只用阳线/阴线计数的检测器不占这部分内存。
+
+用法：
+    fi = FeatureIndex(open_, high, low, close)
+    fi.bullish(a, b), fi.bearish(a, b), fi.max_high(a, b), fi.min_low(a, b)
+"""
+
+import numpy as np
+
+
+def _sparse_table(values: np.ndarray, op) -> list:
+    """按层构建稀疏表：第 k 层长度 n - 2^k + 1"""
+    table = [np.ascontiguousarray(values, dtype=np.float64)]
+    span = 1
+    while 2 * span <= len(values):
+        prev = table[-1]
+        table.append(op(prev[:-span], prev[span:]))
+        span *= 2
+    return table
+
+
+class FeatureIndex:
+    """阳线/阴线前缀计数 + High/Low 区间极值稀疏表（按需构建）"""
+
+    def __init__(self, open_, high, low, close):
+        open_ = np.asarray(open_, dtype=np.float64)
+        close = np.asarray(close, dtype=np.float64)
+        self.n = len(close)
+        self._bull = np.concatenate(([0], np.cumsum(close > open_))).astype(np.int64)
+        self._bear = np.concatenate(([0], np.cumsum(close < open_))).astype(np.int64)
+        self._high = high
+        self._low = low
+        self._max_high = None
+        self._min_low = None
+
+    def bullish(self, a: int, b: int) -> int:
+        """[a, b) 内阳线（Close > Open）数量"""
+        return int(self._bull[b] - self._bull[a])
+
+    def bearish(self, a: int, b: int) -> int:
+        """[a, b) 内阴线（Close < Open）数量"""
+        return int(self._bear[b] - self._bear[a])
+
+    @staticmethod
+    def _query(table, a: int, b: int, op):
+        k = (b - a).bit_length() - 1
+        level = table[k]
+        return op(level[a], level[b - (1 << k)])
+
+    def max_high(self, a: int, b: int) -> float:
+        """[a, b) 内最高价（b > a）"""
+        if self._max_high is None:
+            self._max_high = _sparse_table(self._high, np.maximum)
+        return self._query(self._max_high, a, b, max)
+
+    def min_low(self, a: int, b: int) -> float:
+        """[a, b) 内最低价（b > a）"""
+        if self._min_low is None:
+            self._min_low = _sparse_table(self._low, np.minimum)
+        return self._query(self._min_low, a, b, min)
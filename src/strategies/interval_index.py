@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+区间去重索引 (Interval Index)
+
+识别结果去重原先把新机会与已有的每一条比较，历史一长、品种一多就是 O(n²)。
+这里把已接受的区间按起点保存在有序列表里，判断新区间是否重复只需二分查找相邻的两条：
+
+    间隔 gap(a, b) = max(a.start - b.end, b.start - a.end)    （重叠时为负）
+    gap < window 视为重复
+
+已接受的区间两两间隔 >= window >= 0，互不重叠，按 (起点, 终点) 排序后终点也有序：
+左侧只需看起点不大于新起点的最后一条（终点最大），右侧只需看其后第一条（起点最小）。
+
+两种语义：
+    - 信号时间：区间退化为点 [signal, signal]，gap 就是 |t1 - t2|（原先的 24 小时规则）
+    - 积累区间：[积累开始, 信号]，区间重叠或相距不足 window 视为重复
+
+批量检测与流式检测共用：add() 逐条判断并插入，与到达顺序无关。
+长期运行的流式检测用 discard_before() 丢弃不可能再与新区间冲突的旧区间，保持有界。
+
+用法：
+    seen = IntervalIndex(window=24 * 3600 * 10**9)
+    if seen.add(signal_ns):          # 点
+        ...
+    if seen.add(acc_start_ns, signal_ns):   # 区间
+        ...
+"""
+
+from bisect import bisect_right, insort
+from math import inf
+from typing import Optional
+
+
+class IntervalIndex:
+    """按起点有序的互不重叠区间集合，O(log n) 判重"""
+
+    def __init__(self, window: int = 0):
+        self.window = window
+        self._spans = []
+
+    def __len__(self):
+        return len(self._spans)
+
+    def conflicts(self, start: int, end: Optional[int] = None) -> bool:
+        """[start, end] 与已有区间的间隔是否小于 window（end 缺省时为点）"""
+        if end is None:
+            end = start
+        k = bisect_right(self._spans, (start, inf))
+        if k > 0:
+            s, e = self._spans[k - 1]
+            if max(start - e, s - end) < self.window:
+                return True
+        if k < len(self._spans):
+            s, e = self._spans[k]
+            if max(s - end, start - e) < self.window:
+                return True
+        return False
+
+    def add(self, start: int, end: Optional[int] = None) -> bool:
+        """
+        不重复时插入并返回 True，重复时返回 False（不插入）
+        """
+        if end is None:
+            end = start
+        if self.conflicts(start, end):
+            return False
+        insort(self._spans, (start, end))
+        return True
+
+    def discard_before(self, cutoff: int) -> int:
+        """
+        删除终点 <= cutoff 的区间（终点随起点有序，只需删除前缀），返回删除条数
+
+        之后的新区间起点都不早于 cutoff + window 时，被删除的区间不可能再与它们冲突
+        """
+        k = 0
+        while k < len(self._spans) and self._spans[k][1] <= cutoff:
+            k += 1
+        if k:
+            del self._spans[:k]
+        return k
+
+    def clear(self):
+        self._spans.clear()
@@ -0,0 +1,408 @@
+# -*- coding: utf-8 -*-
+"""
+形态规则 DSL (Pattern Rules)
+
+一条规则 = 拐点序列形状 + 一组数值约束表达式，编译为拐点数组滑动窗口上的向量化谓词：
+
+    FLAG = PatternRule(
+        "flag",
+        shape="L H L H L",                       # 上旗：旗杆 p0->p1，旗面 A=p1 B=p2 C=p3 D=p4
+        where=[
+            "pips(0, 1) >= min_release_pips",
+            "p3 < p1", "p4 < p2",                 # 旗面逆着旗杆方向倾斜
+            "retrace(0, 1, 4) <= max_retrace_ratio",
+            "abs(slope(1, 3) - slope(2, 4)) <= parallel_tolerance * abs(slope(1, 3))",
+        ],
+        defaults=dict(min_release_pips=40, max_retrace_ratio=0.5, parallel_tolerance=0.5),
+    )
+    hits = FLAG.scan(times, price, kind, direction=0, min_release_pips=30)
+
+表达式语法（Python 表达式的子集，编译时检查，不执行任意代码）：
+    p0..pN / t0..tN      第 i 个拐点的价格 / 时间（K 线位置，或 datetime64 按 time_unit 换算）
+    pips(i, j)           p_j - p_i 的点数（x10000）
+    move(i, j)           p_j - p_i
+    bars(i, j)           t_j - t_i（time_unit 给定时截断为整数）
+    slope(i, j)          move(i, j) / bars(i, j)
+    angle(i, j)          与 find_upper_three.angle_deg 相同的角度（按规则方向为正）
+    retrace(i, j, k)     k 回撤 i->j 这段的比例：(p_j - p_k) / (p_j - p_i)
+    high(i, j) / low(i, j) / span(i, j)   第 i..j 个拐点的最高、最低价与价差
+    spacing_cv(i, j)     第 i..j 个拐点相邻间距的变异系数（np.std / np.mean）
+    abs / min / max      逐元素
+    and / or / not、链式比较、四则运算；其它名字是参数（scan 的关键字参数或 defaults）
+
+形状与价格都按“向上”书写（L=低点，H=高点）。mirror=True 时同一规则也识别镜像（下三、下旗）：
+类型取反、价格取负，取负是精确运算，所以两个方向共用同一套谓词，幅度类数值（点数、角度、回撤比例）为正。
+价位类输出列（止损价等）在取负的价格上算出，要在 levels 中声明，输出时乘回方向还原为实际价格。
+
+约束按书写顺序逐条求值，每条只在前面都通过的窗口上计算：把便宜且筛选力强的条件写在前面，
+百万级拐点一次调用，速度与手写的向量化实现相同。
+"""
+
+import ast
+import math
+import re
+from typing import Callable, Dict, Iterable, Optional
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+_COLUMN = re.compile(r"^([pt])(\d+)$")
+_COMPARE = {
+    ast.Lt: np.less, ast.LtE: np.less_equal, ast.Gt: np.greater,
+    ast.GtE: np.greater_equal, ast.Eq: np.equal, ast.NotEq: np.not_equal,
+}
+_BINARY = {
+    ast.Add: np.add, ast.Sub: np.subtract, ast.Mult: np.multiply,
+    ast.Div: np.true_divide, ast.Pow: np.power,
+}
+
+
+class _Windows:
+    """一次 scan 的求值上下文：六点（N 点）窗口列 + 当前存活的窗口下标"""
+
+    def __init__(self, q, t, time_unit, params):
+        self.q = q
+        self.t = t
+        self.time_unit = time_unit
+        self.params = params
+        self.idx = None
+        self._cache = {}
+
+    def select(self, idx):
+        self.idx = idx
+        self._cache = {}
+
+    def price(self, i):
+        key = ("p", i)
+        if key not in self._cache:
+            self._cache[key] = self.q[self.idx, i]
+        return self._cache[key]
+
+    def time(self, i):
+        key = ("t", i)
+        if key not in self._cache:
+            self._cache[key] = self.t[self.idx, i]
+        return self._cache[key]
+
+    def bars(self, i, j):
+        key = ("bars", i, j)
+        if key not in self._cache:
+            dt = self.time(j) - self.time(i)
+            if self.time_unit is not None:
+                # 与逐个计算 int((t2 - t1).total_seconds() / unit) 相同的浮点运算
+                dt = np.trunc(dt / 1e9 / self.time_unit).astype(np.int64)
+            self._cache[key] = dt
+        return self._cache[key]
+
+
+# ----------------------------------------------------------------------
+# 内置函数：参数为拐点序号（整数常量）的在编译时检查范围
+# ----------------------------------------------------------------------
+
+def _fn_pips(w, i, j):
+    return (w.price(j) - w.price(i)) * 10000
+
+
+def _fn_move(w, i, j):
+    return w.price(j) - w.price(i)
+
+
+def _fn_bars(w, i, j):
+    return w.bars(i, j)
+
+
+def _fn_slope(w, i, j):
+    return (w.price(j) - w.price(i)) / w.bars(i, j)
+
+
+def _fn_angle(w, i, j):
+    # 逐个用 math 计算：np.arctan 与 math.atan 可能差最后一位，阈值判断要与标量实现一致；
+    # 约束按顺序在存活窗口上求值，写在后面时只对少数窗口计算
+    p1, p2, bars = w.price(i).tolist(), w.price(j).tolist(), w.bars(i, j).tolist()
+    out = [90.0 if n <= 0 else abs(math.degrees(math.atan(((b - a) / a) * 100 / n * 2)))
+           for a, b, n in zip(p1, p2, bars)]
+    return np.array(out, dtype=np.float64)
+
+
+def _fn_retrace(w, i, j, k):
+    return (w.price(j) - w.price(k)) / (w.price(j) - w.price(i))
+
+
+def _fn_high(w, i, j):
+    return np.max([w.price(m) for m in range(i, j + 1)], axis=0)
+
+
+def _fn_low(w, i, j):
+    return np.min([w.price(m) for m in range(i, j + 1)], axis=0)
+
+
+def _fn_span(w, i, j):
+    return _fn_high(w, i, j) - _fn_low(w, i, j)
+
+
+def _fn_spacing_cv(w, i, j):
+    gaps = np.array([w.time(m + 1) - w.time(m) for m in range(i, j)], dtype=np.float64)
+    return np.std(gaps, axis=0) / np.mean(gaps, axis=0)
+
+
+# 名称 -> (实现, 拐点序号参数个数)
+_PIVOT_FUNCTIONS: Dict[str, tuple] = {
+    "pips": (_fn_pips, 2),
+    "move": (_fn_move, 2),
+    "bars": (_fn_bars, 2),
+    "slope": (_fn_slope, 2),
+    "angle": (_fn_angle, 2),
+    "retrace": (_fn_retrace, 3),
+    "high": (_fn_high, 2),
+    "low": (_fn_low, 2),
+    "span": (_fn_span, 2),
+    "spacing_cv": (_fn_spacing_cv, 2),
+}
+_VALUE_FUNCTIONS = {"abs": np.abs, "min": np.minimum, "max": np.maximum}
+
+
+def _compile(expr: str, size: int, params: set) -> Callable:
+    """把一条表达式编译为 f(windows) -> 数组；语法错误或越界时抛出 ValueError"""
+    try:
+        tree = ast.parse(expr, mode="eval")
+    except SyntaxError as e:
+        raise ValueError(f"规则表达式语法错误: {expr!r}") from e
+
+    def pivot_index(node):
+        if not (isinstance(node, ast.Constant) and isinstance(node.value, int)):
+            raise ValueError(f"拐点序号必须是整数常量: {expr!r}")
+        if not 0 <= node.value < size:
+            raise ValueError(f"拐点序号 {node.value} 超出形状长度 {size}: {expr!r}")
+        return node.value
+
+    def build(node):
+        if isinstance(node, ast.Expression):
+            return build(node.body)
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float, bool)):
+            value = node.value
+            return lambda w: value
+        if isinstance(node, ast.Name):
+            m = _COLUMN.match(node.id)
+            if m:
+                i = int(m.group(2))
+                if i >= size:
+                    raise ValueError(f"拐点序号 {i} 超出形状长度 {size}: {expr!r}")
+                return (lambda w: w.price(i)) if m.group(1) == "p" else (lambda w: w.time(i))
+            name = node.id
+            params.add(name)
+            return lambda w: w.params[name]
+        if isinstance(node, ast.BoolOp):
+            parts = [build(v) for v in node.values]
+            op = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+
+            def boolop(w):
+                out = parts[0](w)
+                for part in parts[1:]:
+                    out = op(out, part(w))
+                return out
+            return boolop
+        if isinstance(node, ast.UnaryOp):
+            operand = build(node.operand)
+            if isinstance(node.op, ast.Not):
+                return lambda w: np.logical_not(operand(w))
+            if isinstance(node.op, ast.USub):
+                return lambda w: np.negative(operand(w))
+            if isinstance(node.op, ast.UAdd):
+                return operand
+        if isinstance(node, ast.BinOp) and type(node.op) in _BINARY:
+            op, left, right = _BINARY[type(node.op)], build(node.left), build(node.right)
+            return lambda w: op(left(w), right(w))
+        if isinstance(node, ast.Compare) and all(type(o) in _COMPARE for o in node.ops):
+            terms = [build(node.left)] + [build(c) for c in node.comparators]
+            ops = [_COMPARE[type(o)] for o in node.ops]
+
+            def compare(w):
+                values = [term(w) for term in terms]
+                out = ops[0](values[0], values[1])
+                for k in range(1, len(ops)):
+                    out = np.logical_and(out, ops[k](values[k], values[k + 1]))
+                return out
+            return compare
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+            name = node.func.id
+            if name in _PIVOT_FUNCTIONS:
+                fn, arity = _PIVOT_FUNCTIONS[name]
+                if len(node.args) != arity:
+                    raise ValueError(f"{name} 需要 {arity} 个拐点序号: {expr!r}")
+                args = [pivot_index(a) for a in node.args]
+                return lambda w: fn(w, *args)
+            if name in _VALUE_FUNCTIONS:
+                fn = _VALUE_FUNCTIONS[name]
+                args = [build(a) for a in node.args]
+                return lambda w: fn(*(a(w) for a in args))
+            raise ValueError(f"未知函数 {name}: {expr!r}")
+        raise ValueError(f"规则表达式不支持 {type(node).__name__}: {expr!r}")
+
+    return build(tree)
+
+
+class PatternRule:
+    """拐点形态规则：形状 + 约束，编译为向量化谓词"""
+
+    def __init__(self, name: str, shape: str, where: Iterable[str], fields: Optional[Dict[str, str]] = None,
+                 defaults: Optional[dict] = None, mirror: bool = True, time_unit: Optional[float] = None,
+                 levels: Iterable[str] = ()):
+        """
+        参数:
+            name: 规则名
+            shape: 向上形态的拐点类型序列，如 "L H L H L H"
+            where: 约束表达式，按顺序求值
+            fields: 输出列 {列名: 表达式}，在命中的窗口上计算
+            defaults: 参数默认值
+            mirror: 是否同时识别镜像（下三、下旗）
+            time_unit: 拐点时间为 datetime64 时，bars() 的单位（秒），如 H1 为 3600；None 时要求时间是 K 线位置
+            levels: 价位类输出列名（如止损价），镜像方向输出时乘回方向
+        """
+        tokens = shape.split()
+        if not tokens or any(tok not in ("L", "H") for tok in tokens):
+            raise ValueError(f"形状只能由 L / H 组成: {shape!r}")
+        self.name = name
+        self.shape = shape
+        self.kinds = np.array([1 if tok == "H" else -1 for tok in tokens], dtype=np.int8)
+        self.size = len(tokens)
+        self.where = list(where)
+        self.fields = dict(fields or {})
+        self.defaults = dict(defaults or {})
+        self.mirror = mirror
+        self.time_unit = time_unit
+        self.levels = tuple(levels)
+        unknown = set(self.levels) - set(self.fields)
+        if unknown:
+            raise ValueError(f"levels 中的列不在 fields 中: {sorted(unknown)}")
+
+        self.params = set()
+        self._where = [_compile(e, self.size, self.params) for e in self.where]
+        self._fields = {k: _compile(e, self.size, self.params) for k, e in self.fields.items()}
+        self.dtype = np.dtype([("start", "i8"), ("direction", "i1")] + [(k, "f8") for k in self.fields])
+
+    def __repr__(self):
+        return f"PatternRule({self.name!r}, shape={self.shape!r}, {len(self.where)} constraints)"
+
+    def scan(self, times, price, kind, direction: int = 0, **params) -> np.ndarray:
+        """
+        在拐点数组上识别形态
+
+        参数:
+            times: 拐点时间：整数视为 K 线位置；datetime64 时 bars() 按 time_unit 换算
+            price, kind: 拐点价格与类型（1=高点，-1=低点）
+            direction: 1 向上，-1 镜像，0 两者（mirror=False 时只有向上）
+            **params: 覆盖 defaults 的参数
+
+        返回:
+            结构化数组 (start, direction, 各输出列)，start 为窗口第一个拐点的下标，按 start 排序
+        """
+        values = dict(self.defaults, **params)
+        missing = self.params - set(values)
+        if missing:
+            raise ValueError(f"规则 {self.name} 缺少参数: {sorted(missing)}")
+
+        times = np.asarray(times)
+        unit = None
+        if np.issubdtype(times.dtype, np.datetime64):
+            if self.time_unit is None:
+                raise ValueError(f"规则 {self.name} 未设置 time_unit，拐点时间应为 K 线位置")
+            times = times.astype("datetime64[ns]").view(np.int64)
+            unit = self.time_unit
+        price = np.asarray(price, dtype=np.float64)
+        kind = np.asarray(kind, dtype=np.int8)
+
+        directions = (1, -1) if direction == 0 else (direction,)
+        if not self.mirror:
+            directions = tuple(d for d in directions if d == 1)
+        parts = [self._scan_direction(times, price, kind, d, unit, values) for d in directions]
+        if not parts:
+            return np.empty(0, dtype=self.dtype)
+        out = np.concatenate(parts)
+        return out[np.argsort(out["start"], kind="stable")]
+
+    def _scan_direction(self, times, price, kind, direction, unit, params) -> np.ndarray:
+        if len(price) < self.size:
+            return np.empty(0, dtype=self.dtype)
+        # 形状：类型序列逐位相等（镜像时类型取反）
+        match = (sliding_window_view(kind, self.size) == self.kinds * direction).all(axis=1)
+        idx = np.flatnonzero(match)
+
+        w = _Windows(sliding_window_view(price * direction, self.size),
+                     sliding_window_view(times, self.size), unit, params)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for predicate in self._where:
+                if len(idx) == 0:
+                    break
+                w.select(idx)
+                ok = np.broadcast_to(np.asarray(predicate(w), dtype=bool), idx.shape)
+                idx = idx[ok]
+
+            out = np.empty(len(idx), dtype=self.dtype)
+            out["start"] = idx
+            out["direction"] = direction
+            if len(idx):
+                w.select(idx)
+                for name, fn in self._fields.items():
+                    out[name] = fn(w)
+                # 价位列在取负的价格上算出，乘回方向
+                for name in self.levels:
+                    out[name] *= direction
+        return out
+
+
+# ----------------------------------------------------------------------
+# 内置规则
+# ----------------------------------------------------------------------
+
+# 上三 / 下三（find_upper_three 的六拐点规则）：释放 p0->p1，回撤 p2，三角形 p3..p5
+THREE = PatternRule(
+    "three",
+    shape="L H L H L H",
+    where=[
+        "pips(0, 1) >= min_release_pips",
+        "bars(0, 1) > 0",
+        "0 <= pips(2, 1) <= pips(0, 1) * max_retrace_ratio",
+        "p3 < p1", "p5 < p1", "p3 < p5",
+        "p2 < p4 < p1",
+        "bars(1, 5) >= bars(0, 1) * min_time_ratio",
+        "angle(0, 1) >= min_release_angle",
+    ],
+    fields={
+        "release_pips": "pips(0, 1)",
+        "release_bars": "bars(0, 1)",
+        "angle": "angle(0, 1)",
+        "acc_bars": "bars(1, 5)",
+    },
+    defaults=dict(min_release_pips=80, min_release_angle=45, max_retrace_ratio=0.5, min_time_ratio=2.0),
+    time_unit=3600,
+)
+
+# 上旗 / 下旗（energy_theory_notes.md）：旗杆 p0->p1 为标准释放，旗面 A=p1 B=p2 C=p3 D=p4 四次触及边界，
+# 逆旗杆方向倾斜的近似平行通道，回撤不超过旗杆的一半
+FLAG = PatternRule(
+    "flag",
+    shape="L H L H L",
+    where=[
+        "pips(0, 1) >= min_release_pips",
+        "bars(0, 1) > 0",
+        "p3 < p1", "p4 < p2", "p2 < p3",
+        "retrace(0, 1, 4) <= max_retrace_ratio",
+        "abs(slope(1, 3) - slope(2, 4)) <= parallel_tolerance * abs(slope(1, 3))",
+        "spacing_cv(1, 4) <= touch_ratio_tolerance",
+        "angle(0, 1) >= min_release_angle",
+    ],
+    fields={
+        "release_pips": "pips(0, 1)",
+        "release_bars": "bars(0, 1)",
+        "angle": "angle(0, 1)",
+        "retrace_ratio": "retrace(0, 1, 4)",
+        "flag_bars": "bars(1, 4)",
+        "stop_loss": "(high(1, 4) + low(1, 4)) / 2",
+    },
+    defaults=dict(min_release_pips=40, min_release_angle=30, max_retrace_ratio=0.5,
+                  parallel_tolerance=0.5, touch_ratio_tolerance=0.5),
+    time_unit=3600,
+    levels=("stop_loss",),
+)
+
+BUILTIN_RULES = {rule.name: rule for rule in (THREE, FLAG)}
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+转折点磁盘缓存 (Pivot Cache)
+
+数据文件没变时，检测器、绘图脚本和回放工具不必每次从头重算 ZigZag。
+缓存键 = (数据内容哈希, 周期, 偏离阈值, 算法版本)，每条结果存为一个 .npz：
+    pos / price / kind : 与 zigzag_pivots 的返回一致
+    meta               : 完整键的 JSON，便于核对
+
+数据内容哈希只覆盖参与计算的数组（如 high/low），与文件路径、修改时间无关：
+同一段数据无论来自 CSV、.bars 档案还是分区数据集，都命中同一条缓存。
+
+容量有上限：超过 max_bytes 时按最近使用时间（文件 mtime，命中时刷新）淘汰最久未用的条目。
+
+用法：
+    cache = PivotCache()
+    pos, price, kind = cache.pivots(high, low, 0.0015, timeframe="H1")
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Callable, Optional
+
+import numpy as np
+
+from ..data_loader.pyramid import TIMEFRAME_SECONDS
+from .zigzag import ZIGZAG_VERSION, Pivots, zigzag_pivots
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+CACHE_DIR = PROJECT_ROOT / "Data" / "pivot_cache"
+CACHE_LIMIT_BYTES = 256 * 1024 * 1024
+
+
+def timeframe_of(times) -> str:
+    """由 K 线时间（纪元秒或 datetime64）的中位间隔推断周期标签，如 "H1"；对不上标准周期时返回如 "90s" 的秒数标签"""
+    t = np.asarray(times)
+    if np.issubdtype(t.dtype, np.datetime64):
+        t = t.astype("datetime64[s]").astype(np.int64)
+    if len(t) < 2:
+        return ""
+    step = int(np.median(np.diff(t)))
+    for name, seconds in TIMEFRAME_SECONDS.items():
+        if seconds == step:
+            return name
+    return f"{step}s"
+
+
+def data_fingerprint(*arrays) -> str:
+    """数组内容哈希（dtype、形状和字节都参与）"""
+    h = hashlib.blake2b(digest_size=16)
+    for arr in arrays:
+        arr = np.ascontiguousarray(arr)
+        h.update(f"{arr.dtype.str}{arr.shape}".encode("utf-8"))
+        h.update(memoryview(arr).cast("B"))
+    return h.hexdigest()
+
+
+class PivotCache:
+    """按 (数据哈希, 周期, 阈值, 算法版本) 寻址的转折点缓存，LRU 容量上限"""
+
+    def __init__(self, root=CACHE_DIR, max_bytes: int = CACHE_LIMIT_BYTES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def key(fingerprint: str, timeframe: str, deviation: float, algo: str = ZIGZAG_VERSION) -> str:
+        content = json.dumps([fingerprint, timeframe, repr(float(deviation)), algo])
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()[:24]
+
+    def path_for(self, fingerprint: str, timeframe: str, deviation: float, algo: str = ZIGZAG_VERSION) -> Path:
+        return self.root / f"{self.key(fingerprint, timeframe, deviation, algo)}.npz"
+
+    def get(self, fingerprint: str, timeframe: str, deviation: float, algo: str = ZIGZAG_VERSION) -> Optional[Pivots]:
+        """命中返回 (pos, price, kind)，否则 None"""
+        path = self.path_for(fingerprint, timeframe, deviation, algo)
+        try:
+            with np.load(path) as z:
+                pivots = z["pos"], z["price"], z["kind"]
+            os.utime(path)  # 刷新最近使用时间
+            return pivots
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def put(self, fingerprint: str, timeframe: str, deviation: float, pivots: Pivots,
+            algo: str = ZIGZAG_VERSION) -> Path:
+        """写入一条缓存（原子替换），随后按容量上限淘汰"""
+        path = self.path_for(fingerprint, timeframe, deviation, algo)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        pos, price, kind = pivots
+        meta = json.dumps({"fingerprint": fingerprint, "timeframe": timeframe,
+                           "deviation": float(deviation), "algo": algo})
+        tmp = path.with_name(path.stem + ".tmp.npz")
+        np.savez(tmp, pos=np.asarray(pos, dtype=np.int64), price=np.asarray(price, dtype=np.float64),
+                 kind=np.asarray(kind, dtype=np.int8), meta=np.array(meta))
+        os.replace(tmp, path)
+        self.evict()
+        return path
+
+    def get_or_compute(self, fingerprint: str, timeframe: str, deviation: float,
+                       compute: Callable[[], Pivots], algo: str = ZIGZAG_VERSION) -> Pivots:
+        """命中直接返回，否则调用 compute() 计算并写入"""
+        pivots = self.get(fingerprint, timeframe, deviation, algo)
+        if pivots is None:
+            pivots = compute()
+            self.put(fingerprint, timeframe, deviation, pivots, algo)
+        return pivots
+
+    def pivots(self, high, low, deviation: float, timeframe: str = "", fingerprint: Optional[str] = None) -> Pivots:
+        """
+        带缓存的 zigzag_pivots
+
+        参数:
+            high, low: 价格数组
+            deviation: 偏离阈值
+            timeframe: 周期标签（参与缓存键）
+            fingerprint: 已知的数据哈希；None 时按 high/low 计算
+        """
+        high = np.ascontiguousarray(high, dtype=np.float64)
+        low = np.ascontiguousarray(low, dtype=np.float64)
+        if fingerprint is None:
+            fingerprint = data_fingerprint(high, low)
+        return self.get_or_compute(fingerprint, timeframe, deviation,
+                                   lambda: zigzag_pivots(high, low, deviation))
+
+    def evict(self):
+        """总大小超过上限时，从最久未用的条目开始删除"""
+        entries = []
+        for path in self.root.glob("*.npz"):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+                total -= size
+            except OSError:
+                pass
+
+    def clear(self):
+        for path in self.root.glob("*.npz"):
+            path.unlink(missing_ok=True)
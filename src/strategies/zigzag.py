@@ -0,0 +1,549 @@
+# -*- coding: utf-8 -*-
+"""
+数组化 ZigZag 引擎
+
+输入原始 high / low 数组，输出三个并行数组：
+    pos   : int64，转折点所在的 K 线位置
+    price : float64，转折点价格（高点取 High，低点取 Low）
+    kind  : int8，1 = 波峰（高点），-1 = 波谷（低点）
+时间戳只在调用方边界按 pos 映射（如 df.index[pos]），内核里不出现 Timestamp 和元组。
+
+语义与 legacy 的 ZigZag.calculate 完全一致：
+    - 前 10 根 K 线内，High 首次高于 high[0]*(1+deviation) 则以 low[0] 为起始低点，
+      Low 首次低于 low[0]*(1-deviation) 则以 high[0] 为起始高点；都没有则无转折点
+    - 之后从第 1 根开始逐根处理：反向突破 最后转折价*(1±deviation) 时确立新转折点，
+      同向创新高/新低（严格）时把最后一个转折点移到该 K 线
+
+内核（numba 是可选依赖，见 requirements-optional.txt）：
+    - numba 可用时使用 JIT 编译的逐根循环（最快，十年 M1 这样的数据量应安装 numba）
+    - 否则使用纯 NumPy 的“按段跳跃”实现：短段逐根标量扫描；长段用 minimum/maximum.accumulate
+      求出截至每根 K 线的最后转折价，一次比较找到第一根反向突破的 K 线，整段只有几次向量运算。
+      转折点稀疏时（阈值相对波动较大）远快于逐根循环；转折点密集时退化为标量扫描，
+      仍比逐根参照实现快约 1.5~2 倍，但达不到 JIT 的速度
+
+LiveZigZag 是同一规则的增量版本，供回放和实盘逐根维护转折点；
+zigzag_sweep 一次扫描计算一组阈值（参数研究，需要 numba；没有 JIT 时只能显式选择逐阈值计算）。
+"""
+
+from typing import Any, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+try:
+    import numba
+except ImportError:  # numba 是可选依赖
+    numba = None
+
+HAS_NUMBA = numba is not None
+# 算法版本：转折点规则变化时递增，旧的缓存结果随之失效（见 pivot_cache）
+ZIGZAG_VERSION = "zigzag-1"
+INIT_BARS = 10
+SHORT_SCAN = 64
+SCALAR_BLOCK = 4 * SHORT_SCAN
+
+Pivots = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+def _initial_pivot(high: np.ndarray, low: np.ndarray, deviation: float):
+    """起始转折点 (类型, 价格)；类型 0 表示前 10 根内没有确定方向"""
+    n = len(high)
+    for i in range(1, min(INIT_BARS, n)):
+        if high[i] > high[0] * (1 + deviation):
+            return -1, low[0]
+        elif low[i] < low[0] * (1 - deviation):
+            return 1, high[0]
+    return 0, 0.0
+
+
+def _kernel_loop(high, low, deviation, pos, price, kind):
+    """逐根循环内核（numba 编译的对象；也是其它实现的参照），返回转折点数量"""
+    n = len(high)
+    if n < 3:
+        return 0
+    last_type = 0
+    last_price = 0.0
+    for i in range(1, min(INIT_BARS, n)):
+        if high[i] > high[0] * (1 + deviation):
+            last_type = -1
+            last_price = low[0]
+            break
+        elif low[i] < low[0] * (1 - deviation):
+            last_type = 1
+            last_price = high[0]
+            break
+    if last_type == 0:
+        return 0
+
+    count = 1
+    pos[0] = 0
+    price[0] = last_price
+    kind[0] = last_type
+    # 最后一个转折点始终等于 (当前位置, last_price, last_type)：确立时追加，同向创新时就地更新
+    for i in range(1, n):
+        if last_type == -1:
+            if high[i] > last_price * (1 + deviation):
+                pos[count] = i
+                price[count] = high[i]
+                kind[count] = 1
+                count += 1
+                last_type = 1
+                last_price = high[i]
+            elif low[i] < last_price:
+                last_price = low[i]
+                pos[count - 1] = i
+                price[count - 1] = low[i]
+        else:
+            if low[i] < last_price * (1 - deviation):
+                pos[count] = i
+                price[count] = low[i]
+                kind[count] = -1
+                count += 1
+                last_type = -1
+                last_price = low[i]
+            elif high[i] > last_price:
+                last_price = high[i]
+                pos[count - 1] = i
+                price[count - 1] = high[i]
+    return count
+
+
+_kernel_jit = numba.njit(cache=True, nogil=True)(_kernel_loop) if HAS_NUMBA else None
+
+
+def _zigzag_loop(high, low, deviation, kernel) -> Pivots:
+    n = len(high)
+    pos = np.empty(n, dtype=np.int64)
+    price = np.empty(n, dtype=np.float64)
+    kind = np.empty(n, dtype=np.int8)
+    count = kernel(high, low, deviation, pos, price, kind)
+    return pos[:count].copy(), price[:count].copy(), kind[:count].copy()
+
+
+def _zigzag_numpy(high: np.ndarray, low: np.ndarray, deviation: float) -> Pivots:
+    """纯 NumPy 实现：每段（两个转折点之间）直接跳到反向突破点，不逐根生成 Python 对象"""
+    n = len(high)
+    if n < 3:
+        return _empty()
+    last_type, last_price = _initial_pivot(high, low, deviation)
+    if last_type == 0:
+        return _empty()
+
+    pos, price, kind = [0], [last_price], [last_type]
+    up, down = 1 + deviation, 1 - deviation
+    # 小数组上向量运算的固定开销高于逐根比较：每段先用 Python 标量扫描前 SHORT_SCAN 根。
+    # 标量部分索引按块转换的列表（每段切片 + tolist 在转折点密集时比逐根循环还慢，
+    # 整列一次转换在转折点稀疏时又白白转换了向量化跳过的部分），
+    # 突破价随极值更新时才重算，最后转折点在扫描结束时写回一次
+    base, highs, lows = 0, [], []
+    i = 1
+    while i < n:
+        j = min(n, i + SHORT_SCAN)
+        if j > base + len(highs):
+            base = i
+            highs = high[i:i + SCALAR_BLOCK].tolist()
+            lows = low[i:i + SCALAR_BLOCK].tolist()
+        b = -1
+        ext = -1
+        if last_type == -1:
+            trigger = last_price * up
+            for t in range(i - base, j - base):
+                if highs[t] > trigger:
+                    b = t
+                    break
+                if lows[t] < last_price:
+                    last_price = lows[t]
+                    trigger = last_price * up
+                    ext = t
+        else:
+            trigger = last_price * down
+            for t in range(i - base, j - base):
+                if lows[t] < trigger:
+                    b = t
+                    break
+                if highs[t] > last_price:
+                    last_price = highs[t]
+                    trigger = last_price * down
+                    ext = t
+        if ext >= 0:
+            pos[-1], price[-1] = base + ext, last_price
+        if b >= 0:
+            last_type = -last_type
+            last_price = highs[b] if last_type == 1 else lows[b]
+            b += base
+            pos.append(b)
+            price.append(last_price)
+            kind.append(last_type)
+            i = b + 1
+            continue
+        i = j
+
+        # 长段：按窗口向量化查找；初始窗口取已走过各段平均长度的两倍，之后逐次放大
+        window = max(4 * SHORT_SCAN, 2 * i // len(pos))
+        while i < n:
+            j = min(n, i + window)
+            if last_type == -1:
+                seg = low[i:j]
+                # run[k] = 处理第 k 根之前的最后转折价（此前的最低 Low）
+                run = np.minimum.accumulate(seg)
+                np.minimum(run, last_price, out=run)
+                hits = high[i + 1:j] > run[:-1] * up
+                first = high[i] > last_price * up
+            else:
+                seg = high[i:j]
+                run = np.maximum.accumulate(seg)
+                np.maximum(run, last_price, out=run)
+                hits = low[i + 1:j] < run[:-1] * down
+                first = low[i] < last_price * down
+            if first:
+                k = 0
+            else:
+                k = int(np.argmax(hits)) + 1 if len(hits) else 1
+                if k >= j - i or not hits[k - 1]:
+                    k = j - i
+            # 突破之前的同向严格创新：最后转折点移到极值首次出现的位置
+            if k and run[k - 1] != last_price:
+                m = int(np.argmin(seg[:k])) if last_type == -1 else int(np.argmax(seg[:k]))
+                last_price = seg[m]
+                pos[-1], price[-1] = i + m, last_price
+            if k < j - i:
+                b = i + k
+                last_type = -last_type
+                last_price = high[b] if last_type == 1 else low[b]
+                pos.append(b)
+                price.append(last_price)
+                kind.append(last_type)
+                i = b + 1
+                break
+            i = j
+            window = min(window * 4, 1 << 20)
+    return np.asarray(pos, dtype=np.int64), np.asarray(price, dtype=np.float64), np.asarray(kind, dtype=np.int8)
+
+
+def _empty() -> Pivots:
+    return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64), np.empty(0, dtype=np.int8)
+
+
+def zigzag_pivots(high, low, deviation: float = 0.001, backend: str = "auto") -> Pivots:
+    """
+    计算 ZigZag 转折点
+
+    参数:
+        high, low: 一维价格数组（任意可转换为 float64 的序列）
+        deviation: 最小偏离比例（0.0015 = 0.15%）
+        backend: "auto"（有 numba 用 JIT，否则 NumPy）/ "numba" / "numpy" / "python"（逐根参照实现）
+
+    返回:
+        (pos, price, kind) 三个等长数组
+    """
+    high = np.ascontiguousarray(high, dtype=np.float64)
+    low = np.ascontiguousarray(low, dtype=np.float64)
+    if backend == "auto":
+        backend = "numba" if HAS_NUMBA else "numpy"
+    if backend == "numba":
+        if not HAS_NUMBA:
+            raise ImportError("numba 未安装，无法使用 JIT 内核")
+        return _zigzag_loop(high, low, float(deviation), _kernel_jit)
+    if backend == "numpy":
+        return _zigzag_numpy(high, low, float(deviation))
+    if backend == "python":
+        return _zigzag_loop(high, low, float(deviation), _kernel_loop)
+    raise ValueError(f"未知 backend: {backend}")
+
+
+def _sweep_loop(high, low, deviations, types, prices, capacity):
+    """
+    多阈值逐根循环内核：外层遍历 K 线，内层遍历阈值，所有阈值共享一次扫描
+
+    输出按产生顺序交错存放 (阈值序号, pos, price, kind)；同向创新时按 last_slot 就地改写
+    """
+    n = len(high)
+    d = len(deviations)
+    out_dev = np.empty(capacity, dtype=np.int64)
+    out_pos = np.empty(capacity, dtype=np.int64)
+    out_price = np.empty(capacity, dtype=np.float64)
+    out_kind = np.empty(capacity, dtype=np.int8)
+    last_slot = np.full(d, -1, dtype=np.int64)
+    up = np.empty(d)
+    down = np.empty(d)
+    count = 0
+    for j in range(d):
+        up[j] = 1 + deviations[j]
+        down[j] = 1 - deviations[j]
+        if types[j] != 0:
+            out_dev[count] = j
+            out_pos[count] = 0
+            out_price[count] = prices[j]
+            out_kind[count] = types[j]
+            last_slot[j] = count
+            count += 1
+
+    for i in range(1, n):
+        h = high[i]
+        lo = low[i]
+        for j in range(d):
+            t = types[j]
+            if t == 0:
+                continue
+            p = prices[j]
+            if t == -1:
+                if h > p * up[j]:
+                    t, p = 1, h
+                elif lo < p:
+                    prices[j] = lo
+                    out_pos[last_slot[j]] = i
+                    out_price[last_slot[j]] = lo
+                    continue
+                else:
+                    continue
+            else:
+                if lo < p * down[j]:
+                    t, p = -1, lo
+                elif h > p:
+                    prices[j] = h
+                    out_pos[last_slot[j]] = i
+                    out_price[last_slot[j]] = h
+                    continue
+                else:
+                    continue
+            # 反向突破：追加新转折点（容量不足时翻倍）
+            if count == len(out_pos):
+                grow = len(out_pos) * 2
+                nd = np.empty(grow, dtype=np.int64)
+                npos = np.empty(grow, dtype=np.int64)
+                npr = np.empty(grow, dtype=np.float64)
+                nk = np.empty(grow, dtype=np.int8)
+                nd[:count] = out_dev[:count]
+                npos[:count] = out_pos[:count]
+                npr[:count] = out_price[:count]
+                nk[:count] = out_kind[:count]
+                out_dev, out_pos, out_price, out_kind = nd, npos, npr, nk
+            types[j] = t
+            prices[j] = p
+            out_dev[count] = j
+            out_pos[count] = i
+            out_price[count] = p
+            out_kind[count] = t
+            last_slot[j] = count
+            count += 1
+    return out_dev[:count], out_pos[:count], out_price[:count], out_kind[:count]
+
+
+_sweep_jit = numba.njit(cache=True, nogil=True)(_sweep_loop) if HAS_NUMBA else None
+
+
+class PivotSweep:
+    """
+    多阈值 ZigZag 结果（CSR 式不规则数组）
+
+    第 j 个阈值的转折点为 pos/price/kind[offsets[j]:offsets[j+1]]
+
+    属性:
+        deviations: float64 (D,)
+        offsets: int64 (D+1,)
+        pos, price, kind: 所有阈值的转折点按阈值顺序首尾相接
+    """
+
+    def __init__(self, deviations, offsets, pos, price, kind):
+        self.deviations = deviations
+        self.offsets = offsets
+        self.pos = pos
+        self.price = price
+        self.kind = kind
+
+    def __len__(self) -> int:
+        return len(self.deviations)
+
+    def __getitem__(self, j: int) -> Pivots:
+        a, b = self.offsets[j], self.offsets[j + 1]
+        return self.pos[a:b], self.price[a:b], self.kind[a:b]
+
+    @property
+    def counts(self) -> np.ndarray:
+        """每个阈值的转折点数量"""
+        return np.diff(self.offsets)
+
+    def lookup(self, deviation: float) -> Pivots:
+        """按阈值取转折点（阈值须在 deviations 中）"""
+        hit = np.flatnonzero(np.isclose(self.deviations, deviation, rtol=0, atol=1e-12))
+        if len(hit) == 0:
+            raise KeyError(deviation)
+        return self[int(hit[0])]
+
+
+def zigzag_sweep(high, low, deviations, backend: str = "auto") -> PivotSweep:
+    """
+    一次计算多个偏离阈值的 ZigZag 转折点
+
+    参数:
+        high, low: 一维价格数组
+        deviations: 阈值序列（如 np.linspace(0.0005, 0.005, 50)）
+        backend: "auto"（即 "numba"）/ "numba"（所有阈值共享一次逐根扫描）/
+                 "numpy"（逐阈值调用 zigzag_pivots，D 个阈值就是 D 次扫描）/ "python"（单次扫描的参照实现，很慢）
+
+    返回:
+        PivotSweep；sweep[j] 与 zigzag_pivots(high, low, deviations[j]) 完全相同
+
+    单次扫描的内层是逐阈值的标量状态机，只有 JIT 编译后才划算；没有 numba 时 "auto" 抛出 ImportError，
+    而不是悄悄退化为 D 次扫描。确实要在无 numba 环境下计算时显式传 backend="numpy"。
+    """
+    high = np.ascontiguousarray(high, dtype=np.float64)
+    low = np.ascontiguousarray(low, dtype=np.float64)
+    deviations = np.asarray(deviations, dtype=np.float64).ravel()
+    if backend == "auto":
+        if not HAS_NUMBA:
+            raise ImportError("zigzag_sweep 的单次扫描需要 numba（pip install -r requirements-optional.txt）；"
+                              "无 numba 时可显式使用 backend=\"numpy\" 逐阈值计算")
+        backend = "numba"
+
+    if backend == "numpy":
+        parts = [_zigzag_numpy(high, low, float(dev)) for dev in deviations]
+        counts = [len(p[0]) for p in parts]
+        offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        if not parts:
+            return PivotSweep(deviations, offsets, *_empty())
+        return PivotSweep(deviations, offsets, *(np.concatenate(col) for col in zip(*parts)))
+
+    if backend == "numba":
+        if not HAS_NUMBA:
+            raise ImportError("numba 未安装，无法使用 JIT 内核")
+        kernel = _sweep_jit
+    elif backend == "python":
+        kernel = _sweep_loop
+    else:
+        raise ValueError(f"未知 backend: {backend}")
+
+    types = np.zeros(len(deviations), dtype=np.int64)
+    prices = np.zeros(len(deviations), dtype=np.float64)
+    if len(high) >= 3:
+        for j, dev in enumerate(deviations):
+            types[j], prices[j] = _initial_pivot(high, low, float(dev))
+    capacity = max(1024, 4 * len(deviations))
+    dev_idx, pos, price, kind = kernel(high, low, deviations, types, prices, capacity)
+    # 交错输出按阈值稳定排序，同一阈值内保持时间顺序
+    order = np.argsort(dev_idx, kind="stable")
+    offsets = np.searchsorted(dev_idx[order], np.arange(len(deviations) + 1)).astype(np.int64)
+    return PivotSweep(deviations, offsets, pos[order], price[order], kind[order])
+
+
+class PivotEvent(NamedTuple):
+    """LiveZigZag 事件：event 为 "confirmed"（转折点已定型，不会再变）或 "revised"（暂定的最后一个转折点新建或移动）"""
+    event: str
+    index: int
+    time: Any
+    price: float
+    kind: int
+
+
+class LiveZigZag:
+    """
+    增量 ZigZag：逐根喂入 K 线，状态大小恒定，每根 O(1)
+
+    与 zigzag_pivots 在同一批 K 线上的结果一致（包括前 10 根确定初始方向的规则）：
+    任意时刻，已收到的 confirmed 事件依次排列，再加上 tentative，就等于对已喂入全部 K 线批量计算的结果。
+
+    消费方式：confirmed 事件追加到定型列表；revised 事件替换暂定的最后一个点。
+
+    用法：
+        live = LiveZigZag(deviation=0.0015)
+        for t, h, l in zip(times, highs, lows):
+            for ev in live.update(h, l, t):
+                ...
+    """
+
+    def __init__(self, deviation: float = 0.001):
+        self.deviation = float(deviation)
+        self._up = 1 + self.deviation
+        self._down = 1 - self.deviation
+        self.count = 0                 # 已喂入的 K 线数
+        self.confirmed_count = 0       # 已定型的转折点数
+        self.tentative: Optional[PivotEvent] = None
+        self._type = 0                 # 0 = 初始方向未定，1 / -1 同 kind
+        self._price = 0.0
+        self._dead = False             # 前 10 根内没有确定方向：与批量计算一样不再产生转折点
+        self._init = []                # 初始方向确定前的 K 线 (high, low, time)，最多 INIT_BARS 根
+
+    @classmethod
+    def resume(cls, deviation: float, pivots: Pivots, count: int, times=None) -> Optional["LiveZigZag"]:
+        """
+        由前 count 根 K 线的批量结果（zigzag_pivots 或 PivotCache）恢复增量状态，不必逐根重放
+
+        参数:
+            pivots: (pos, price, kind)，最后一个为暂定点，其余都已定型
+            times: 可选，按位置取事件时间的序列
+
+        返回:
+            LiveZigZag；没有转折点且 count < 10（初始方向仍可能在后续 K 线确定，需要原始 K 线）时返回 None
+        """
+        live = cls(deviation)
+        live.count = int(count)
+        pos, price, kind = pivots
+        if len(pos) == 0:
+            if count >= INIT_BARS:
+                live._dead = True
+                return live
+            return None
+        i = int(pos[-1])
+        live._type, live._price = int(kind[-1]), float(price[-1])
+        live.tentative = PivotEvent("revised", i, None if times is None else times[i], live._price, live._type)
+        live.confirmed_count = len(pos) - 1
+        return live
+
+    def update(self, high: float, low: float, time=None) -> List[PivotEvent]:
+        """喂入一根 K 线，返回本根产生的事件（通常为空）"""
+        i = self.count
+        self.count += 1
+        if self._type != 0:
+            return self._step(i, high, low, time)
+        if self._dead:
+            return []
+
+        self._init.append((high, low, time))
+        # 批量版本少于 3 根时不产生转折点，第 3 根起才开始判断方向
+        if self.count < 3:
+            return []
+        h0, l0, t0 = self._init[0]
+        for k in range(1 if self.count == 3 else i, self.count):
+            h, l, _ = self._init[k]
+            if h > h0 * (1 + self.deviation):
+                self._type, self._price = -1, l0
+                break
+            elif l < l0 * (1 - self.deviation):
+                self._type, self._price = 1, h0
+                break
+        if self._type == 0:
+            if self.count >= INIT_BARS:
+                self._dead = True
+                self._init = []
+            return []
+
+        # 方向确定：第 0 根成为暂定点，再把缓存的第 1 根起的 K 线按主循环补算一遍
+        self.tentative = PivotEvent("revised", 0, t0, self._price, self._type)
+        events = [self.tentative]
+        buffered, self._init = self._init, []
+        for k in range(1, len(buffered)):
+            events.extend(self._step(k, *buffered[k]))
+        return events
+
+    def _step(self, i, high, low, time) -> List[PivotEvent]:
+        if self._type == -1:
+            if high > self._price * self._up:
+                return self._reverse(i, high, time, 1)
+            if low < self._price:
+                self._price = low
+                self.tentative = PivotEvent("revised", i, time, low, -1)
+                return [self.tentative]
+        else:
+            if low < self._price * self._down:
+                return self._reverse(i, low, time, -1)
+            if high > self._price:
+                self._price = high
+                self.tentative = PivotEvent("revised", i, time, high, 1)
+                return [self.tentative]
+        return []
+
+    def _reverse(self, i, price, time, kind) -> List[PivotEvent]:
+        confirmed = self.tentative._replace(event="confirmed")
+        self.confirmed_count += 1
+        self._type, self._price = kind, price
+        self.tentative = PivotEvent("revised", i, time, price, kind)
+        return [confirmed, self.tentative]
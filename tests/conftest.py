@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""测试从项目根目录导入 src 包；legacy 脚本（The Testing files）按脚本名导入"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+LEGACY_DIR = PROJECT_ROOT / "legacy" / "The Testing files"
+if str(LEGACY_DIR) not in sys.path:
+    sys.path.append(str(LEGACY_DIR))
+
+
+@pytest.fixture(scope="session")
+def energy_frame():
+    """能量系统检测用的合成 H1 K 线：随机游走，宽松参数下能产出几十个机会"""
+    rng = np.random.default_rng(2)
+    n = 1500
+    close = 1.1 * np.exp(np.cumsum(rng.normal(0, 0.0015, n)))
+    open_ = np.concatenate(([close[0]], close[:-1]))
+    wick = np.abs(rng.normal(0, 0.0008, (2, n))) * close
+    return pd.DataFrame({
+        "Open": open_,
+        "High": np.maximum(open_, close) + wick[0],
+        "Low": np.minimum(open_, close) - wick[1],
+        "Close": close,
+        "Volume": 1000.0,
+    }, index=pd.date_range("2024-01-01", periods=n, freq="h"))
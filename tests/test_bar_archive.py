@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""K 线档案：合并去重、空输入与紧凑档案上的二分查找"""
+
+import numpy as np
+import pytest
+
+from src.data_loader.bar_archive import BarArchive, merge_bars
+from src.data_loader.compact import CompactBars
+
+
+def _bars(times, close):
+    return {"time": np.asarray(times, dtype=np.int64), "close": np.asarray(close, dtype=np.float64)}
+
+
+def test_merge_sorts_and_keeps_last_duplicate():
+    merged = merge_bars(_bars([3, 1], [0.3, 0.1]), _bars([1, 2], [0.9, 0.2]))
+    np.testing.assert_array_equal(merged["time"], [1, 2, 3])
+    np.testing.assert_array_equal(merged["close"], [0.9, 0.2, 0.3])
+
+
+def test_build_empty_archive(tmp_path):
+    archive = BarArchive.build(tmp_path, "EURUSD", "M1", _bars([], []))
+    assert len(archive) == 0 and archive.first_time is None
+    assert set(archive.columns) == {"time", "close"}
+    assert len(archive.slice()["close"]) == 0
+
+
+def test_build_without_columns_raises(tmp_path):
+    with pytest.raises(ValueError):
+        BarArchive.build(tmp_path, "EURUSD", "M1", {})
+
+
+def test_compact_archive_searches_minute_column(tmp_path):
+    rng = np.random.default_rng(0)
+    times = 1_704_067_200 + 60 * np.cumsum(rng.integers(1, 4, 500))
+    close = np.round(1.1 + np.cumsum(rng.normal(0, 1e-4, 500)), 5)
+    bars = {"time": times, "open": close, "high": close, "low": close, "close": close, "volume": np.ones(500)}
+    path = CompactBars.from_bars(bars, symbol="EURUSD").write(tmp_path / "EURUSD_M1.bars")
+    archive = BarArchive(path)
+    assert archive.compact and archive.columns["time"].dtype == np.int32
+    assert "times" not in vars(archive)
+
+    probes = np.concatenate([times[::7], times[::11] + 1, times[::13] - 1, [0, times[-1] + 10**12, -(10**12)]])
+    for t in probes.tolist():
+        for side in ("left", "right"):
+            assert archive.index_of(t, side) == np.searchsorted(times, t, side=side)
+    assert (archive.first_time, archive.last_time) == (times[0], times[-1])
+    window = archive.slice(int(times[100]) + 1, int(times[200]))
+    np.testing.assert_array_equal(window["time"], times[101:200])
+    np.testing.assert_allclose(window["close"], close[101:200])
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""DTW 引擎：批量内核与逐格参照一致，下界不超过精确距离，剪枝搜索与暴力搜索结果相同"""
+
+import numpy as np
+import pytest
+
+from src.strategies import TemplateIndex, dtw_distance, lb_keogh, lb_kim, znorm
+from src.strategies.dtw import _dtw_loop, _dtw_numpy, _select, envelope
+
+
+def _random_walks(rng, n, length):
+    return znorm(rng.normal(size=(n, length)).cumsum(axis=1))
+
+
+def test_numpy_kernel_matches_loop_and_bounds_hold():
+    rng = np.random.default_rng(1)
+    for _ in range(200):
+        length = int(rng.integers(2, 40))
+        radius = int(rng.integers(0, length))
+        a = _random_walks(rng, 1, length)[0]
+        b = _random_walks(rng, 20, length)
+        ref = np.array([_dtw_loop(a, row, radius, np.inf) for row in b])
+        np.testing.assert_allclose(_dtw_numpy(a, b, radius, np.inf), ref, rtol=1e-12, atol=1e-12)
+
+        lower, upper = envelope(a, radius)
+        b_lower, b_upper = envelope(b, radius)
+        for lb in (lb_kim(a, b), lb_keogh(b, lower, upper), lb_keogh(a, b_lower, b_upper)):
+            assert (lb <= ref * (1 + 1e-12) + 1e-12).all()
+
+        # 提前放弃：没有放弃的结果精确，阈值以内的都不放弃
+        best = float(np.median(ref))
+        got = _dtw_numpy(a, b, radius, best)
+        finite = np.isfinite(got)
+        np.testing.assert_allclose(got[finite], ref[finite], rtol=1e-12, atol=1e-12)
+        assert finite[ref <= best].all()
+
+
+def test_dtw_distance():
+    assert dtw_distance([0, 1, 2], [0, 1, 2], backend="python") == 0.0
+    assert dtw_distance([0, 1, 2, 3], [0, 0, 1, 2], band=0.5) == pytest.approx(1.0)
+    assert dtw_distance([0, 1, 2, 3], [0, 0, 1, 2], band=0) == pytest.approx(np.sqrt(3))
+    with pytest.raises(ValueError):
+        dtw_distance([0, 1], [0, 1, 2])
+
+
+@pytest.mark.parametrize("k, max_distance, overlap", [(5, None, False), (5, None, True),
+                                                      (None, 6.0, False), (3, 8.0, True)])
+def test_match_equals_brute_force(k, max_distance, overlap):
+    rng = np.random.default_rng(3)
+    close = 1.1 + np.cumsum(rng.normal(0, 0.001, 2000))
+    index = TemplateIndex.standard()
+    index.add("example", close[500:620])
+    windows, spans = index.price_windows(close, (60, 120), stride=2)
+    hits = index.match(windows, spans, k=k, max_distance=max_distance, overlap=overlap)
+
+    limit = np.inf if max_distance is None else max_distance ** 2
+    for t in range(len(index)):
+        # 不剪枝的全量距离（批量内核与逐格参照的一致性见上一个测试）
+        full = _dtw_numpy(index._series[t], windows, index.radius, np.inf)
+        picked = _select(full, spans, k, overlap, limit)
+        got = hits[hits["template"] == t]
+        np.testing.assert_array_equal(got["start"], spans[picked, 0])
+        np.testing.assert_array_equal(got["end"], spans[picked, 1])
+        np.testing.assert_allclose(got["distance"], np.sqrt(full[picked]), rtol=1e-9, atol=1e-9)
+    assert len(hits) > 0
+
+
+def test_example_window_finds_itself():
+    rng = np.random.default_rng(5)
+    close = 1.1 + np.cumsum(rng.normal(0, 0.001, 1500))
+    index = TemplateIndex()
+    index.add("example", close[300:420])
+    hits = index.search(close, windows=120, k=1)
+    assert hits["start"][0] == 300 and hits["distance"][0] == pytest.approx(0.0, abs=1e-9)
+
+
+def test_pivot_windows_and_backends_agree():
+    rng = np.random.default_rng(9)
+    pos = np.sort(rng.choice(3000, 300, replace=False))
+    price = rng.normal(size=300)
+    index = TemplateIndex.standard()
+    a = index.search_pivots(pos, price, k=3, backend="python")
+    b = index.search_pivots(pos, price, k=3, backend="numpy")
+    np.testing.assert_array_equal(a[["template", "start", "end"]], b[["template", "start", "end"]])
+    np.testing.assert_allclose(a["distance"], b["distance"], rtol=1e-9)
+    with pytest.raises(ValueError):
+        index.search_pivots(pos, price, backend="unknown")
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""参数网格引擎：每组参数的统计与逐组新建检测器一致"""
+
+import contextlib
+import io
+
+import numpy as np
+import pytest
+
+pytest.importorskip("matplotlib")  # energy_system_detector 在导入时设置绘图字体
+
+from energy_grid_search import EnergyGridEngine, sample_params
+from energy_system_detector import EnergySystemDetector
+
+FIXED = dict(zigzag_deviation=0.004, local_zigzag_deviation=0.0015, pivot_cache=False)
+SPACE = {
+    'min_release_pips': (10, 60),
+    'min_release_angle': (1, 30),
+    'max_retrace_ratio': (0.5, 1.5),
+    'min_time_ratio': (1.0, 2.5),
+    'touch_ratio_tolerance': (0.4, 1.0),
+    'min_touch_points': [4, 5],
+}
+
+
+@pytest.mark.parametrize("duplicate_mode", ["signal", "span"])
+def test_evaluate_matches_detector(energy_frame, duplicate_mode):
+    combos = sample_params(SPACE, 12, seed=5)
+    engine = EnergyGridEngine(energy_frame, duplicate_mode=duplicate_mode, **FIXED)
+    results = engine.evaluate(combos)
+    assert len(results) == len(combos)
+    assert results["opportunities"].sum() > 0
+
+    for p, row in zip(combos, results.itertuples()):
+        detector = EnergySystemDetector(energy_frame, duplicate_mode=duplicate_mode, **FIXED, **p)
+        with contextlib.redirect_stdout(io.StringIO()):
+            detector.detect_opportunities()
+        records = detector.records
+        assert row.opportunities == len(records)
+        assert row.up == int(np.count_nonzero(records["direction"] == 1))
+        if len(records):
+            assert row.mean_retrace == pytest.approx(records["retrace_ratio"].mean(), rel=1e-12)
+        else:
+            assert np.isnan(row.mean_retrace)
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""流式检测器：结果等于批量检测的未去重候选按信号时间排序后再去重"""
+
+import pytest
+
+pytest.importorskip("matplotlib")  # energy_system_detector 在导入时设置绘图字体
+
+from energy_stream_detector import StreamingEnergyDetector
+from energy_system_detector import EnergySystemDetector
+from src.strategies import IntervalIndex
+
+PARAMS = dict(
+    min_release_pips=15, min_release_angle=5, max_retrace_ratio=1.0, min_time_ratio=1.0,
+    touch_ratio_tolerance=1.0, min_touch_points=4, zigzag_deviation=0.004, local_zigzag_deviation=0.0015,
+)
+
+
+def _batch_in_signal_order(detector):
+    """批量候选按信号位置稳定排序（同一信号保持批量遍历顺序），再按 duplicate_mode 去重"""
+    candidates = []
+    for i in range(len(detector.pivot_pos) - 3):
+        for direction in (1, -1):
+            for release, acc_len, _, retrace_ratio in detector._pattern_candidates(i, direction):
+                candidates.append((release.end_pos + acc_len, release.start_pos, release.end_pos,
+                                   direction, acc_len, retrace_ratio))
+    candidates.sort(key=lambda c: c[0])
+
+    seen = IntervalIndex(detector.duplicate_window_ns)
+    selected = []
+    for c in candidates:
+        signal_ns = int(detector.times_ns[c[0]])
+        if detector.duplicate_mode == "span":
+            unique = seen.add(int(detector.times_ns[c[2]]), signal_ns)
+        else:
+            unique = seen.add(signal_ns)
+        if unique:
+            selected.append(c)
+    return selected
+
+
+@pytest.mark.parametrize("duplicate_mode", ["signal", "span"])
+@pytest.mark.parametrize("extra", [{}, dict(min_touch_points=5, touch_ratio_tolerance=0.6),
+                                   dict(min_release_pips=30, max_retrace_ratio=0.7)])
+def test_run_matches_batch_candidates(energy_frame, duplicate_mode, extra):
+    params = dict(PARAMS, duplicate_mode=duplicate_mode, **extra)
+    expected = _batch_in_signal_order(EnergySystemDetector(energy_frame, pivot_cache=False, **params))
+    assert len(expected) > 0
+
+    # 释放长度不设上限，否则流式会忽略批量能看到的长释放
+    stream = StreamingEnergyDetector(max_release_bars=len(energy_frame), **params)
+    got = [(o.signal_pos, o.release.start_pos, o.release.end_pos, o.direction, o.acc_len, o.retrace_ratio)
+           for o in stream.run(energy_frame)]
+    assert got == expected
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""能量系统检测器：增量积累扫描与逐长度切片重算一致，分片并行检测与串行一致"""
+
+import contextlib
+import io
+
+import numpy as np
+import pytest
+
+pytest.importorskip("matplotlib")  # energy_system_detector 在导入时设置绘图字体
+
+from energy_system_detector import EnergySystemDetector
+from src.strategies import zigzag_pivots
+
+PARAMS = dict(
+    min_release_pips=15, min_release_angle=5, max_retrace_ratio=1.0, min_time_ratio=1.0,
+    touch_ratio_tolerance=1.0, min_touch_points=4, zigzag_deviation=0.004, local_zigzag_deviation=0.0015,
+)
+
+
+def _detect(detector):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return detector.detect_opportunities()
+
+
+def _scan_by_slicing(detector, acc_start, release, min_len, max_len):
+    """逐个积累长度切出窗口、重算局部 ZigZag 再验证三角形（增量扫描之前的做法）"""
+    for acc_len in range(min_len, max_len):
+        acc_end = acc_start + acc_len
+        if acc_end >= len(detector.close):
+            break
+        pos, price, kind = zigzag_pivots(detector.high[acc_start:acc_end + 1], detector.low[acc_start:acc_end + 1],
+                                         detector.local_zigzag_deviation, backend="python")
+        if len(pos) < detector.min_touch_points:
+            continue
+        pos = pos + acc_start
+        is_valid_tri, retrace_ratio = detector._validate_triangle(pos, price, kind, release)
+        if not is_valid_tri or acc_len / release.bars < detector.min_time_ratio:
+            continue
+        return acc_len, (pos, price, kind), retrace_ratio
+    return None
+
+
+def test_scan_accumulation_matches_slicing(energy_frame, monkeypatch):
+    detector = EnergySystemDetector(energy_frame, pivot_cache=False, **PARAMS)
+    scan = detector._scan_accumulation
+    calls = []
+
+    def checked_scan(acc_start, release, min_len, max_len):
+        got = scan(acc_start, release, min_len, max_len)
+        expected = _scan_by_slicing(detector, acc_start, release, min_len, max_len)
+        calls.append(got is not None)
+        assert (got is None) == (expected is None)
+        if got is not None:
+            assert got[0] == expected[0]
+            for a, b in zip(got[1], expected[1]):
+                np.testing.assert_array_equal(a, b)
+            assert got[2] == expected[2]
+        return got
+
+    monkeypatch.setattr(detector, "_scan_accumulation", checked_scan)
+    _detect(detector)
+    assert len(detector.records) > 0
+    assert sum(calls) < len(calls)      # 既有找到的窗口，也有找不到的
+
+
+def test_parallel_matches_serial(energy_frame):
+    detector = EnergySystemDetector(energy_frame, pivot_cache=False, **PARAMS)
+    serial = _detect(detector)
+    records = detector.records.copy()
+    touches = (detector.touch_pos.copy(), detector.touch_price.copy(), detector.touch_kind.copy())
+    assert len(records) > 0
+
+    n_starts = len(detector.pivot_pos) - 3
+    shards = 7
+    assert n_starts % shards != 0       # 分片大小不均
+    with contextlib.redirect_stdout(io.StringIO()):
+        parallel = detector.detect_opportunities_parallel(workers=2, shards=shards)
+    assert np.array_equal(detector.records, records)
+    for a, b in zip((detector.touch_pos, detector.touch_price, detector.touch_kind), touches):
+        assert np.array_equal(a, b)
+    assert len(parallel) == len(serial)
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""并发获取：采用的结果按缓存形式规范化，首次获取与缓存命中返回相同的 DataFrame"""
+
+import numpy as np
+import pandas as pd
+
+from forex_data_fetcher import FetchCache, ForexDataFetcher, StubProvider
+
+REQUEST = dict(symbol="EURUSD", timeframe="H1", start_date="2024-03-01", end_date="2024-03-05")
+
+
+def _london_frame():
+    index = pd.date_range("2024-03-01", periods=96, freq="h", tz="Europe/London", name="Date")
+    close = 1.08 + np.arange(len(index)) * 1e-4
+    return pd.DataFrame({"Open": close, "High": close + 3e-4, "Low": close - 3e-4, "Close": close,
+                         "Volume": np.arange(len(index)), "Adj Close": close}, index=index)
+
+
+def test_result_does_not_depend_on_cache(tmp_path):
+    source = _london_frame()
+    stub = StubProvider(df=source)
+    providers = [("mt5", StubProvider(fail=True)), ("yfinance", stub)]
+    cache = FetchCache(tmp_path)
+
+    first = ForexDataFetcher.fetch_race(**REQUEST, providers=providers, cache=cache)
+    second = ForexDataFetcher.fetch_race(**REQUEST, providers=providers, cache=cache)
+    uncached = ForexDataFetcher.fetch_race(**REQUEST, providers=providers, cache=False)
+    assert stub.calls == 2                  # 第二次命中缓存
+
+    pd.testing.assert_frame_equal(first, second)
+    pd.testing.assert_frame_equal(first, uncached)
+    assert first.index.tz is None
+    assert list(first.columns) == ["Open", "High", "Low", "Close", "Volume"]
+    assert first.index[0] == pd.Timestamp("2024-03-01")           # 伦敦冬令时与 UTC 相同
+    assert first["Volume"].dtype == np.float64
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""区间去重索引：与两两比较的暴力判重一致；discard_before 不改变之后的判重结果"""
+
+import numpy as np
+
+from src.strategies import IntervalIndex
+
+
+def _brute_add(kept, start, end, window):
+    if any(max(start - e, s - end) < window for s, e in kept):
+        return False
+    kept.append((start, end))
+    return True
+
+
+def test_add_matches_brute_force():
+    rng = np.random.default_rng(0)
+    for _ in range(300):
+        window = int(rng.integers(0, 20))
+        index, kept = IntervalIndex(window), []
+        for _ in range(int(rng.integers(1, 60))):
+            start = int(rng.integers(0, 300))
+            end = start + int(rng.integers(0, 15)) * int(rng.random() < 0.7)
+            assert index.add(start, end) == _brute_add(kept, start, end, window)
+        assert len(index) == len(kept)
+
+
+def test_discard_before_keeps_future_decisions():
+    rng = np.random.default_rng(1)
+    for _ in range(300):
+        window = int(rng.integers(0, 20))
+        full, trimmed = IntervalIndex(window), IntervalIndex(window)
+        t = 0
+        for _ in range(80):
+            t += int(rng.integers(0, 10))
+            # 新区间起点不早于 t：t - window 之前结束的区间可以丢弃
+            trimmed.discard_before(t - window)
+            start = t + int(rng.integers(0, 5))
+            end = start + int(rng.integers(0, 12))
+            assert full.add(start, end) == trimmed.add(start, end)
+        assert len(trimmed) <= len(full)
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""iTick 回补：对本地替身服务器按月分段翻页，结果完整无重复，并发与限流符合设置"""
+
+import numpy as np
+import pytest
+
+pytest.importorskip("matplotlib")  # itick_forex_data 在导入时设置绘图字体
+pytest.importorskip("requests")
+
+from itick_forex_data import ITickForexData
+from itick_stub_server import EPOCH_START, ITickStubServer
+from src.data_loader import PartitionedDataset, to_epoch
+
+START, END = "2024-01-22", "2024-02-10"
+
+
+def _expected_times(step):
+    """替身服务器在 [START, END) 内的 K 线时间：按周期对齐、周末无数据"""
+    t = np.arange(to_epoch(START), to_epoch(END), step, dtype=np.int64)
+    return t[(t >= EPOCH_START) & (((t // 86400 + 3) % 7) < 5)]
+
+
+def _check_dataset(root, total):
+    bars = PartitionedDataset(root).read("EURUSD", "H1")
+    times = bars["time"]
+    expected = _expected_times(3600)
+    assert total == len(expected)
+    np.testing.assert_array_equal(times, expected)     # 完全一致：没有重复、没有缺口
+    assert len(np.unique(times)) == len(times)
+
+
+def test_backfill_pages_across_months(tmp_path):
+    with ITickStubServer(now=to_epoch("2024-06-01"), latency=0.01) as server:
+        itick = ITickForexData("test-key", base_url=server.url)
+        total = itick.backfill(tmp_path, "EURUSD", "5", START, END, page_size=50, max_in_flight=2, rate=200)
+        stats = dict(server.stats)
+    _check_dataset(tmp_path, total)
+    assert stats["requests"] > 2 * 2                   # 两个月份段，每段多页
+    assert 1 <= stats["max_in_flight"] <= 2
+    assert stats["throttled"] == 0
+
+
+def test_backfill_retries_throttled_requests(tmp_path):
+    # 服务器每秒只允许 4 次，客户端令牌桶 20 次/秒：必然遇到 429，应退避重试而不是抛出
+    with ITickStubServer(now=to_epoch("2024-06-01"), rate_limit=4) as server:
+        itick = ITickForexData("test-key", base_url=server.url)
+        total = itick.backfill(tmp_path, "EURUSD", "5", START, END, page_size=24, max_in_flight=2, rate=20)
+        stats = dict(server.stats)
+    _check_dataset(tmp_path, total)
+    assert stats["throttled"] > 0
+    assert stats["max_in_flight"] <= 2
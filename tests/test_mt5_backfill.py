@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""MT5 回补：失败与未结束的月份留在清单里，重新运行只补取这些月份"""
+
+import json
+
+import numpy as np
+
+from src.data_loader import PartitionedDataset, backfill, to_epoch
+from src.data_loader.fake_mt5 import TIMEFRAME_M1, FakeMT5, synthetic_rates
+from src.data_loader.mt5_backfill import MANIFEST_NAME
+
+SYMBOL = "EURUSD@"
+
+
+def _fetched_months(mt5):
+    return sorted(f"{np.datetime64(call[3], 's').astype('datetime64[M]')}" for call in mt5.calls
+                  if call[0] == "copy_rates_range")
+
+
+def test_resume_refetches_failed_and_open_months(tmp_path):
+    dataset = PartitionedDataset(tmp_path)
+    manifest_path = dataset.series_dir(SYMBOL, "M1") / MANIFEST_NAME
+    mt5 = FakeMT5(start="2024-01-01", end="2024-03-15", fail_first=1)
+
+    # 单线程、不重试：第一个请求（一月）失败；三月在 now 时还没结束
+    first = backfill(dataset, SYMBOL, "M1", "2024-01-01", "2024-04-01", mt5=mt5,
+                     workers=1, retries=0, pyramid=False, now="2024-03-15")
+    assert (first["done"], first["failed"], first["partial"]) == (1, ["2024-01"], ["2024-03"])
+    windows = json.loads(manifest_path.read_text(encoding="utf-8"))["windows"]
+    assert windows["2024-01"]["status"] == "failed"
+    assert windows["2024-03"] == dict(status="partial", start=to_epoch("2024-03-01"),
+                                      end=to_epoch("2024-03-15"), bars=windows["2024-03"]["bars"])
+
+    # 终端上有了三月剩余的数据；重新运行只取一月与三月
+    mt5.extend_series(SYMBOL, TIMEFRAME_M1, "2024-04-01")
+    mt5.calls.clear()
+    second = backfill(dataset, SYMBOL, "M1", "2024-01-01", "2024-04-01", mt5=mt5,
+                      workers=1, retries=0, pyramid=False, now="2024-04-02")
+    assert (second["done"], second["skipped"], second["failed"], second["partial"]) == (2, 1, [], [])
+    assert _fetched_months(mt5) == ["2024-01", "2024-03"]
+
+    times = dataset.read(SYMBOL, "M1")["time"]
+    np.testing.assert_array_equal(times, synthetic_rates("2024-01-01", "2024-04-01")["time"])
+
+    mt5.calls.clear()
+    third = backfill(dataset, SYMBOL, "M1", "2024-01-01", "2024-04-01", mt5=mt5, pyramid=False, now="2024-04-02")
+    assert (third["done"], third["skipped"]) == (0, 3) and not mt5.calls
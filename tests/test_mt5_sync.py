@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""MT5 增量同步：首次取最近 initial_count 根，之后只取最后一根之后的数据，合并无重复"""
+
+import numpy as np
+
+from src.data_loader import PartitionedDataset, sync_symbol, to_epoch
+from src.data_loader.fake_mt5 import TIMEFRAME_M1, FakeMT5, synthetic_rates
+
+SYMBOL = "EURUSD@"
+
+
+def test_incremental_sync(tmp_path):
+    dataset = PartitionedDataset(tmp_path)
+    mt5 = FakeMT5(start="2024-01-25", end="2024-02-02")
+
+    first = sync_symbol(dataset, SYMBOL, mt5=mt5, initial_count=2000, now="2024-02-02")
+    expected = synthetic_rates("2024-01-25", "2024-02-02")["time"][-2000:]
+    assert (first["fetched"], first["new"], first["gap"]) == (2000, 2000, False)
+    assert first["last_time"] == expected[-1]
+    np.testing.assert_array_equal(dataset.read(SYMBOL, "M1")["time"], expected)
+
+    # 新 K 线到达：只请求上次最后一根之后的区间，包含最后一根本身
+    last = first["last_time"]
+    mt5.extend_series(SYMBOL, TIMEFRAME_M1, "2024-02-06")
+    mt5.calls.clear()
+    second = sync_symbol(dataset, SYMBOL, mt5=mt5, now="2024-02-06")
+    assert mt5.calls == [("copy_rates_range", SYMBOL, TIMEFRAME_M1, last, to_epoch("2024-02-06"))]
+    terminal = synthetic_rates("2024-01-25", "2024-02-06")["time"]
+    assert second["new"] == np.count_nonzero(terminal > last) and second["new"] > 0
+    assert second["fetched"] == second["new"] + 1 and not second["gap"]
+    times = dataset.read(SYMBOL, "M1")["time"]
+    np.testing.assert_array_equal(times, terminal[terminal >= expected[0]])
+
+    # 高周期随同步增量更新
+    hours = dataset.read(SYMBOL, "H1")["time"]
+    np.testing.assert_array_equal(hours, np.unique(times // 3600 * 3600))
+
+    # 再次同步没有新数据
+    third = sync_symbol(dataset, SYMBOL, mt5=mt5, now="2024-02-06")
+    assert (third["fetched"], third["new"]) == (1, 0)
+
+
+def test_sync_reports_gap_beyond_terminal_history(tmp_path):
+    dataset = PartitionedDataset(tmp_path)
+    mt5 = FakeMT5(start="2024-01-01", end="2024-01-03", max_bars=1000)
+    sync_symbol(dataset, SYMBOL, mt5=mt5, initial_count=500, pyramid=False)
+
+    # 离线太久：终端只保留最近 1000 根，已经不包含上次的最后一根
+    mt5.extend_series(SYMBOL, TIMEFRAME_M1, "2024-01-10")
+    result = sync_symbol(dataset, SYMBOL, mt5=mt5, now="2024-01-10", pyramid=False)
+    assert result["gap"] and result["fetched"] == result["new"] == 1000
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""形态规则 DSL：THREE 与逐个判断的 find_patterns 循环一致，镜像方向的输出列正确"""
+
+import math
+
+import numpy as np
+import pytest
+
+from src.strategies import BUILTIN_RULES, FLAG, THREE, PatternRule
+
+
+def _angle_deg(p1, p2, bars):
+    if bars <= 0:
+        return 90.0
+    return abs(math.degrees(math.atan(((p2 - p1) / p1) * 100 / bars * 2)))
+
+
+def _three_loop(times, price, kind, min_release_pips=80, min_release_angle=45,
+                max_retrace_ratio=0.5, min_time_ratio=2.0):
+    """find_upper_three.find_patterns 向量化之前的逐窗口循环（上三）"""
+    out = []
+    for i in range(len(price) - 5):
+        t1, t2, t6 = times[i], times[i + 1], times[i + 5]
+        p1, p2, p3, p4, p5, p6 = price[i:i + 6]
+        if list(kind[i:i + 6]) != [-1, 1, -1, 1, -1, 1]:
+            continue
+        release_pips = (p2 - p1) * 10000
+        release_bars = int((t2 - t1) / np.timedelta64(1, "s") / 3600)
+        if release_pips < min_release_pips or release_bars <= 0:
+            continue
+        ang = _angle_deg(p1, p2, release_bars)
+        if ang < min_release_angle:
+            continue
+        retrace_pips = (p2 - p3) * 10000
+        if retrace_pips < 0 or retrace_pips > release_pips * max_retrace_ratio:
+            continue
+        if not (p4 < p2 and p6 < p2 and p4 < p6):
+            continue
+        if not (p3 < p5 < p2):
+            continue
+        acc_bars = int((t6 - t2) / np.timedelta64(1, "s") / 3600)
+        if acc_bars < release_bars * min_time_ratio:
+            continue
+        out.append((i, release_pips, release_bars, ang, acc_bars))
+    return out
+
+
+def _random_pivots(rng, n):
+    kind = np.where(np.arange(n) % 2 == 0, -1, 1) * np.where(rng.random(n) < 0.03, -1, 1)
+    price = 1.1 + rng.normal(0, 0.002, n) + kind * rng.uniform(0, 0.004, n)
+    step = int(rng.choice([3600, 1800, 60]))
+    times = np.datetime64("2024-01-01T00:00:00") + (np.cumsum(rng.integers(1, 30, n)) * step).astype("timedelta64[s]")
+    return times, price, kind.astype(np.int8)
+
+
+def test_three_matches_loop_both_directions():
+    rng = np.random.default_rng(1)
+    total = 0
+    for _ in range(100):
+        times, price, kind = _random_pivots(rng, int(rng.integers(3, 400)))
+        params = dict(min_release_pips=float(rng.uniform(0, 40)), min_release_angle=float(rng.uniform(0, 60)),
+                      max_retrace_ratio=float(rng.uniform(0.2, 1.2)), min_time_ratio=float(rng.uniform(0.3, 3)))
+        for direction in (1, -1):
+            expected = _three_loop(times, price * direction, kind * direction, **params)
+            hits = THREE.scan(times, price, kind, direction=direction, **params)
+            got = [(int(h["start"]), h["release_pips"], int(h["release_bars"]), h["angle"], int(h["acc_bars"]))
+                   for h in hits]
+            assert got == expected
+            assert (hits["direction"] == direction).all()
+            total += len(expected)
+    assert total > 0
+
+
+@pytest.mark.parametrize("name", sorted(BUILTIN_RULES))
+def test_mirrored_fields(name):
+    """
+    镜像行情（价格关于 base 对称）的下方向输出：幅度列与向上相同，价位列是向上价位的镜像、仍为正价格；
+    角度与价位有关（涨幅 / 起点价），按取负的恒等式比较
+    """
+    rule = BUILTIN_RULES[name]
+    rng = np.random.default_rng(7)
+    base = 2.2
+    loose = dict(min_release_pips=0, min_release_angle=0)
+    up, down = [], []
+    for _ in range(200):
+        times, price, kind = _random_pivots(rng, 300)
+        up.append(rule.scan(times, price, kind, direction=1, **loose))
+        down.append(rule.scan(times, base - price, -kind, direction=-1, **loose))
+        np.testing.assert_array_equal(rule.scan(times, -price, -kind, direction=-1, **loose)["angle"], up[-1]["angle"])
+    up, down = np.concatenate(up), np.concatenate(down)
+    assert len(up) == len(down) > 0
+    np.testing.assert_array_equal(down["start"], up["start"])
+    for field in rule.fields:
+        if field in rule.levels:
+            assert (down[field] > 0).all()
+            np.testing.assert_allclose(down[field], base - up[field], rtol=1e-12)
+        elif field != "angle":
+            np.testing.assert_allclose(down[field], up[field], rtol=1e-9, atol=1e-9)
+
+
+def test_flag_stop_loss_inside_flag_range():
+    # 下旗：旗杆 1.1200 -> 1.1000，旗面 A=1.1000 B=1.1080 C=1.1030 D=1.1100
+    times = np.array([0, 5, 10, 15, 20, 25], dtype=np.int64) * 3600 * 10**9
+    times = times.astype("datetime64[ns]")
+    price = np.array([1.1200, 1.1000, 1.1080, 1.1030, 1.1100, 1.1050])
+    kind = np.array([1, -1, 1, -1, 1, -1], dtype=np.int8)
+    hits = FLAG.scan(times, price, kind, direction=-1, min_release_angle=0)
+    assert len(hits) == 1 and hits["start"][0] == 0
+    assert hits["stop_loss"][0] == pytest.approx((1.1000 + 1.1100) / 2)
+    assert hits["release_pips"][0] == pytest.approx(200)
+
+
+@pytest.mark.parametrize("expr", ["p9 > p0", "foo(1, 2)", "pips(0)", "__import__('os')", "p0.real > 0"])
+def test_invalid_expressions_rejected(expr):
+    with pytest.raises(ValueError):
+        PatternRule("bad", "L H", [expr])
+
+
+def test_missing_parameter_and_unknown_level():
+    with pytest.raises(ValueError):
+        PatternRule("x", "L H", ["p1 > p0 + k"]).scan([0, 1], [1.0, 2.0], [-1, 1])
+    with pytest.raises(ValueError):
+        PatternRule("x", "L H", ["p1 > p0"], fields={"a": "p0"}, levels=("b",))
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""ZigZag：纯 NumPy 内核与逐根参照实现逐点相同"""
+
+import numpy as np
+import pytest
+
+from src.strategies.zigzag import HAS_NUMBA, zigzag_pivots, zigzag_sweep
+
+
+def _bars(rng, n, vol):
+    close = 1.1 * np.exp(np.cumsum(rng.normal(0, vol, n)))
+    high = close * (1 + np.abs(rng.normal(0, vol, n)))
+    low = close * (1 - np.abs(rng.normal(0, vol, n)))
+    return high, low
+
+
+@pytest.mark.parametrize("vol", [1e-4, 5e-4, 2e-3])
+def test_numpy_matches_reference(vol):
+    rng = np.random.default_rng(int(vol * 1e5))
+    for _ in range(200):
+        high, low = _bars(rng, int(rng.integers(0, 3000)), vol)
+        if rng.random() < 0.3:
+            high, low = np.round(high, 3), np.round(low, 3)  # 相等价位
+        deviation = float(rng.choice([0.0005, 0.001, 0.003, 0.01]))
+        expected = zigzag_pivots(high, low, deviation, backend="python")
+        got = zigzag_pivots(high, low, deviation, backend="numpy")
+        for a, b in zip(expected, got):
+            np.testing.assert_array_equal(a, b)
+
+
+def test_long_segments_use_vector_path():
+    # 阈值远大于波动：段长远超 SHORT_SCAN，走向量化窗口
+    high, low = _bars(np.random.default_rng(0), 200_000, 1e-4)
+    high[0] = low[0] = low[0] * 0.98
+    expected = zigzag_pivots(high, low, 0.004, backend="python")
+    got = zigzag_pivots(high, low, 0.004, backend="numpy")
+    assert len(expected[0]) > 2
+    for a, b in zip(expected, got):
+        np.testing.assert_array_equal(a, b)
+
+
+def test_sweep_matches_single_threshold():
+    high, low = _bars(np.random.default_rng(3), 3000, 5e-4)
+    deviations = np.linspace(0.0005, 0.005, 7)
+    for backend in ("python", "numpy"):
+        sweep = zigzag_sweep(high, low, deviations, backend=backend)
+        assert len(sweep) == len(deviations)
+        for j, dev in enumerate(deviations):
+            for a, b in zip(sweep[j], zigzag_pivots(high, low, float(dev), backend="python")):
+                np.testing.assert_array_equal(a, b)
+
+
+@pytest.mark.skipif(HAS_NUMBA, reason="numba 已安装时 auto 使用 JIT 单次扫描")
+def test_sweep_auto_requires_numba():
+    high, low = _bars(np.random.default_rng(4), 100, 5e-4)
+    with pytest.raises(ImportError):
+        zigzag_sweep(high, low, [0.001, 0.002])